@@ -0,0 +1,927 @@
+import contextlib
+import heapq
+import io
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+from types import SimpleNamespace
+
+import numpy as np
+
+from Clock import Clock
+import CompletionScheduler
+from Config import Config
+import DistanceCache
+from Graph import MobilityGraph
+from Learner import Learner, State, Action
+import QTableStore
+import ScenarioCache
+from Node import Node, Layer
+import NodeStore
+from SpatialGrid import ZoneGrid, FogNodeGrid
+from ZoneManagerRandom import ZoneManagerRandom
+from QTableEngine import make_q_table
+from StateIndex import make_state_index
+from SumoXMLParser import SumoXMLParser
+from TaskSchedule import TaskSchedule
+from TaskQueue import TaskQueue, get_slack
+from ZoneManagerMatching import ZoneManagerMatching
+from ZoneManagerBase import Offer
+from Topology import Topology
+from CloudLayer import CloudLayer
+from Evaluater import Evaluator
+from Task import Task
+
+'''
+    Benchmarks of the hot paths of the simulation. They run on synthetic data, so they don't need the scenario files.
+    Usage:
+        python Benchmark.py [benchmark_name ...]
+    Without arguments, all the benchmarks are run.
+'''
+
+
+def random_state(rng, fog_nodes_range=(20, 40)):
+    levels = Config.DISCRETE_LEVELS
+    fog_nodes_data = [tuple(rng.randint(0, levels) for _ in range(5))
+                      for _ in range(rng.randint(*fog_nodes_range))]
+    task_data = tuple(rng.randint(0, levels) for _ in range(7))
+    return State(fog_nodes_data, task_data)
+
+
+def perturbed_state(rng, state):
+    """
+    A copy of the state with its fog nodes shuffled and one value changed, so it is near but not equal to it.
+    """
+    fog_nodes_data = list(state.fog_nodes_data)
+    rng.shuffle(fog_nodes_data)
+    task_data = list(state.task_data)
+    task_data[rng.randrange(len(task_data))] += 1
+    return State(fog_nodes_data, tuple(task_data))
+
+
+def drifting_states(rng, size, fog_nodes_range=(5, 15), configurations=200):
+    """
+    States as the learner sees them: the fog nodes of a zone drift between a limited number of configurations,
+    while the task data is spread over all the levels.
+    """
+    bases = [random_state(rng, fog_nodes_range).fog_nodes_data for _ in range(configurations)]
+    states = []
+    for _ in range(size):
+        fog_nodes_data = [list(data) for data in rng.choice(bases)]
+        data = rng.choice(fog_nodes_data)
+        data[rng.randrange(len(data))] += rng.choice((-1, 1))
+        task_data = tuple(rng.randint(0, Config.DISCRETE_LEVELS) for _ in range(7))
+        states.append(State([tuple(data) for data in fog_nodes_data], task_data))
+    return states
+
+
+def scan_nearest_state(learner, state):
+    """
+    The nearest state search of the learner before it used the state index: one distance call per stored state.
+    """
+    nearest_state = None
+    min_distance = float('inf')
+    for existing_state in learner.q_table.keys():
+        distance = learner.calculate_distance_of_states(state, existing_state)
+        if distance < min_distance:
+            min_distance = distance
+            nearest_state = existing_state
+    if min_distance <= Config.Q_LEARNING_NEAREST_STATE_DISTANCE_THRESHOLD:
+        return nearest_state
+    return None
+
+
+def build_learner(size, rng):
+    learner = Learner("benchmark")
+    for _ in range(size):
+        learner.add_state(random_state(rng))
+    return learner
+
+
+def benchmark_nearest_state(sizes=(1000, 10000, 100000), queries=4):
+    print("Nearest state search (scan vs state index)")
+    rng = random.Random(0)
+    for size in sizes:
+        learner = build_learner(size, rng)
+        stored_states = list(learner.q_table.keys())
+        query_states = [perturbed_state(rng, rng.choice(stored_states)) if i % 2 == 0 else random_state(rng)
+                        for i in range(queries)]
+
+        start = time.perf_counter()
+        expected = [scan_nearest_state(learner, state) for state in query_states]
+        scan_time = (time.perf_counter() - start) / queries
+
+        start = time.perf_counter()
+        found = [learner.find_nearest_state(state) for state in query_states]
+        index_time = (time.perf_counter() - start) / queries
+
+        same = all(e is f for e, f in zip(expected, found))
+        print(f"\t{size} states:\tscan {scan_time * 1000:.2f} ms\tindex {index_time * 1000:.2f} ms"
+              f"\tspeedup {scan_time / index_time:.1f}x\tsame result: {same}")
+
+
+def benchmark_state_index(sizes=(1000, 10000, 100000), queries=20, fog_nodes_range=(5, 15)):
+    print("State indexes (time per query and recall against the brute-force search)")
+    rng = random.Random(0)
+    threshold = Config.Q_LEARNING_NEAREST_STATE_DISTANCE_THRESHOLD
+    for size in sizes:
+        states = drifting_states(rng, size + queries, fog_nodes_range)
+        states, query_states = states[:size], states[size:]
+        for kind in ("brute_force", "task_bucket", "lsh"):
+            start = time.perf_counter()
+            index = make_state_index(kind, states)
+            build_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for state in query_states:
+                index.find_nearest(state, threshold)
+            query_time = (time.perf_counter() - start) / queries
+
+            recall = index.recall(query_states, threshold)
+            print(f"\t{size} states, {kind}:\tbuild {build_time:.2f} s\tquery {query_time * 1000:.2f} ms"
+                  f"\trecall {recall:.2f}")
+
+
+def random_q_table(rng, size, actions_per_state=5, fog_nodes_count=30):
+    fog_node_ids = [f"fog{i}" for i in range(fog_nodes_count)]
+    q_table = {}
+    for _ in range(size):
+        q_table[random_state(rng)] = {
+            Action(rng.choice(fog_node_ids), rng.uniform(0, 10), rng.uniform(0, 10), rng.uniform(0, 3),
+                   rng.uniform(0, 360), rng.uniform(0, 20)): rng.uniform(-30, 10)
+            for _ in range(actions_per_state)
+        }
+    return q_table
+
+
+def benchmark_q_table_io(sizes=(1000, 10000, 50000)):
+    # the learner loads a q-table eagerly, so the time until it is ready to learn includes its state index
+    print("Q-table save and load (JSON vs binary), and the time until a learner is ready on the loaded q-table")
+    rng = random.Random(0)
+    learner = Learner("benchmark")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            learner.q_table = random_q_table(rng, size)
+            for name, file_name in (("json", "q_table.txt"), ("binary", "q_table" + QTableStore.EXTENSION)):
+                file_path = os.path.join(directory, file_name)
+                start = time.perf_counter()
+                learner.save_q_table(file_path)
+                save_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                q_table = make_q_table(Config.Q_TABLE_ENGINE, learner.load_q_table(file_path))
+                load_time = time.perf_counter() - start
+                make_state_index(Config.Q_LEARNING_STATE_INDEX, q_table.keys())
+                ready_time = time.perf_counter() - start
+
+                start = time.perf_counter()
+                if QTableStore.is_binary_path(file_path):
+                    QTableStore.QTableFile(file_path).state_entries(size // 2)
+                open_time = time.perf_counter() - start
+                print(f"\t{size} states, {name}:\tsave {save_time:.3f} s\tload {load_time:.3f} s"
+                      f"\tready {ready_time:.3f} s"
+                      f"\tsize {os.path.getsize(file_path) / 1e6:.1f} MB"
+                      + (f"\tmap and read one state {open_time * 1000:.2f} ms" if name == "binary" else ""))
+
+
+def benchmark_action_interning(ticks=Config.SIMULATION_DURATION, fog_nodes_count=10):
+    print("Actions of one state over repeated decisions")
+    rng = random.Random(0)
+    learner = Learner("benchmark")
+    fog_nodes = [Node(f"fog{i}", Layer.Fog, x=rng.uniform(0, 10), y=rng.uniform(0, 10), speed=rng.uniform(0, 3),
+                      angle=rng.uniform(0, 360), power=rng.uniform(0, 20)) for i in range(fog_nodes_count)]
+    state = State(State.get_fog_nodes_data(fog_nodes), (1, 1, 1, 1, 1, 1, 1))
+    for tick in range(ticks):
+        fog_node = rng.choice(fog_nodes)
+        # the fog nodes jitter a little, without leaving their levels most of the time
+        fog_node.x = min(max(fog_node.x + rng.uniform(-0.05, 0.05), 0), 10)
+        learner.update_q_table(state, Action.from_fog_node(fog_node), rng.choice((-10, 10)), state)
+        if tick % 50 == 0 or tick == ticks - 1:
+            print(f"\tTick {tick}:\t{len(learner.q_table)} states, {len(learner.q_table[state])} actions")
+
+
+def benchmark_q_table_engine(sizes=(1000, 10000), actions_per_state=10, fog_nodes_count=50, queries=2000):
+    print("Q-table engines (memory of the q-values, max q-value and best action of a state)")
+    rng = random.Random(0)
+    for size in sizes:
+        # the actions are interned on their discretized data, so a zone only sees a limited number of them
+        pool = [Action.intern(Action(f"fog{i % fog_nodes_count}", rng.randint(0, 9), rng.randint(0, 9), 1, 0, 10))
+                for i in range(fog_nodes_count * 4)]
+        entries = {random_state(rng): {action: rng.uniform(-30, 10) for action in rng.sample(pool, actions_per_state)}
+                   for _ in range(size)}
+        states = list(entries.keys())
+        query_states = [rng.choice(states) for _ in range(queries)]
+        for kind in ("dict", "dense"):
+            tracemalloc.start()
+            q_table = make_q_table(kind)
+            for state, actions in entries.items():
+                q_table[state] = dict(actions)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+            start = time.perf_counter()
+            for state in query_states:
+                q_table.max_value(state)
+                q_table.best_action(state)
+            query_time = (time.perf_counter() - start) / queries
+            print(f"\t{size} states, {kind}:\tmemory {memory / 1e6:.1f} MB\tquery {query_time * 1e6:.1f} us")
+
+
+def random_zones(rng, zones_count, area_size, coverage_radius):
+    return [ZoneManagerRandom(x=rng.uniform(0, area_size), y=rng.uniform(0, area_size),
+                              coverage_radius=coverage_radius, name=f"Zone{i}") for i in range(zones_count)]
+
+
+def benchmark_zone_lookup(sizes=(16, 256, 4096), queries=2000, coverage_radius=4):
+    print("Zone lookups of a task (scan vs zone grid)")
+    rng = random.Random(0)
+    for size in sizes:
+        # the zones overlap about as much as the ones of the bundled scenario, whatever their number
+        area_size = 2.5 * coverage_radius * size ** 0.5
+        zones = random_zones(rng, size, area_size, coverage_radius)
+        points = [(rng.uniform(0, area_size), rng.uniform(0, area_size)) for _ in range(queries)]
+
+        start = time.perf_counter()
+        for x, y in points:
+            [zone for zone in zones if zone.is_within_coverage(x, y)]
+            min(zones, key=lambda zone: math.sqrt((x - zone.x) ** 2 + (y - zone.y) ** 2))
+        scan_time = (time.perf_counter() - start) / queries
+
+        grid = ZoneGrid(zones)
+        start = time.perf_counter()
+        for x, y in points:
+            grid.get_zones_by_position(x, y)
+            grid.get_nearest_zone(x, y)
+        grid_time = (time.perf_counter() - start) / queries
+        print(f"\t{size} zones:\tscan {scan_time * 1e6:.1f} us\tgrid {grid_time * 1e6:.1f} us"
+              f"\tspeedup {scan_time / grid_time:.1f}x")
+
+
+def benchmark_fog_node_lookup(sizes=(100, 1000, 10000), queries=2000, coverage_radius=3):
+    print("Fog nodes in range of a task in one large zone (scan vs fog node grid)")
+    rng = random.Random(0)
+    for size in sizes:
+        # about the same number of fog nodes cover a point, whatever the size of the zone
+        area_size = coverage_radius * size ** 0.5
+        zone = ZoneManagerRandom(x=area_size / 2, y=area_size / 2, coverage_radius=area_size, name="Zone0")
+        fog_nodes = [Node(f"fog{i}", Layer.Fog, power=rng.uniform(0, 20), x=rng.uniform(0, area_size),
+                          y=rng.uniform(0, area_size), coverage_radius=coverage_radius) for i in range(size)]
+        fixed_fog_nodes, mobile_fog_nodes = fog_nodes[:size // 2], fog_nodes[size // 2:]
+        for fog_node in fog_nodes:
+            zone.add_fog_node(fog_node)
+        tasks = [SimpleNamespace(power_needed=rng.uniform(0, 10)) for _ in range(queries)]
+        users = [SimpleNamespace(x=rng.uniform(0, area_size), y=rng.uniform(0, area_size)) for _ in range(queries)]
+
+        start = time.perf_counter()
+        expected = [zone.get_fog_nodes_in_range(task, user) for task, user in zip(tasks, users)]
+        scan_time = (time.perf_counter() - start) / queries
+
+        zone.fog_node_grid = FogNodeGrid(ZoneGrid([zone], fixed_fog_nodes, coverage_radius))
+        start = time.perf_counter()
+        zone.fog_node_grid.update(mobile_fog_nodes)
+        update_time = time.perf_counter() - start
+        start = time.perf_counter()
+        found = [zone.get_fog_nodes_in_range(task, user) for task, user in zip(tasks, users)]
+        grid_time = (time.perf_counter() - start) / queries
+        print(f"\t{size} fog nodes:\tscan {scan_time * 1e6:.1f} us\tgrid {grid_time * 1e6:.1f} us"
+              f"\tspeedup {scan_time / grid_time:.1f}x\tupdate per tick {update_time * 1000:.1f} ms\tsame result: {expected == found}")
+
+
+def write_trace(file_path, vehicles_count, vehicle_type="car", timesteps=1):
+    with open(file_path, 'w') as file:
+        file.write('<fcd-export>\n')
+        for time_step in range(timesteps):
+            file.write(f'<timestep time="{time_step}.00">\n')
+            for i in range(vehicles_count):
+                file.write(f'<vehicle id="veh{i}" x="{i % 100 + time_step}" y="{i // 100}" angle="0" '
+                           f'type="{vehicle_type}" speed="1"/>\n')
+            file.write('</timestep>\n')
+        file.write('</fcd-export>\n')
+
+
+def scan_update_graph(graph):
+    """
+    The update of the mobility graph before it used per-timestep id maps: one scan of the time step per node.
+    """
+    Clock.time += 1
+    new_nodes = graph.graph.get(Clock.time)
+    for node in graph.nodes:
+        new_node = next((n for n in new_nodes if n.id == node.id), None)
+        if new_node is not None:
+            node.x = new_node.x
+            node.y = new_node.y
+            node.angle = new_node.angle
+            node.speed = new_node.speed
+
+
+def write_scenario(directory, vehicles_count, timesteps, tasks_count=1000):
+    """
+    Returns:
+        list: The paths of the five files of a synthetic scenario, in the order of SumoXMLParser.
+    """
+    file_paths = [os.path.join(directory, name) for name in
+                  ("vehicles.xml", "mobile_fog_nodes.xml", "tasks.xml", "fixed_fog_nodes.xml", "zones.xml")]
+    write_trace(file_paths[0], vehicles_count, timesteps=timesteps)
+    write_trace(file_paths[1], vehicles_count // 4, vehicle_type="mobileFog", timesteps=timesteps)
+    with open(file_paths[2], 'w') as file:
+        file.write('<tasks>\n')
+        for i in range(tasks_count):
+            file.write(f'<task id="{i}" name="task{i}" creation_time="{i % timesteps}" deadline="{i % timesteps + 5}" '
+                       f'power_needed="1" size="2" creator="veh{i % vehicles_count}"/>\n')
+        file.write('</tasks>\n')
+    with open(file_paths[3], 'w') as file:
+        file.write('<nodes>\n<node id="fixed0" x="5" y="5" type="fixed" power="15" lane="0"/>\n</nodes>\n')
+    with open(file_paths[4], 'w') as file:
+        file.write('<zones>\n<zone name="zone0" x="5" y="5" coverage_radius="10"/>\n</zones>\n')
+    return file_paths
+
+
+def benchmark_scenario_cache(sizes=(200, 800), vehicles_count=100):
+    print("Loading of a scenario (XML files vs compiled bundle)")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            file_paths = write_scenario(directory, vehicles_count, size)
+            parser = SumoXMLParser(*file_paths)
+            bundle_path = os.path.join(directory, f"scenario{ScenarioCache.EXTENSION}")
+
+            start = time.perf_counter()
+            xml_trace = [(time_step, [node.x for node in nodes]) for time_step, nodes in parser.iter_trace()]
+            parser.parse_task(), parser.parse_fixed_fog_node(), parser.parse_zone()
+            xml_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            ScenarioCache.compile_scenario(parser, bundle_path)
+            compile_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            ScenarioCache.get_key(file_paths)
+            bundle = ScenarioCache.ScenarioBundle(bundle_path)
+            bundle.parse_task(), bundle.parse_fixed_fog_node(), bundle.parse_zone()
+            load_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            bundle_trace = [(time_step, [node.x for node in nodes]) for time_step, nodes in bundle.iter_trace()]
+            trace_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            bundle.get_timestep(size - 1)
+            seek_time = time.perf_counter() - start
+            print(f"\t{size} time steps:\tXML {xml_time * 1000:.0f} ms\tcompile {compile_time * 1000:.0f} ms"
+                  f"\tbundle: hash and load {load_time * 1000:.1f} ms, trace {trace_time * 1000:.0f} ms,"
+                  f" last time step {seek_time * 1000:.1f} ms"
+                  f"\t{os.path.getsize(bundle_path) / 1e6:.1f} MB\tsame trace: {xml_trace == bundle_trace}")
+            bundle = None
+
+
+def benchmark_node_registry(sizes=(100, 1000, 10000), queries=2000):
+    print("Node lookup by id of a task (scan vs id registry)")
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            xml_path = os.path.join(directory, "vehicles.xml")
+            mobile_xml_path = os.path.join(directory, "mobile_fog_nodes.xml")
+            write_trace(xml_path, size)
+            write_trace(mobile_xml_path, 0)
+            graph = MobilityGraph(xml_path, mobile_xml_path, None, None, None)
+            ids = [f"veh{rng.randrange(size)}" for _ in range(queries)]
+
+            start = time.perf_counter()
+            for node_id in ids:
+                next(node for node in graph.nodes if node.id == node_id)
+            scan_time = (time.perf_counter() - start) / queries
+
+            start = time.perf_counter()
+            for node_id in ids:
+                graph.get_node(node_id)
+            registry_time = (time.perf_counter() - start) / queries
+            print(f"\t{size} nodes:\tscan {scan_time * 1e6:.2f} us\tregistry {registry_time * 1e6:.2f} us")
+
+
+def benchmark_graph_update(sizes=(100, 1000, 5000), ticks=3):
+    print("Mobility graph update per tick (scan vs per-timestep id map)")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            xml_path = os.path.join(directory, "vehicles.xml")
+            mobile_xml_path = os.path.join(directory, "mobile_fog_nodes.xml")
+            write_trace(xml_path, size, timesteps=ticks + 1)
+            write_trace(mobile_xml_path, 0)
+            times = {}
+            for name, update in (("scan", scan_update_graph), ("id map", MobilityGraph.update_graph)):
+                graph = MobilityGraph(xml_path, mobile_xml_path, None, None, None)
+                start = time.perf_counter()
+                for _ in range(ticks):
+                    update(graph)
+                times[name] = (time.perf_counter() - start) / ticks
+            print(f"\t{size} vehicles:\tscan {times['scan'] * 1000:.2f} ms\tid map {times['id map'] * 1000:.2f} ms"
+                  f"\tspeedup {times['scan'] / times['id map']:.1f}x")
+
+
+def benchmark_trace_streaming(sizes=(200, 800, 3200), vehicles_count=100):
+    print("Peak memory of a run over the mobility trace (whole trace parsed vs streamed)")
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            xml_path = os.path.join(directory, "vehicles.xml")
+            mobile_xml_path = os.path.join(directory, "mobile_fog_nodes.xml")
+            write_trace(xml_path, vehicles_count, timesteps=size)
+            write_trace(mobile_xml_path, 0)
+            results = {}
+            for name in ("parsed", "streamed"):
+                tracemalloc.start()
+                start = time.perf_counter()
+                if name == "parsed":
+                    trace = SumoXMLParser(xml_path, mobile_xml_path, None, None, None).parse()
+                    for _ in sorted(trace.keys()):
+                        pass
+                else:
+                    graph = MobilityGraph(xml_path, mobile_xml_path, None, None, None)
+                    for _ in range(size - 1):
+                        graph.update_graph()
+                results[name] = (tracemalloc.get_traced_memory()[1], time.perf_counter() - start)
+                tracemalloc.stop()
+                trace = graph = None
+            print(f"\t{size} time steps:\tparsed peak {results['parsed'][0] / 1e6:.1f} MB"
+                  f" ({results['parsed'][1]:.2f} s)\tstreamed peak {results['streamed'][0] / 1e6:.1f} MB"
+                  f" ({results['streamed'][1]:.2f} s, with the updates of the graph)")
+
+
+def benchmark_task_release(sizes=(2700, 27000, 270000), ticks=Config.SIMULATION_DURATION):
+    print("Release of the tasks of every tick of a run (scan of the task dicts vs schedule)")
+    rng = random.Random(0)
+    for size in sizes:
+        task_data = [{"name": f"task{i}", "power_needed": 1.0, "size": 2.0, "deadline": 0.0,
+                      "creator": f"veh{rng.randrange(100)}", "creation_time": float(rng.randrange(ticks))}
+                     for i in range(size)]
+        start = time.perf_counter()
+        scanned = [[task for task in task_data if task["creation_time"] == tick] for tick in range(ticks)]
+        scan_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        schedule = TaskSchedule.from_task_data(task_data)
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        released = [schedule.release(tick) for tick in range(ticks)]
+        release_time = time.perf_counter() - start
+        print(f"\t{size} tasks:\tscan {scan_time * 1000:.0f} ms\tschedule {release_time * 1000:.1f} ms"
+              f" (built in {build_time * 1000:.0f} ms)\tsame tasks: {scanned == released}")
+
+
+def benchmark_task_completion(sizes=(1000, 10000, 50000), fog_nodes_count=100, ticks=20, max_duration=1000):
+    print("Completion of the in-flight tasks per tick (is_done polling vs completion heap)")
+    rng = random.Random(0)
+    for size in sizes:
+        durations = [rng.uniform(0, max_duration) for _ in range(size)]
+        positions = [(rng.uniform(0, 10), rng.uniform(0, 10)) for _ in range(fog_nodes_count)]
+        results = {}
+        for name in ("polling", "heap"):
+            CompletionScheduler.scheduler = CompletionScheduler.CompletionScheduler()
+            Clock.time = 0
+            creator = Node("veh0", Layer.Users, x=5, y=5)
+            fog_nodes = [Node(f"fog{i}", Layer.Fog, x=x, y=y) for i, (x, y) in enumerate(positions)]
+            for i, duration in enumerate(durations):
+                task = Task(power_needed=0, name=f"task{i}", size=duration * 2, deadline=max_duration, creator=creator,
+                            creation_time=0)
+                fog_nodes[i % fog_nodes_count].append_task(task)
+            finished_count = 0
+            start = time.perf_counter()
+            for _ in range(ticks):
+                Clock.time += 1
+                if name == "polling":
+                    for fog_node in fog_nodes:
+                        for task in list(fog_node.tasks):
+                            if fog_node.is_done(task):
+                                fog_node.remove_task(task)
+                                finished_count += 1
+                else:
+                    for fog_node, task in CompletionScheduler.scheduler.pop_finished(Clock.time):
+                        fog_node.remove_task(task)
+                        finished_count += 1
+            results[name] = ((time.perf_counter() - start) / ticks, finished_count)
+        print(f"\t{size} tasks:\tpolling {results['polling'][0] * 1000:.2f} ms\theap {results['heap'][0] * 1000:.3f} ms"
+              f"\tper tick, {results['heap'][1] / ticks:.0f} completions per tick"
+              f"\tsame completions: {results['polling'][1] == results['heap'][1]}")
+    CompletionScheduler.scheduler = CompletionScheduler.CompletionScheduler()
+
+
+def benchmark_task_queue(arrival_rates=(5, 20, 80), ticks=Config.SIMULATION_DURATION, success_probability=0.2):
+    print("Retries of the task queue under overload (FIFO with oldest dropped vs deadline slack with expiry)")
+    for arrival_rate in arrival_rates:
+        results = {}
+        for name in ("fifo", "slack"):
+            rng = random.Random(0)
+            queue = deque() if name == "fifo" else TaskQueue()
+            retries = wasted_retries = late = dropped = 0
+            Evaluator.deadline_misses = Evaluator.expired_tasks = 0
+            for tick in range(ticks):
+                # the queue prints every expired or dropped task
+                if name == "fifo":
+                    while len(queue) > Config.TASK_QUEUE_SIZE:
+                        queue.popleft()
+                        dropped += 1
+                    retried = [queue.popleft() for _ in range(len(queue))]
+                else:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        queue.expire(tick)
+                        queue.shed()
+                    retried = queue.drain()
+                new_tasks = [Task(power_needed=1, name=f"task{tick}_{i}", size=rng.uniform(1, 8),
+                                  deadline=tick + rng.uniform(1, 10), creator=None, creation_time=tick)
+                             for i in range(arrival_rate)]
+                retries += len(retried)
+                wasted_retries += sum(tick + task.exec_time > task.deadline for task in retried)
+                for task in retried + new_tasks:
+                    if rng.random() < success_probability:
+                        late += tick + task.exec_time > task.deadline
+                    elif name == "fifo":
+                        queue.append(task)
+                    else:
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            queue.push(task, tick)
+            misses = dropped + late + Evaluator.deadline_misses
+            results[name] = (retries, wasted_retries, misses, Evaluator.expired_tasks)
+        fifo, slack = results["fifo"], results["slack"]
+        print(f"\t{arrival_rate} tasks per tick:\tfifo {fifo[0]} retries ({fifo[1]} past the deadline), {fifo[2]} misses"
+              f"\tslack {slack[0]} retries ({slack[1]} past the deadline), {slack[2]} misses ({slack[3]} expired)")
+    Evaluator.deadline_misses = Evaluator.expired_tasks = 0
+
+
+def benchmark_capacity_events(sizes=(100, 1000, 5000), zones_count=64, ticks=100, freed_zones_per_tick=2,
+                              freed_tasks_per_zone=5):
+    print("Retries of a saturated task queue (every task on every step vs woken by capacity events)")
+    rng = random.Random(0)
+    for size in sizes:
+        target_zones = [rng.randrange(zones_count) for _ in range(size)]
+        freed_zones = [rng.sample(range(zones_count), freed_zones_per_tick) for _ in range(ticks)]
+        results = {}
+        for name in ("every step", "events"):
+            queue = TaskQueue(max_size=size)
+            for i, zone in enumerate(target_zones):
+                task = Task(power_needed=1, name=f"task{i}", size=2, deadline=ticks * 10 + i, creator=None,
+                            creation_time=0)
+                queue.push(task, 0, [zone])
+            retries = placed = 0
+            start = time.perf_counter()
+            for tick in range(ticks):
+                capacities = {zone: freed_tasks_per_zone for zone in freed_zones[tick]}
+                if name == "every step":
+                    retried = queue.drain()
+                else:
+                    for zone in capacities:
+                        queue.publish(zone, 1)
+                    retried = queue.take_ready(lambda task: False)
+                retries += len(retried)
+                for task in retried:
+                    zone, = task.waiting_zones
+                    if capacities.get(zone, 0) > 0:
+                        capacities[zone] -= 1
+                        placed += 1
+                    else:
+                        queue.push(task, tick, [zone])
+            results[name] = (retries, placed, time.perf_counter() - start)
+        every_step, events = results["every step"], results["events"]
+        print(f"\t{size} queued tasks:\tevery step {every_step[0]} retries ({every_step[2] * 1000:.0f} ms)"
+              f"\tevents {events[0]} retries ({events[2] * 1000:.0f} ms)\tplaced {every_step[1]} / {events[1]}")
+
+
+def benchmark_distance_cache(sizes=(100, 1000, 5000), fog_nodes_count=20, lookups_per_pair=4, ticks=5):
+    """
+    The lookups of a tick: every task of a user asks the distance to the fog nodes of its zone for the possible fog
+    nodes, the offers, the choice of the assignee and its finish time.
+    """
+    print("User to fog node distances of a tick (recomputed on every lookup vs tick-scoped cache)")
+    rng = random.Random(0)
+    store = NodeStore.NodeStore()
+    fog_nodes = [Node(f"fog{i}", Layer.Fog, x=rng.uniform(0, 1000), y=rng.uniform(0, 1000), store=store)
+                 for i in range(fog_nodes_count)]
+    for size in sizes:
+        users = [Node(f"veh{i}", Layer.Users, x=rng.uniform(0, 1000), y=rng.uniform(0, 1000), store=store)
+                 for i in range(size)]
+        results = {}
+        for name in ("recompute", "cache"):
+            cache = DistanceCache.DistanceCache()
+            start = time.perf_counter()
+            for _ in range(ticks):
+                cache.invalidate()
+                for user in users:
+                    for _ in range(lookups_per_pair):
+                        for fog_node in fog_nodes:
+                            if name == "recompute":
+                                fog_node.distance(user)
+                            else:
+                                cache.get(fog_node, user)
+            results[name] = (time.perf_counter() - start, cache)
+        cache = results["cache"][1]
+        print(f"\t{size} users:\trecompute {results['recompute'][0] * 1000:.1f} ms"
+              f"\tcache {results['cache'][0] * 1000:.1f} ms ({cache.hit_rate * 100:.0f}% hits,"
+              f" {cache.time_saved * 1000:.1f} ms saved)")
+
+
+def benchmark_predictions(sizes=(10, 50, 200), users_count=200, ticks=5):
+    """
+    The sort key of the assignees: the distance of every candidate fog node to the user, both predicted at the exec
+    time of the task.
+    """
+    print("Predicted distances of the candidate fog nodes (trigonometry on every call vs velocity vectors and memo)")
+    rng = random.Random(0)
+    store = NodeStore.NodeStore()
+    users = [Node(f"veh{i}", Layer.Users, x=rng.uniform(0, 1000), y=rng.uniform(0, 1000), speed=rng.uniform(0, 30),
+                  angle=rng.uniform(0, 360), store=store) for i in range(users_count)]
+    exec_times = [rng.randint(1, 10) for _ in users]
+
+    def trigonometry_pred_x_y(node, exec_time_estimate):
+        pred_x = node.x + node.speed * exec_time_estimate * math.cos(math.radians(node.angle))
+        pred_y = node.y + node.speed * exec_time_estimate * math.sin(math.radians(node.angle))
+        return pred_x, pred_y
+
+    for size in sizes:
+        fog_nodes = [Node(f"fog{i}", Layer.Fog, x=rng.uniform(0, 1000), y=rng.uniform(0, 1000),
+                          speed=rng.uniform(0, 30), angle=rng.uniform(0, 360), store=store) for i in range(size)]
+        results = {}
+        for name in ("trigonometry", "velocity"):
+            start = time.perf_counter()
+            for _ in range(ticks):
+                DistanceCache.cache.invalidate()
+                for user, exec_time in zip(users, exec_times):
+                    if name == "trigonometry":
+                        def key(fog_node):
+                            user_x, user_y = trigonometry_pred_x_y(user, exec_time)
+                            pred_x, pred_y = trigonometry_pred_x_y(fog_node, exec_time)
+                            return math.sqrt((pred_x - user_x) ** 2 + (pred_y - user_y) ** 2)
+                    else:
+                        def key(fog_node):
+                            return fog_node.distance_in_future(user, exec_time)
+                    min(fog_nodes, key=key)
+            results[name] = time.perf_counter() - start
+        print(f"\t{size} candidates:\ttrigonometry {results['trigonometry'] * 1000:.1f} ms"
+              f"\tvelocity {results['velocity'] * 1000:.1f} ms")
+
+
+class NearestZoneManager(ZoneManagerRandom):
+    """
+    A zone that offers its nearest possible fog node, so that the assignments of the benchmark are deterministic.
+    """
+
+    def find_assignee(self, user_node, task):
+        possible_fog_nodes = self.get_possible_fog_nodes(task, user_node)
+        if len(possible_fog_nodes) == 0:
+            return None
+        return min(possible_fog_nodes, key=lambda fog_node: DistanceCache.get_distance(fog_node, user_node))
+
+
+def make_assignment_topology(fog_nodes_count, zones_per_side, area_size, coverage_radius,
+                             zone_class=NearestZoneManager):
+    rng = random.Random(0)
+    zone_size = area_size / zones_per_side
+    zones = [zone_class(x=(i + 0.5) * zone_size, y=(j + 0.5) * zone_size, coverage_radius=zone_size,
+                                name=f"Zone{i}_{j}") for i in range(zones_per_side) for j in range(zones_per_side)]
+    fog_nodes = [Node(f"fog{i}", Layer.Fog, power=Config.FOG_POWER, x=rng.uniform(0, area_size),
+                      y=rng.uniform(0, area_size), coverage_radius=coverage_radius) for i in range(fog_nodes_count)]
+    cloud_layer = CloudLayer()
+    cloud_layer.add_node(Node(0, Layer.Cloud, power=Config.CLOUD_POWER, x=area_size * 10, y=area_size * 10,
+                              coverage_radius=area_size * 100))
+    fog_layer = SimpleNamespace(get_fixed_nodes=lambda: fog_nodes, get_nodes=lambda: fog_nodes)
+    graph = SimpleNamespace(get_moving_fog_nodes=lambda: [])
+    topology = Topology(None, fog_layer, cloud_layer, graph)
+    topology.set_zones(zones)
+    for fog_node in fog_nodes:
+        topology.assign_fog_nodes_to_zones(fog_node)
+    return topology, fog_nodes
+
+
+def benchmark_task_assignment(sizes=(10, 100, 1000), ticks=10, fog_nodes_count=200, zones_per_side=4,
+                              area_size=1000, coverage_radius=150):
+    """
+    The tasks released in a step, assigned one by one or as a batch. The power of the fog nodes is restored after
+    every step, so that the steps are alike.
+    """
+    print("Assignment of the tasks of a step (sequential vs batch): throughput")
+    rng = random.Random(0)
+    for size in sizes:
+        positions = [(rng.uniform(0, area_size), rng.uniform(0, area_size), rng.uniform(0, 30), rng.uniform(0, 360))
+                     for _ in range(size)]
+        task_data = [(rng.randint(1, 5), rng.randint(2, 20)) for _ in range(size)]
+        results = {}
+        for name in ("sequential", "batch"):
+            CompletionScheduler.scheduler = CompletionScheduler.CompletionScheduler()
+            topology, fog_nodes = make_assignment_topology(fog_nodes_count, zones_per_side, area_size,
+                                                           coverage_radius)
+            users = [Node(f"veh{i}", Layer.Users, x=x, y=y, speed=speed, angle=angle)
+                     for i, (x, y, speed, angle) in enumerate(positions)]
+            assignments = []
+            elapsed = 0.0
+            for tick in range(ticks):
+                DistanceCache.cache.invalidate()
+                for fog_node in fog_nodes:
+                    fog_node.power = Config.FOG_POWER
+                tasks = [Task(power_needed=power_needed, name=f"task{tick}_{i}", size=task_size,
+                              deadline=Clock.time + 100, creator=user, creation_time=Clock.time)
+                         for i, (user, (power_needed, task_size)) in enumerate(zip(users, task_data))]
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    if name == "sequential":
+                        for task in tasks:
+                            topology.assign_task(task.creator, task)
+                    else:
+                        topology.assign_tasks(tasks)
+                elapsed += time.perf_counter() - start
+                assignments += [task.assigned_node for task in tasks]
+            results[name] = (size * ticks / elapsed, [node.id if node else None for node in assignments])
+        sequential, batch = results["sequential"], results["batch"]
+        print(f"\t{size} tasks per step:\tsequential {sequential[0]:.0f} tasks/s\tbatch {batch[0]:.0f} tasks/s"
+              f"\tspeedup {batch[0] / sequential[0]:.1f}x\tsame assignments: {sequential[1] == batch[1]}")
+
+
+def benchmark_matching(sizes=(100, 300, 1000), fog_nodes_count=30, zones_per_side=4, area_size=1000,
+                       coverage_radius=300):
+    """
+    One step of tasks more than the fog nodes can host, assigned in arrival order to the nearest fog node or as
+    min-cost matchings. The tasks of the cloud and of the queue are the ones the fog nodes didn't take.
+    """
+    print("Assignment of a saturated step (greedy vs min-cost matching): acceptance and solver time")
+    rng = random.Random(0)
+    running_mode = Config.RUNNING_MODE
+    for size in sizes:
+        positions = [(rng.uniform(0, area_size), rng.uniform(0, area_size), rng.uniform(0, 30), rng.uniform(0, 360))
+                     for _ in range(size)]
+        task_data = [(rng.uniform(1, 3), rng.uniform(1, 3), rng.uniform(2, 10)) for _ in range(size)]
+        results = {}
+        for name, zone_class in (("greedy", NearestZoneManager), ("matching", ZoneManagerMatching)):
+            Config.RUNNING_MODE = Config.RUNNING_MODE_MATCHING if name == "matching" else Config.RUNNING_MODE_HEURISTIC
+            CompletionScheduler.scheduler = CompletionScheduler.CompletionScheduler()
+            DistanceCache.cache.invalidate()
+            Evaluator.matching_solver_time = 0.0
+            topology, fog_nodes = make_assignment_topology(fog_nodes_count, zones_per_side, area_size,
+                                                           coverage_radius, zone_class)
+            users = [Node(f"veh{i}", Layer.Users, x=x, y=y, speed=speed, angle=angle)
+                     for i, (x, y, speed, angle) in enumerate(positions)]
+            tasks = [Task(power_needed=power_needed, name=f"task{i}", size=task_size, deadline=Clock.time + deadline,
+                          creator=user, creation_time=Clock.time)
+                     for i, (user, (power_needed, task_size, deadline)) in enumerate(zip(users, task_data))]
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                topology.assign_tasks(tasks)
+            elapsed = time.perf_counter() - start
+            fog_tasks = [task for task in tasks
+                         if task.assigned_node is not None and task.assigned_node.layer == Layer.Fog]
+            slack = sum(get_slack(task, Clock.time) for task in fog_tasks) / max(len(fog_tasks), 1)
+            results[name] = (len(fog_tasks), size - len(fog_tasks), slack, elapsed, Evaluator.matching_solver_time)
+        Config.RUNNING_MODE = running_mode
+        greedy, matching = results["greedy"], results["matching"]
+        print(f"\t{size} tasks:\tgreedy {greedy[0] * 100 / size:.1f}% on fog nodes (mean slack {greedy[2]:.2f}),"
+              f" {greedy[3] * 1000:.0f} ms\tmatching {matching[0] * 100 / size:.1f}% on fog nodes"
+              f" (mean slack {matching[2]:.2f}), {matching[3] * 1000:.0f} ms"
+              f" of which solver {matching[4] * 1000:.0f} ms")
+
+
+class RefusingZone:
+    """
+    A zone that refuses its offers until it has refused a given number of them, as when the fog nodes of the
+    offers ran out of power.
+    """
+
+    def __init__(self, refusals_count):
+        self.name = "Zone0"
+        self.refusals_count = refusals_count
+
+    def accept_offer(self, user_node, task, offer):
+        if self.refusals_count > 0:
+            self.refusals_count -= 1
+            return False
+        return True
+
+
+def benchmark_offer_selection(sizes=(10, 100, 1000), refused_ratio=0.5, repeats=20):
+    print("Offers of a task with refused ones (scan and remove vs heap of offer records)")
+    rng = random.Random(0)
+    for size in sizes:
+        distances = [rng.uniform(0, 10) for _ in range(size)]
+        refusals_count = int(size * refused_ratio)
+        results = {}
+        for name in ("scan", "heap"):
+            elapsed = 0.0
+            for _ in range(repeats):
+                zone = RefusingZone(refusals_count)
+                zones_by_name = {zone.name: zone}
+                offers = [Offer(zone, fog_node, distance) for fog_node, distance in enumerate(distances)]
+                start = time.perf_counter()
+                if name == "scan":
+                    # the offers before they were records: (zone name, fog node), their distances looked up again
+                    offers = [(offer.zone.name, offer.fog_node) for offer in offers]
+                    is_successful = False
+                    while not is_successful and len(offers) > 0:
+                        min_distance = float('inf')
+                        best_zone = best_offer = None
+                        for offer in offers:
+                            distance = distances[offer[1]]
+                            if distance < min_distance:
+                                min_distance = distance
+                                best_zone = zones_by_name.get(offer[0])
+                                best_offer = offer
+                        is_successful = best_zone.accept_offer(None, None, best_offer)
+                        if not is_successful:
+                            offers.remove(best_offer)
+                else:
+                    offers_heap = [(offer.distance, number, offer) for number, offer in enumerate(offers)]
+                    heapq.heapify(offers_heap)
+                    while offers_heap:
+                        _, _, offer = heapq.heappop(offers_heap)
+                        if offer.zone.accept_offer(None, None, offer):
+                            break
+                elapsed += time.perf_counter() - start
+            results[name] = elapsed / repeats
+        print(f"\t{size} offers:\tscan {results['scan'] * 1e6:.1f} us\theap {results['heap'] * 1e6:.1f} us"
+              f"\tspeedup {results['scan'] / results['heap']:.1f}x")
+
+
+class DictNode:
+    """
+    The node before the node store: a plain object with its attributes in its __dict__ and its own tasks list.
+    """
+
+    def __init__(self, id, layer, power, x, y, coverage_radius, speed, angle):
+        self.id = id
+        self.layer = layer
+        self.power = power
+        self.x = x
+        self.y = y
+        self.speed = speed
+        self.coverage_radius = coverage_radius
+        self.angle = angle
+        self.tasks = []
+
+
+def benchmark_node_store(sizes=(1000, 10000, 100000)):
+    print("Nodes of a fleet (dict-backed objects vs node store views): memory, and copy of the positions of a tick")
+    rng = random.Random(0)
+    for size in sizes:
+        data = [(rng.uniform(0, 10), rng.uniform(0, 10), rng.uniform(0, 3), rng.uniform(0, 360)) for _ in range(size)]
+        results = {}
+        for name in ("dict", "store"):
+            store = NodeStore.NodeStore()
+
+            def make_nodes(shift):
+                if name == "dict":
+                    return [DictNode(f"veh{i}", Layer.Users, Config.FOG_POWER, x + shift, y + shift,
+                                     Config.FOG_COVERAGE_RADIUS, speed, angle)
+                            for i, (x, y, speed, angle) in enumerate(data)]
+                return [Node(f"veh{i}", Layer.Users, x=x + shift, y=y + shift, speed=speed, angle=angle, store=store)
+                        for i, (x, y, speed, angle) in enumerate(data)]
+
+            tracemalloc.start()
+            nodes = make_nodes(0)
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            # the nodes of the next time step of the trace
+            new_nodes = make_nodes(0.1)
+            slots = np.array([node.slot for node in nodes]) if name == "store" else None
+            new_slots = np.array([node.slot for node in new_nodes]) if name == "store" else None
+
+            start = time.perf_counter()
+            if name == "dict":
+                for node, new_node in zip(nodes, new_nodes):
+                    node.x = new_node.x
+                    node.y = new_node.y
+                    node.angle = new_node.angle
+                    node.speed = new_node.speed
+            else:
+                for field in (NodeStore.X, NodeStore.Y, NodeStore.ANGLE, NodeStore.SPEED, NodeStore.VX, NodeStore.VY):
+                    store.data[field, slots] = store.data[field, new_slots]
+            results[name] = (memory / size, time.perf_counter() - start)
+        print(f"\t{size} nodes:\tdict {results['dict'][0]:.0f} B/node, update {results['dict'][1] * 1000:.2f} ms"
+              f"\tstore {results['store'][0]:.0f} B/node, update {results['store'][1] * 1000:.2f} ms")
+
+
+BENCHMARKS = {
+    "nearest_state": benchmark_nearest_state,
+    "state_index": benchmark_state_index,
+    "q_table_io": benchmark_q_table_io,
+    "action_interning": benchmark_action_interning,
+    "q_table_engine": benchmark_q_table_engine,
+    "zone_lookup": benchmark_zone_lookup,
+    "fog_node_lookup": benchmark_fog_node_lookup,
+    "node_registry": benchmark_node_registry,
+    "graph_update": benchmark_graph_update,
+    "node_store": benchmark_node_store,
+    "trace_streaming": benchmark_trace_streaming,
+    "scenario_cache": benchmark_scenario_cache,
+    "task_release": benchmark_task_release,
+    "task_completion": benchmark_task_completion,
+    "task_queue": benchmark_task_queue,
+    "capacity_events": benchmark_capacity_events,
+    "distance_cache": benchmark_distance_cache,
+    "predictions": benchmark_predictions,
+    "task_assignment": benchmark_task_assignment,
+    "matching": benchmark_matching,
+    "offer_selection": benchmark_offer_selection,
+}
+
+if __name__ == "__main__":
+    # the synthetic traces of the graph benchmarks come without the other files of a scenario
+    Config.SCENARIO_CACHE = False
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        BENCHMARKS[name]()
@@ -0,0 +1,73 @@
+"""
+    Completion events of the tasks, replacing the check of every task of every fog and cloud node on every tick.
+
+    The finish time of a task is fixed when it is appended to a node (see Node.append_task) and pushed into a
+    min-heap keyed by it, so every tick only pops the tasks that finish by then. When a task leaves its node before
+    finishing (Node.remove_task), its entry is not searched for in the heap: the task forgets the number of the entry,
+    and the entry is skipped when it is popped.
+
+    The topology hands the popped tasks to the zone of their fog node (see Topology.collect_finished_tasks). The
+    tasks of a fog node that no zone has are deferred until a zone adds the fog node, since no zone could deliver
+    their results before, or dropped with the fog node when it leaves the simulation.
+"""
+
+import heapq
+
+
+class CompletionScheduler:
+    def __init__(self):
+        # (finish time, entry number, node, task), the entry number breaks the ties in the order of the pushes
+        self.heap = []
+        self.entries_count = 0
+        # node -> the tasks of the node that finished while no zone had it
+        self.deferred_tasks = {}
+
+    def __len__(self):
+        """
+        Returns:
+            int: The number of entries in the heap, the skipped ones included.
+        """
+        return len(self.heap)
+
+    def push(self, node, task, finish_time):
+        task.finish_time = finish_time
+        task.completion_number = self.entries_count
+        heapq.heappush(self.heap, (finish_time, self.entries_count, node, task))
+        self.entries_count += 1
+
+    @staticmethod
+    def cancel(task):
+        task.completion_number = None
+
+    def pop_finished(self, time):
+        """
+        Returns:
+            list: The (node, task) of the tasks that finish by the given time, in the order of their finish times.
+        """
+        finished = []
+        heap = self.heap
+        while heap and heap[0][0] <= time:
+            _, number, node, task = heapq.heappop(heap)
+            if task.completion_number == number:
+                finished.append((node, task))
+        return finished
+
+    def defer(self, node, task):
+        self.deferred_tasks.setdefault(node, []).append(task)
+
+    def resume(self, node):
+        """
+        Pushes back the deferred tasks of a node that are still on it, to be popped on the next call of pop_finished.
+        """
+        for task in self.deferred_tasks.pop(node, ()):
+            if task.completion_number is not None and task.assigned_node is node:
+                heapq.heappush(self.heap, (task.finish_time, task.completion_number, node, task))
+
+    def drop(self, node):
+        """
+        Forgets the deferred tasks of a node that left the simulation.
+        """
+        self.deferred_tasks.pop(node, None)
+
+
+scheduler = CompletionScheduler()
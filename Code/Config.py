@@ -15,6 +15,7 @@
         FOG_POWER (int): The power available at a fog node.
         ENABLE_TIMER_LOG (bool): Flag to enable logging of time-consuming processes.
         TIMER_LOG_THRESHOLD (int): Threshold time in seconds for logging a process.
+        Q_LEARNING_STATE_INDEX (str): The index used by the learner for finding the nearest state of its q-table.
         ENABLE_VISUALIZATION (bool): Flag to enable visualization of the simulation.
         X_RANGE (int): The X-axis range for visualization.
         Y_RANGE (int): The Y-axis range for visualization.
@@ -22,11 +23,14 @@
         IS_IMAN (bool): Flag indicating if the simulation is running under a specific configuration.
         RUNNING_MODES (list): A list of possible running modes for the simulation.
         RUNNING_MODE (str): The currently selected running mode.
+        RANDOM_SEED (int): The seed of the random decisions of a run, None for an unseeded run.
 """
 
 
 class Config:
     FOG_COVERAGE_RADIUS = 3
+    # the side of the cells of the spatial grids, None for the median coverage radius of the zones (see SpatialGrid)
+    SPATIAL_GRID_CELL_SIZE = None
     CLOUD_COVERAGE_RADIUS = 100
     CLOUD_X = 50
     CLOUD_Y = 50
@@ -41,6 +45,25 @@ class Config:
 
     Q_LEARNING_NEAREST_ACTION_DISTANCE_THRESHOLD = 10
     Q_LEARNING_NEAREST_STATE_DISTANCE_THRESHOLD = 10
+    # "brute_force" and "task_bucket" are exact, "lsh" is approximate (see StateIndex)
+    Q_LEARNING_STATE_INDEX = "task_bucket"
+    Q_LEARNING_LSH_TABLES = 8
+    Q_LEARNING_LSH_HASHES = 2
+    Q_LEARNING_LSH_BUCKET_WIDTH = 4
+    # keep the nearest state of each query state within a decision, see Learner.search_nearest_state
+    Q_LEARNING_RESOLUTION_CACHE = True
+    # "json" (<zone>_q_table.txt) or "binary" (<zone>_q_table.qtb, see QTableStore)
+    Q_TABLE_FORMAT = "json"
+    # "dict" (nested dicts) or "dense" (q-values in a NumPy matrix of state ids x action ids, see QTableEngine)
+    Q_TABLE_ENGINE = "dict"
+    # None for no limit. When a q-table has more states, the "lru" or the least visited ("visits") ones are evicted
+    Q_TABLE_MAX_STATES = None
+    Q_TABLE_EVICTION_POLICY = "lru"
+    Q_TABLE_EVICTION_LOW_WATERMARK = 0.9
+    # None for no limit, otherwise only the actions with the highest q-values are kept
+    Q_TABLE_MAX_ACTIONS_PER_STATE = None
+    # the q-table sizes are counted every this many steps and on the last one, None for not counting them
+    Q_TABLE_SIZE_TRACKING_INTERVAL = 10
 
     CLOUD_POWER = 30
     FOG_POWER = 15
@@ -55,14 +78,32 @@ class Config:
     Y_RANGE = 10
 
     TASK_QUEUE_SIZE = 20
+    # keep the distances between nodes within a tick (see DistanceCache)
+    DISTANCE_CACHE = True
+    # the number of time steps of the mobility trace read ahead of the current one (see Graph.TraceWindow)
+    TRACE_LOOKAHEAD = 10
+    # read the scenario from a binary bundle compiled from the XML files on the first run (see ScenarioCache)
+    SCENARIO_CACHE = True
+    # the number of time steps between two keyframes of the delta-encoded trace of a bundle
+    SCENARIO_KEYFRAME_INTERVAL = 50
 
     OFFLINE_MODE = True
     IS_IMAN = False
+    # a seed makes the runs reproducible, with the same output apart from the measured times
+    RANDOM_SEED = None
 
     RUNNING_MODE_RANDOM = "random"
     RUNNING_MODE_Q_LEARNING = "q_learning"
     RUNNING_MODE_HEURISTIC = "heuristic"
     RUNNING_MODE_A3C = "a3c"
     RUNNING_MODE_FULLY_RANDOM = "fully_random"
+    RUNNING_MODE_MATCHING = "matching"
+
+    # the weights of the predicted distance and of the deadline slack in the costs of the matching mode
+    # (see ZoneManagerMatching)
+    MATCHING_FUTURE_DISTANCE_WEIGHT = 1.0
+    MATCHING_SLACK_WEIGHT = 1.0
+    # the most tasks matched in one solve, the tasks of a step are split in batches of increasing slack beyond it
+    MATCHING_BATCH_SIZE = 200
 
     RUNNING_MODE = "q_learning"
\ No newline at end of file
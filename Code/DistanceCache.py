@@ -0,0 +1,94 @@
+"""
+    Tick-scoped cache of the distances between nodes. Within a tick, the same fog node to user distance is needed by
+    the possible fog nodes of a zone, the offers of the topology, the choice of the assignee and the finish time of
+    the task, while the nodes only move in MobilityGraph.update_graph, which invalidates the cache.
+
+    The predicted positions of the nodes are memoized the same way, by (node, horizon): the sort keys of the
+    assignees predict the same user and fog nodes at the exec time of the task for every candidate.
+
+    The distances are kept by (node, other_node), in the order of the call sites, so a pair is never recomputed in a
+    tick. The cache counts its hits and misses and the time spent computing the misses, from which the time saved
+    by the hits is estimated.
+"""
+
+import time
+
+from Config import Config
+
+
+class DistanceCache:
+    def __init__(self):
+        self.distances = {}
+        self.positions = {}
+        self.hits = 0
+        self.misses = 0
+        self.compute_time = 0.0
+
+    def get(self, node, other_node):
+        key = (node, other_node)
+        distance = self.distances.get(key)
+        if distance is not None:
+            self.hits += 1
+            return distance
+        start = time.perf_counter()
+        distance = node.distance(other_node)
+        self.compute_time += time.perf_counter() - start
+        self.misses += 1
+        self.distances[key] = distance
+        return distance
+
+    def update(self, distances, compute_time):
+        """
+        Adds the distances computed at once for a batch of tasks, by (node, other_node). They are counted as misses.
+        """
+        self.distances.update(distances)
+        self.misses += len(distances)
+        self.compute_time += compute_time
+
+    def get_pred_x_y(self, node, exec_time_estimate):
+        key = (node, exec_time_estimate)
+        position = self.positions.get(key)
+        if position is None:
+            position = self.positions[key] = node.predict_x_y(exec_time_estimate)
+        return position
+
+    def invalidate(self):
+        self.distances = {}
+        self.positions = {}
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def time_saved(self):
+        """
+        Returns:
+            float: The estimated time saved by the hits, in seconds, at the average cost of a miss.
+        """
+        return self.hits * self.compute_time / self.misses if self.misses else 0.0
+
+
+cache = DistanceCache()
+
+
+def get_distance(node, other_node):
+    """
+    Returns:
+        float: The distance between the nodes, from the cache of the current tick if Config.DISTANCE_CACHE is set.
+    """
+    if Config.DISTANCE_CACHE:
+        return cache.get(node, other_node)
+    return node.distance(other_node)
+
+
+def get_pred_x_y(node, exec_time_estimate):
+    """
+    Returns:
+        tuple: The predicted (x, y) of the node after the given time, from the cache of the current tick if
+            Config.DISTANCE_CACHE is set.
+    """
+    if Config.DISTANCE_CACHE:
+        return cache.get_pred_x_y(node, exec_time_estimate)
+    return node.predict_x_y(exec_time_estimate)
@@ -1,5 +1,6 @@
 import time
 from Config import Config
+import DistanceCache
 
 '''
     The Evaluator class is used to track and log the performance of the system in handling tasks. 
@@ -13,6 +14,9 @@ from Config import Config
 class Evaluator:
     migrations_count = 0
     deadline_misses = 0
+    expired_tasks = 0
+    # the tasks whose creator was not in the trace anymore when they were released, never generated
+    skipped_tasks = 0
     total_tasks = 0
     cloud_tasks = 0
     fog_node_task_counts = {}
@@ -20,16 +24,34 @@ class Evaluator:
     deadline_misses_per_step = []
     current_step_migrations = 0
     current_step_deadline_misses = 0
+    q_table_sizes_per_step = []
+    q_table_state_evictions = 0
+    q_table_action_evictions = 0
+    nearest_state_searches = 0
+    learner_decisions = 0
+    accepted_offers = 0
+    matching_tasks = 0
+    matched_tasks = 0
+    matching_solves = 0
+    matching_solver_time = 0.0
 
     @staticmethod
     def log_evaluation():
         Evaluator.log_fog_node_task_counts()
+        Evaluator.log_q_table_sizes()
+        Evaluator.log_distance_cache()
+        Evaluator.log_matching()
         print("\nMetrics:")
         print(f"Total migrations:\t\t{Evaluator.migrations_count}")
         print(f"Total deadline misses:\t{Evaluator.deadline_misses}")
+        print(f"Total expired tasks:\t{Evaluator.expired_tasks}")
+        print(f"Total skipped tasks:\t{Evaluator.skipped_tasks}")
         print(f"Total cloud tasks:\t\t{Evaluator.cloud_tasks}")
         print(f"Total tasks:\t\t\t{Evaluator.total_tasks}")
+        print(f"Total accepted offers:\t{Evaluator.accepted_offers}")
         Evaluator.log_short_evaluation()
+        if Evaluator.total_tasks != 0:
+            print(f"Acceptance ratio:\t\t{'{:.3f}'.format(Evaluator.accepted_offers * 100 / Evaluator.total_tasks)}%")
 
     @staticmethod
     def log_short_evaluation():
@@ -61,6 +83,75 @@ class Evaluator:
         Evaluator.current_step_migrations = 0
         Evaluator.current_step_deadline_misses = 0
 
+    @staticmethod
+    def track_q_table_size(learners):
+        """
+        Keeps the total number of states and (state, action) entries of the q-tables, and the largest number of
+        actions of a single state, for the current step. Counting them takes a pass over all the states, so it is
+        only done every Config.Q_TABLE_SIZE_TRACKING_INTERVAL steps and on the last one.
+        """
+        interval = Config.Q_TABLE_SIZE_TRACKING_INTERVAL
+        # the other metrics of the current step are already tracked
+        step = len(Evaluator.migration_counts_per_step) - 1
+        if interval is None or (step % interval != 0 and step != Config.SIMULATION_DURATION - 1):
+            return
+        states_count = 0
+        entries_count = 0
+        max_actions_count = 0
+        for learner in learners:
+            actions_counts = learner.q_table.actions_counts()
+            states_count += len(actions_counts)
+            entries_count += sum(actions_counts)
+            max_actions_count = max(max_actions_count, max(actions_counts, default=0))
+        Evaluator.q_table_sizes_per_step.append((step, states_count, entries_count, max_actions_count))
+
+    @staticmethod
+    def log_distance_cache():
+        cache = DistanceCache.cache
+        if cache.hits + cache.misses == 0:
+            return
+        print(f"\nDistance cache:\t\t{cache.hits} hits, {cache.misses} misses"
+              f" ({'{:.3f}'.format(cache.hit_rate * 100)}% hit rate)")
+        print(f"Distance time saved:\t{'{:.6f}'.format(cache.time_saved)} s")
+
+    @staticmethod
+    def log_matching():
+        if Evaluator.matching_solves == 0:
+            return
+        print(f"\nMatched tasks:\t\t\t{Evaluator.matched_tasks} of {Evaluator.matching_tasks}"
+              f" ({'{:.3f}'.format(Evaluator.matched_tasks * 100 / Evaluator.matching_tasks)}% acceptance)")
+        print(f"Matching solver time:\t{'{:.6f}'.format(Evaluator.matching_solver_time)} s"
+              f" ({Evaluator.matching_solves} solves)")
+
+    @staticmethod
+    def log_q_table_sizes():
+        if len(Evaluator.q_table_sizes_per_step) == 0:
+            return
+        print("\nQ-table size (states, entries, max actions per state):")
+        samples_count = len(Evaluator.q_table_sizes_per_step)
+        for sample in sorted({0, samples_count // 4, samples_count // 2, 3 * samples_count // 4, samples_count - 1}):
+            step, states_count, entries_count, max_actions_count = Evaluator.q_table_sizes_per_step[sample]
+            print(f"\tStep {step}:\t{states_count}, {entries_count}, {max_actions_count}")
+        print(f"Evicted states:\t\t\t{Evaluator.q_table_state_evictions}")
+        print(f"Evicted actions:\t\t{Evaluator.q_table_action_evictions}")
+        if Evaluator.learner_decisions != 0:
+            searches_per_decision = Evaluator.nearest_state_searches / Evaluator.learner_decisions
+            print(f"Nearest state searches:\t{Evaluator.nearest_state_searches} "
+                  f"({'{:.3f}'.format(searches_per_decision)} per decision)")
+
+    @staticmethod
+    def increment_q_table_evictions(states_count=0, actions_count=0):
+        Evaluator.q_table_state_evictions += states_count
+        Evaluator.q_table_action_evictions += actions_count
+
+    @staticmethod
+    def increment_nearest_state_searches():
+        Evaluator.nearest_state_searches += 1
+
+    @staticmethod
+    def increment_learner_decisions():
+        Evaluator.learner_decisions += 1
+
     @staticmethod
     def update_task_count(id):
         if id not in Evaluator.fog_node_task_counts:
@@ -77,6 +168,28 @@ class Evaluator:
         Evaluator.current_step_deadline_misses += 1
         Evaluator.deadline_misses += 1
 
+    @staticmethod
+    def increment_expired_tasks():
+        Evaluator.expired_tasks += 1
+
+    @staticmethod
+    def increment_skipped_tasks():
+        Evaluator.skipped_tasks += 1
+
+    @staticmethod
+    def increment_accepted_offers():
+        Evaluator.accepted_offers += 1
+
+    @staticmethod
+    def add_matching_solve(tasks_count, solver_time):
+        Evaluator.matching_solves += 1
+        Evaluator.matching_tasks += tasks_count
+        Evaluator.matching_solver_time += solver_time
+
+    @staticmethod
+    def increment_matched_tasks():
+        Evaluator.matched_tasks += 1
+
 
 def timer_log(func):
     if not Config.ENABLE_TIMER_LOG:
@@ -31,6 +31,25 @@ class FogLayer:
         node.layer = Layer.Fog
         self.nodes.append(node)
 
+    def remove_node(self, node):
+        """
+        Removes a node that left the simulation from the fog layer.
+
+        Args:
+            node (Node): The node to be removed from the fog layer.
+        """
+        self.nodes.remove(node)
+
+    def get_fixed_nodes(self):
+        """
+        Retrieves the fog nodes that don't move, i.e. the ones that are not part of the mobility graph.
+
+        Returns:
+            list: A list of the fixed fog nodes in the fog layer.
+        """
+        moving_nodes = set(self.graph.get_moving_fog_nodes())
+        return [node for node in self.nodes if node not in moving_nodes]
+
     def get_nodes(self):
         """
         Retrieves the list of nodes currently in the fog layer.
@@ -4,7 +4,13 @@
 
     Attributes:
         nodes (list): A list of nodes currently in the graph.
-        graph (dict): A dictionary mapping time steps to nodes' positions.
+        nodes_by_id (dict): The nodes currently in the graph by their ID, the first one on duplicate IDs.
+        arrived_nodes (list): The nodes that entered the trace in the last time step.
+        departed_nodes (list): The nodes that left the trace in the last time step.
+        graph (TraceWindow): The time steps of the trace around the current one, read from the XML files as the
+            simulation goes, so the trace is never held in memory as a whole.
+        source (SumoXMLParser | ScenarioBundle): Where the scenario is read from, the compiled bundle of the XML
+            files when Config.SCENARIO_CACHE is set (see ScenarioCache).
         xml_path (str): Path to the XML file containing static vehicle data.
         mobile_xml_path (str): Path to the XML file containing mobile fog node data.
         task_file_path (str): Path to the XML file containing task data.
@@ -12,21 +18,75 @@
         zone_file_path (str): Path to the XML file containing zone data.
 
     Methods:
-        init_graph(): Initializes the graph by parsing XML files.
-        update_graph(): Updates the graph by moving to the next time step.
+        get_source(): Returns the parser of the XML files, or the scenario bundle compiled from them.
+        init_graph(): Initializes the graph by starting to stream the trace of the source.
+        update_graph(): Updates the graph by moving to the next time step, adding and removing the nodes that
+            enter or leave the trace.
         get_tasks(): Retrieves tasks from the task file.
+        get_task_schedule(): Retrieves the tasks from the task file, as a schedule sorted by creation time.
         get_fixed_fog_node(): Retrieves fixed fog nodes from the XML file.
         get_zones(): Retrieves zones from the XML file.
         get_user_nodes(): Retrieves user nodes currently in the graph.
         get_moving_fog_nodes(): Retrieves moving fog nodes currently in the graph.
         get_node(node_id): Retrieves a specific node by its ID.
+        add_node(node): Adds a node to the graph.
+        remove_node(node): Removes a node from the graph.
 """
 
+from collections import deque
+
+import numpy as np
+
+import DistanceCache
+import NodeStore
+import ScenarioCache
 from SumoXMLParser import SumoXMLParser
 from Clock import Clock
+from Config import Config
 from Node import Layer
 
 
+class TraceWindow:
+    """
+    A bounded window over a stream of (time, nodes) time steps in increasing order of time: the current time step
+    and at most lookahead time steps after it are kept, the earlier ones are dropped as the time goes on.
+    """
+
+    def __init__(self, timesteps, lookahead=Config.TRACE_LOOKAHEAD):
+        self.timesteps = iter(timesteps)
+        self.lookahead = lookahead
+        self.window = deque()
+        self.fill()
+
+    def fill(self):
+        while len(self.window) <= self.lookahead:
+            timestep = next(self.timesteps, None)
+            if timestep is None:
+                return
+            self.window.append(timestep)
+
+    def get_first_time(self):
+        """
+        Returns:
+            float: The time of the first time step in the window, None if the trace is over.
+        """
+        return self.window[0][0] if self.window else None
+
+    def get(self, time):
+        """
+        Moves the window to the given time, which must not be before the time of the previous call.
+
+        Returns:
+            list: The nodes of the time step, an empty list if the trace has no vehicle at that time.
+        """
+        while self.window and self.window[0][0] < time:
+            self.window.popleft()
+            self.fill()
+        if self.window and self.window[0][0] == time:
+            return self.window[0][1]
+        return []
+
+
 class MobilityGraph:
     def __init__(self, xml_path, mobile_xml_path, task_file_path, fixed_fog_node_file_path, zone_file_path) -> None:
         """
@@ -40,64 +100,107 @@ class MobilityGraph:
             zone_file_path (str): Path to the XML file containing zone data.
         """
         self.nodes = []
-        self.graph = {}
+        self.nodes_by_id = {}
+        self.arrived_nodes = []
+        self.departed_nodes = []
+        self.graph = None
         self.xml_path = xml_path
         self.mobile_xml_path = mobile_xml_path
         self.task_file_path = task_file_path
         self.fixed_fog_node_file_path = fixed_fog_node_file_path
         self.zone_file_path = zone_file_path
+        self.source = self.get_source()
         self.init_graph()
 
-    def init_graph(self):
+    def get_source(self):
         """
-        Initializes the graph by parsing the XML files and setting up the initial state.
+        Returns:
+            SumoXMLParser | ScenarioBundle: The parser of the XML files, or the bundle compiled from them.
         """
         parser = SumoXMLParser(file_path=self.xml_path, mobile_file_path=self.mobile_xml_path,
                                task_file_path=self.task_file_path,
                                fixed_fog_node_file_path=self.fixed_fog_node_file_path,
                                zone_file_path=self.zone_file_path)
-        self.graph = parser.parse()
-        Clock.time = min(self.graph.keys())
-        self.nodes = self.graph[Clock.time]
+        if Config.SCENARIO_CACHE:
+            return ScenarioCache.load_or_compile(parser)
+        return parser
+
+    def init_graph(self):
+        """
+        Initializes the graph by starting to stream the trace of the source and setting up the initial state.
+        """
+        self.graph = TraceWindow(self.source.iter_trace(), Config.TRACE_LOOKAHEAD)
+        Clock.time = self.graph.get_first_time()
+        if Clock.time is None:
+            error = f"No vehicles in {self.xml_path} and {self.mobile_xml_path}"
+            raise ValueError(error)
+        self.nodes = list(self.graph.get(Clock.time))
+        self.nodes_by_id = {}
+        for node in self.nodes:
+            self.nodes_by_id.setdefault(node.id, node)
 
     def update_graph(self):
         """
-        Updates the graph to the next time step and moves nodes accordingly.
+        Updates the graph to the next time step and moves nodes accordingly, in one pass over the nodes of the
+        time step and one vectorized copy of their positions in the node store. The nodes that are not in the time
+        step anymore are removed from the graph, and the ones that appear in it for the first time are added. They
+        are kept in departed_nodes and arrived_nodes until the next update, so the layers can follow. A time step
+        without any record, as past the end of the trace, keeps the nodes at their previous positions.
 
         Returns:
             list: A list of nodes after updating their positions.
         """
         Clock.time += 1
-        new_nodes = self.graph[Clock.time]
+        # the nodes move, so the distances and the predicted positions of the previous tick are stale
+        DistanceCache.cache.invalidate()
+        new_nodes_by_id = {}
+        for new_node in self.graph.get(Clock.time):
+            new_nodes_by_id.setdefault(new_node.id, new_node)
+
+        self.departed_nodes = []
+        if len(new_nodes_by_id) == 0:
+            # an empty time step is not the departure of every node
+            self.arrived_nodes = []
+            return self.nodes
+        slots = []
+        new_slots = []
         for node in self.nodes:
-            new_node = next((n for n in new_nodes if n.id == node.id), None)
-            if new_node is not None:
-                node.x = new_node.x
-                node.y = new_node.y
-                node.angle = new_node.angle
-                node.speed = new_node.speed
+            new_node = new_nodes_by_id.get(node.id)
+            if new_node is None:
+                self.departed_nodes.append(node)
+                continue
+            slots.append(node.slot)
+            new_slots.append(new_node.slot)
+        # the nodes of the trace are all kept in the shared store
+        data = NodeStore.store.data
+        slots = np.array(slots, dtype=np.int64)
+        new_slots = np.array(new_slots, dtype=np.int64)
+        # the velocities were computed once for the nodes of the time step, when they were created
+        for field in (NodeStore.X, NodeStore.Y, NodeStore.ANGLE, NodeStore.SPEED, NodeStore.VX, NodeStore.VY):
+            data[field, slots] = data[field, new_slots]
+        if self.departed_nodes:
+            departed_ids = {node.id for node in self.departed_nodes}
+            self.nodes = [node for node in self.nodes if node.id not in departed_ids]
+            for node_id in departed_ids:
+                del self.nodes_by_id[node_id]
+
+        self.arrived_nodes = [new_node for node_id, new_node in new_nodes_by_id.items()
+                              if node_id not in self.nodes_by_id]
+        for node in self.arrived_nodes:
+            self.add_node(node)
         return self.nodes
 
     def get_tasks(self):
-        parser = SumoXMLParser(file_path=self.xml_path, mobile_file_path=self.mobile_xml_path,
-                               task_file_path=self.task_file_path,
-                               fixed_fog_node_file_path=self.fixed_fog_node_file_path,
-                               zone_file_path=self.zone_file_path)
-        return parser.parse_task()
+        return self.source.parse_task()
+
+    def get_task_schedule(self):
+        return self.source.parse_task_schedule()
 
     def get_fixed_fog_node(self):
-        parser = SumoXMLParser(file_path=self.xml_path, mobile_file_path=self.mobile_xml_path,
-                               task_file_path=self.task_file_path,
-                               fixed_fog_node_file_path=self.fixed_fog_node_file_path,
-                               zone_file_path=self.zone_file_path)
-        return parser.parse_fixed_fog_node()
+        return self.source.parse_fixed_fog_node()
 
     def get_zones(self):
-        parser = SumoXMLParser(file_path=self.xml_path, mobile_file_path=self.mobile_xml_path,
-                               task_file_path=self.task_file_path,
-                               fixed_fog_node_file_path=self.fixed_fog_node_file_path,
-                               zone_file_path=self.zone_file_path)
-        return parser.parse_zone()
+        return self.source.parse_zone()
 
     def get_user_nodes(self):
         return [node for node in self.nodes if node.layer == Layer.Users]
@@ -106,7 +209,28 @@ class MobilityGraph:
         return [node for node in self.nodes if node.layer == Layer.Fog]
 
     def get_node(self, node_id):
-        for node in self.nodes:
-            if node.id == node_id:
-                return node
-        return None
+        return self.nodes_by_id.get(node_id)
+
+    def add_node(self, node):
+        """
+        Adds a node to the graph and to the ID registry.
+
+        Args:
+            node (Node): The node entering the simulation.
+        """
+        self.nodes.append(node)
+        self.nodes_by_id.setdefault(node.id, node)
+
+    def remove_node(self, node):
+        """
+        Removes a node from the graph and from the ID registry.
+
+        Args:
+            node (Node): The node leaving the simulation.
+        """
+        self.nodes.remove(node)
+        if self.nodes_by_id.get(node.id) is node:
+            del self.nodes_by_id[node.id]
+            other_node = next((other for other in self.nodes if other.id == node.id), None)
+            if other_node is not None:
+                self.nodes_by_id[node.id] = other_node
@@ -1,10 +1,18 @@
+import bisect
+import heapq
 import random
 import numpy as np
 import math
 import json
+import re
+import weakref
 from Task import Task
 from Config import Config
-from Evaluater import timer_log
+from Evaluater import Evaluator, timer_log
+from StateIndex import make_state_index
+import QTableStore
+from QTableEngine import make_q_table
+import NodeStore
 
 is_iman = Config.IS_IMAN
 discrete_levels = Config.DISCRETE_LEVELS
@@ -13,6 +21,42 @@ def discretize(value, bins):
     return np.digitize(value, bins)
 
 
+class StateQuantizer:
+    """
+    Discretizes the data of the tasks and fog nodes into the levels of the states.
+    The bin edges are built once, and the result is made of plain ints, equal to the ones of discretize.
+    """
+    # (lower bound, upper bound) of the values of task data and fog node data, in the order of the state tuples
+    TASK_RANGES = ((0, 3), (0, 3), (0, 100), (0, 10), (0, 10), (0, 3), (0, 360))
+    FOG_NODE_RANGES = ((0, 10), (0, 10), (0, 3), (0, 360), (0, 20))
+    FOG_NODE_FIELDS = [NodeStore.X, NodeStore.Y, NodeStore.SPEED, NodeStore.ANGLE, NodeStore.POWER]
+
+    def __init__(self, levels=discrete_levels):
+        self.task_bins = [np.linspace(low, high, levels).tolist() for low, high in self.TASK_RANGES]
+        self.fog_node_bins = [np.linspace(low, high, levels) for low, high in self.FOG_NODE_RANGES]
+        self.fog_node_bin_lists = [bins.tolist() for bins in self.fog_node_bins]
+
+    def task_data(self, task):
+        values = (task.power_needed, task.size, task.deadline, task.creator.x, task.creator.y, task.creator.speed,
+                  task.creator.angle)
+        # for increasing bins, np.digitize(value, bins) is the number of bin edges that are <= value
+        return tuple(bisect.bisect_right(bins, value) for value, bins in zip(values, self.task_bins))
+
+    def fog_node_data(self, x, y, speed, angle, power):
+        values = (x, y, speed, angle, power)
+        return tuple(bisect.bisect_right(bins, value) for value, bins in zip(values, self.fog_node_bin_lists))
+
+    def fog_nodes_data(self, fog_nodes):
+        if len(fog_nodes) == 0:
+            return []
+        # the fog nodes of a zone are views over the same node store, so their data is read in one go
+        values = fog_nodes[0].store.gather(self.FOG_NODE_FIELDS, fog_nodes)
+        levels = [np.digitize(values[:, i], bins).tolist() for i, bins in enumerate(self.fog_node_bins)]
+        return list(zip(*levels))
+
+
+quantizer = StateQuantizer()
+
 ''' 
 State class:
 
@@ -32,6 +76,23 @@ class State:
     def __init__(self, fog_nodes_data, task_data):
         self.fog_nodes_data = fog_nodes_data
         self.task_data = task_data
+        self.key = State.make_key(fog_nodes_data, task_data)
+
+    @staticmethod
+    def make_key(fog_nodes_data, task_data):
+        """
+        Builds the canonical key of a state. The fog nodes are kept as a sorted multiset, so two states that only
+        differ in the order of their fog nodes share the same key (the distance of states is order-independent too).
+        """
+        return tuple(sorted(map(tuple, fog_nodes_data))), tuple(task_data)
+
+    def __eq__(self, other):
+        if not isinstance(other, State):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
 
     @staticmethod
     @timer_log
@@ -39,37 +100,18 @@ class State:
         """
         This method is used to get the data of a task in a discretized form.
         """
-        task_data = (
-            # task.name,
-            discretize(task.power_needed, np.linspace(0, 3, discrete_levels)),
-            discretize(task.size, np.linspace(0, 3, discrete_levels)),
-            discretize(task.deadline, np.linspace(0, 100, discrete_levels)),
-            discretize(task.creator.x, np.linspace(0, 10, discrete_levels)),
-            discretize(task.creator.y, np.linspace(0, 10, discrete_levels)),
-            discretize(task.creator.speed, np.linspace(0, 3, discrete_levels)),
-            discretize(task.creator.angle, np.linspace(0, 360, discrete_levels))
-        )
-        return task_data
+        return quantizer.task_data(task)
 
     @staticmethod
     @timer_log
     def get_fog_nodes_data(fog_nodes):
-        fog_nodes_data = []
-        for fog_node in fog_nodes:
-            fog_node_data = (
-                # fog_node.id,
-                discretize(fog_node.x, np.linspace(0, 10, discrete_levels)),
-                discretize(fog_node.y, np.linspace(0, 10, discrete_levels)),
-                discretize(fog_node.speed, np.linspace(0, 3, discrete_levels)),
-                discretize(fog_node.angle, np.linspace(0, 360, discrete_levels)),
-                discretize(fog_node.power, np.linspace(0, 20, discrete_levels))
-            )
-            fog_nodes_data.append(fog_node_data)
-        return fog_nodes_data
+        return quantizer.fog_nodes_data(fog_nodes)
 
     @staticmethod
     @timer_log
     def from_str(state_str):
+        # q-tables saved while the levels were NumPy scalars have them written as np.int64(level)
+        state_str = re.sub(r"np\.int64\((-?\d+)\)", r"\1", state_str)
         state_str = state_str.replace("State: [", "").replace("(", "")
         fog_nodes_data_str, task_data_str = state_str.split("], ")
         task_data_str = task_data_str.replace("(", "").replace(")", "")
@@ -94,10 +136,20 @@ Action class:
 An action is a decision of assigning a task to a fog node. We only keep the general properties of the fog node in the action.
 The action class has the following attributes:
     (id, x, y, speed, angle, power)
+Two actions are equal when they have the same fog node id and the same quantized (x, y, speed, angle, power), the
+levels being the ones of the fog nodes data of the states. Actions are interned on that key, so repeated decisions
+for the same fog node in the same situation hit the same q-table entry. The intern table only holds the actions
+weakly: once an action is evicted from the q-tables and no task refers to it anymore, its entry goes away.
+The raw (x, y, speed, angle, power) of an interned action are the ones of the first fog node seen with its key, so
+they are only representative of its quantization levels: they are what __str__ and the saved q-tables show, and
+they load back to the same key.
 '''
 
 
 class Action:
+    # canonical key -> the action in use for that key, released when nothing else refers to it
+    interned = weakref.WeakValueDictionary()
+
     def __init__(self, id, x, y, speed, angle, power):
         self.id = id
         self.x = x
@@ -105,12 +157,27 @@ class Action:
         self.speed = speed
         self.angle = angle
         self.power = power
+        self.key = (id,) + quantizer.fog_node_data(x, y, speed, angle, power)
+
+    def __eq__(self, other):
+        if not isinstance(other, Action):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    @staticmethod
+    def intern(action):
+        return Action.interned.setdefault(action.key, action)
 
     @staticmethod
     @timer_log
     def from_fog_node(fog_node):
-        return Action(fog_node.id, fog_node.x, fog_node.y, fog_node.speed, fog_node.angle, fog_node.power)
+        return Action.intern(
+            Action(fog_node.id, fog_node.x, fog_node.y, fog_node.speed, fog_node.angle, fog_node.power))
 
+    # the raw fields are representative of the key only, see the docstring of the class
     def __str__(self):
         return f"Action: {self.id}, {self.x}, {self.y}, {self.speed}, {self.angle}, {self.power}"
 
@@ -122,7 +189,7 @@ class Action:
     def from_str(action_str):
         action_str = action_str.replace("Action: ", "")
         id, x, y, speed, angle, power = action_str.split(", ")
-        return Action(id, float(x), float(y), float(speed), float(angle), float(power))
+        return Action.intern(Action(id, float(x), float(y), float(speed), float(angle), float(power)))
 
 
 '''
@@ -156,12 +223,21 @@ class Learner:
         #   (task_name, task_power_needed, task_size, task_deadline, task_creator_x, task_creator_y, task_creator_speed, task_creator_angle)
         # actions are the fog nodes that the learner can assign the task to
         if Config.OFFLINE_MODE:
-            self.q_table = {}
+            self.q_table = make_q_table(Config.Q_TABLE_ENGINE)
         else:
-            if is_iman:
-                self.q_table = self.load_q_table(f'Code/data/{zone_manager_name}_q_table.txt')
-            else:
-                self.q_table = self.load_q_table(f'./data/{zone_manager_name}_q_table.txt')
+            self.q_table = make_q_table(Config.Q_TABLE_ENGINE,
+                                        self.load_q_table(self.get_q_table_path(zone_manager_name)))
+        # the states of the q-table in padded arrays, used for finding the nearest state in one batched call
+        self.state_index = make_state_index(Config.Q_LEARNING_STATE_INDEX, self.q_table.keys())
+        # usage of the states, used for choosing the states to evict when the q-table is full
+        self.state_visits = {}
+        self.state_last_visits = {}
+        self.visits_count = 0
+        self.evicted_states_count = 0
+        self.evicted_actions_count = 0
+        # query state -> (nearest state, distance), for the current decision while the q-table isn't changed
+        self.resolution_cache = {}
+        self.enforce_states_capacity()
 
         self.alpha = 0.1
         self.gamma = 0.6
@@ -172,37 +248,141 @@ class Learner:
         return task.creation_state
 
     def exist_state(self, state):
-        nearest_state = self.find_nearest_state(state)
-        if nearest_state is None:
-            return False
-        distance = self.calculate_distance_of_states(state, nearest_state)
-        return distance == 0
+        return self.find_existing_state(state) is not None
+
+    @timer_log
+    def find_existing_state(self, state):
+        """
+        This method is used to find the stored state that is at distance 0 of the given state.
+        An exact hit is answered by the dict index in O(1), the nearest state scan only runs on a true miss.
+        :return: the stored state, or None if there is no such state in the q-table
+        """
+        if state in self.q_table:
+            return state
+        nearest_state, distance = self.search_nearest_state(state)
+        if nearest_state is None or distance != 0:
+            return None
+        return nearest_state
+
+    @timer_log
+    def resolve_state(self, state):
+        """
+        This method is used to get the stored state that the given state is mapped to.
+        :return: the state itself on an exact hit, otherwise the nearest stored state within the distance threshold
+        """
+        if state in self.q_table:
+            return state
+        return self.find_nearest_state(state)
+
+    @timer_log
+    def search_nearest_state(self, state):
+        """
+        This method is used to run the nearest state search of the state index, at most once per query state
+        within a decision: the result is kept until the next decision starts or the states of the q-table change.
+        :return: a tuple of (nearest state within the distance threshold or None, distance)
+        """
+        if Config.Q_LEARNING_RESOLUTION_CACHE and state in self.resolution_cache:
+            return self.resolution_cache[state]
+        Evaluator.increment_nearest_state_searches()
+        result = self.state_index.find_nearest(state, Config.Q_LEARNING_NEAREST_STATE_DISTANCE_THRESHOLD)
+        if Config.Q_LEARNING_RESOLUTION_CACHE:
+            self.resolution_cache[state] = result
+        return result
+
+    def start_decision(self):
+        """
+        Counts a decision (a suggestion or an update of the q-table) and starts it with an empty resolution cache.
+        """
+        self.resolution_cache = {}
+        Evaluator.increment_learner_decisions()
+
+    def add_state(self, state):
+        self.resolution_cache = {}
+        self.q_table[state] = {}
+        self.state_index.add(state)
+        self.visit_state(state)
+        self.enforce_states_capacity(keep=state)
+
+    def remove_state(self, state):
+        self.resolution_cache = {}
+        del self.q_table[state]
+        self.state_index.remove(state)
+        self.state_visits.pop(state, None)
+        self.state_last_visits.pop(state, None)
+
+    def visit_state(self, state):
+        self.visits_count += 1
+        self.state_visits[state] = self.state_visits.get(state, 0) + 1
+        self.state_last_visits[state] = self.visits_count
+
+    def enforce_states_capacity(self, keep=None):
+        """
+        Evicts states when the q-table has more than Config.Q_TABLE_MAX_STATES states.
+        The least recently used (or least visited) states are evicted in one batch, down to
+        Config.Q_TABLE_EVICTION_LOW_WATERMARK of the capacity, so the cost of choosing them is amortized over
+        the following insertions.
+        :param keep: a state that must not be evicted, e.g. the one that was just inserted
+        """
+        max_states = Config.Q_TABLE_MAX_STATES
+        if max_states is None or len(self.q_table) <= max_states:
+            return
+        if Config.Q_TABLE_EVICTION_POLICY == "lru":
+            usage = self.state_last_visits
+        elif Config.Q_TABLE_EVICTION_POLICY == "visits":
+            usage = self.state_visits
+        else:
+            error = f"Invalid q-table eviction policy: {Config.Q_TABLE_EVICTION_POLICY}"
+            raise ValueError(error)
+        target = min(max_states, int(max_states * Config.Q_TABLE_EVICTION_LOW_WATERMARK))
+        candidates = (state for state in self.q_table if state is not keep)
+        victims = heapq.nsmallest(len(self.q_table) - target, candidates, key=lambda state: usage.get(state, 0))
+        for state in victims:
+            self.remove_state(state)
+        self.evicted_states_count += len(victims)
+        Evaluator.increment_q_table_evictions(states_count=len(victims))
+
+    def enforce_actions_capacity(self, state, keep=None):
+        """
+        Keeps only the Config.Q_TABLE_MAX_ACTIONS_PER_STATE actions of the state with the highest q-values.
+        :param keep: an action that must not be evicted, e.g. the one that was just updated
+        """
+        max_actions = Config.Q_TABLE_MAX_ACTIONS_PER_STATE
+        actions = self.q_table[state]
+        if max_actions is None or len(actions) <= max_actions:
+            return
+        candidates = (action for action in actions if action is not keep)
+        victims = heapq.nsmallest(len(actions) - max_actions, candidates, key=actions.get)
+        for action in victims:
+            del actions[action]
+        self.evicted_actions_count += len(victims)
+        Evaluator.increment_q_table_evictions(actions_count=len(victims))
 
     @timer_log
     def get_from_fog_nodes_and_task(self, fog_nodes, task):
+        # not a decision of its own: the cached resolutions stay valid until the states of the q-table change
         fog_nodes_data = State.get_fog_nodes_data(fog_nodes)
         task_data = State.get_task_data(task)
         state = State(fog_nodes_data, task_data)
-        if self.exist_state(state):
-            state = self.find_nearest_state(state)
+        existing_state = self.find_existing_state(state)
+        if existing_state is not None:
+            state = existing_state
         return state
 
     @timer_log
-    def get_suggested_assignee(self, all_fog_nodes, possible_fog_nodes, task):
+    def get_suggested_assignee(self, all_fog_nodes, possible_fog_nodes, task, fog_nodes_by_id=None):
         """
         This method is used to get the suggested assignee for a task based on the current state of the zone manager and the q-table.
         :param all_fog_nodes: all the fog nodes in the zone manager, used for creating the state
         :param possible_fog_nodes: the fog nodes that the task creator can reach, used for getting the suggested assignee
         :param task: the task that the zone manager is making a decision about
+        :param fog_nodes_by_id: the fog nodes of the zone manager by their id, used for finding the assignee in O(1)
         :return: the suggested assignee for the task
         """
         if possible_fog_nodes is None or len(possible_fog_nodes) == 0:
             return None
+        self.start_decision()
         # note that we should only pass the fog nodes that are in range of the task creator
         state = self.get_from_fog_nodes_and_task(all_fog_nodes, task)
-        if Config.OFFLINE_MODE:
-            if not self.exist_state(state):
-                self.q_table[state] = {}
         if self.epsilon > 0 and random.random() < self.epsilon:
             return random.choice(possible_fog_nodes)
         best_action = self.get_best_q_entry(state, possible_fog_nodes)
@@ -210,11 +390,13 @@ class Learner:
             # This means that the learner has not seen this state before
             # or by any reason, it has no action for this state. The zone manager should handle this case
             return None
-        fog_node = self.get_node_by_id(best_action.id, all_fog_nodes)
+        fog_node = self.get_node_by_id(best_action.id, all_fog_nodes, fog_nodes_by_id)
         return fog_node
 
     @timer_log
-    def get_node_by_id(self, node_id, all_fog_nodes):
+    def get_node_by_id(self, node_id, all_fog_nodes, fog_nodes_by_id=None):
+        if fog_nodes_by_id is not None:
+            return fog_nodes_by_id.get(node_id)
         for node in all_fog_nodes:
             if node.id == node_id:
                 return node
@@ -230,10 +412,12 @@ class Learner:
         :return: the q-value of the state-action pair
                 if the state-action pair is not in the q-table, and nearest action isn't also to be considered, it returns 0
         """
-        if not self.exist_state(state):
-            self.q_table[state] = {}
-        else:
-            state = self.find_nearest_state(state)
+        existing_state = self.find_existing_state(state)
+        if existing_state is None:
+            # unknown states are only added to the q-table when they are updated
+            return 0
+        state = existing_state
+        self.visit_state(state)
         if action not in self.q_table[state]:
             if find_nearest_action:
                 nearest_action = self.find_nearest_action(state, action)
@@ -242,20 +426,17 @@ class Learner:
                 else:
                     return 0
             else:
-                self.q_table[state][action] = 0
+                return 0
         return self.q_table[state][action]
 
     @timer_log
     def get_max_q_value(self, state):
-        if not self.exist_state(state):
-            self.q_table[state] = {}
+        existing_state = self.find_existing_state(state)
+        if existing_state is None:
             return 0
-        else:
-            state = self.find_nearest_state(state)
-        if len(self.q_table[state].values()) == 0:
-            return 0
-
-        return max(self.q_table[state].values())
+        state = existing_state
+        self.visit_state(state)
+        return self.q_table.max_value(state)
 
     @timer_log
     def get_best_q_entry(self, state, possible_fog_nodes=None):
@@ -265,45 +446,36 @@ class Learner:
         :param possible_fog_nodes: the fog nodes that the task creator can reach
         :return: the best action for the state
         """
-        if not self.exist_state(state):
-            nearest_state = self.find_nearest_state(state)
-            if nearest_state:
-                state = nearest_state
-            else:
-                self.q_table[state] = {}
-        if self.q_table[state] == {}:
+        resolved_state = self.resolve_state(state)
+        if resolved_state is None:
+            return None
+        state = resolved_state
+        self.visit_state(state)
+        if len(self.q_table[state]) == 0:
             return None
         if possible_fog_nodes is None:
-            return max(self.q_table[state], key=self.q_table[state].get)
+            return self.q_table.best_action(state)
         else:
+            actions = [Action.from_fog_node(node) for node in possible_fog_nodes]
+            # the q-values of the candidates in one lookup, the nearest action is only searched for the unknown ones
+            q_values = self.q_table.values_of(state, actions)
             best_q_value = float('-inf')
             best_action = None
-            for node in possible_fog_nodes:
-                action = Action.from_fog_node(node)
-                # if action not in self.q_table[state]:
-                #     continue
-                q_value = self.get_q_value(state, action, find_nearest_action=True)
+            for action, q_value in zip(actions, q_values):
+                if q_value is None:
+                    nearest_action = self.find_nearest_action(state, action)
+                    q_value = self.q_table[state][nearest_action] if nearest_action else 0
                 if q_value > best_q_value:
                     best_q_value = q_value
                     best_action = action
             if best_action is None:
-                return max(self.q_table[state], key=self.q_table[state].get)
+                return self.q_table.best_action(state)
             return best_action
 
     @timer_log
     def find_nearest_state(self, state):
-        nearest_state = None
-        min_distance = float('inf')
-        # for existing_state in self.q_table.keys() - {state}:
-        for existing_state in self.q_table.keys():
-            distance = self.calculate_distance_of_states(state, existing_state)
-            if distance < min_distance:
-                min_distance = distance
-                nearest_state = existing_state
-        if min_distance <= Config.Q_LEARNING_NEAREST_STATE_DISTANCE_THRESHOLD:
-            return nearest_state
-        else:
-            return None
+        nearest_state, _ = self.search_nearest_state(state)
+        return nearest_state
 
     @timer_log
     def calculate_distance_of_states(self, state1, state2):
@@ -356,12 +528,17 @@ class Learner:
         :param reward: the reward of the action
         :param next_state: the state of zone manager after the task is done
         """
+        self.start_decision()
         q_value = self.get_q_value(state, action)
         max_q_value = self.get_max_q_value(next_state)
         new_q_value = q_value + self.alpha * (reward + self.gamma * max_q_value - q_value)
-        if self.exist_state(state):
-            state = self.find_nearest_state(state)
+        existing_state = self.find_existing_state(state)
+        if existing_state is not None:
+            state = existing_state
+        else:
+            self.add_state(state)
         self.q_table[state][action] = new_q_value
+        self.enforce_actions_capacity(state, keep=action)
 
     @timer_log
     def update_q_table_by_finished_task(self, task, next_state, reward):
@@ -369,8 +546,18 @@ class Learner:
         action = task.assigned_action
         self.update_q_table(state=state, action=action, reward=reward, next_state=next_state)
 
+    @staticmethod
+    def get_q_table_path(zone_manager_name):
+        data_dir = 'Code/data/' if is_iman else './data/'
+        if Config.Q_TABLE_FORMAT == "binary":
+            return f'{data_dir}{zone_manager_name}_q_table{QTableStore.EXTENSION}'
+        return f'{data_dir}{zone_manager_name}_q_table.txt'
+
     @timer_log
     def save_q_table(self, file_path):
+        if QTableStore.is_binary_path(file_path):
+            QTableStore.save(self.q_table, file_path)
+            return
         nested_q_table = self.convert_q_table(self.q_table)
         with open(file_path, 'w') as file:
             json.dump(nested_q_table, file, indent=4)
@@ -380,6 +567,13 @@ class Learner:
         """
         Used for loading the q-table from a file that was filled in the offline phase
         """
+        if QTableStore.is_binary_path(file_path):
+            return QTableStore.load(file_path)
+        return self.load_json_q_table(file_path)
+
+    @staticmethod
+    @timer_log
+    def load_json_q_table(file_path):
         q_table = {}
         with open(file_path, 'r') as file:
             nested_q_table = json.load(file)
@@ -387,7 +581,8 @@ class Learner:
                 state = State.from_str(state_str)
                 if entry == {}:
                     continue
-                q_table[state] = {}
+                # states that only differ in the order of their fog nodes share the same entry
+                q_table.setdefault(state, {})
                 for action_str, q_value in entry.items():
                     action = Action.from_str(action_str)
                     if q_value != 0:
@@ -1,6 +1,7 @@
 """
     Node class representing any computational resource in the system.
     Nodes can belong to different layers, such as Users, Fog, or Cloud.
+    A node is a view over a slot of a NodeStore, which keeps its numeric attributes in columnar NumPy arrays.
 
     Attributes:
         id (int): The unique identifier of the node.
@@ -9,22 +10,30 @@
         x (float): The X-coordinate of the node's position.
         y (float): The Y-coordinate of the node's position.
         speed (float): The speed of the node (for mobile nodes).
-        angle (float): The direction in which the node is moving.
+        angle (float): The direction in which the node is moving, in degrees.
+        vx (float): The velocity of the node along X, derived from its speed and angle.
+        vy (float): The velocity of the node along Y, derived from its speed and angle.
         coverage_radius (float): The coverage radius of the node.
-        tasks (list): A list of tasks assigned to this node.
+        tasks (list): A list of tasks assigned to this node, created on first use.
+        store (NodeStore): The store of the numeric attributes of the node.
+        slot (int): The index of the node in the arrays of the store.
 
     Methods:
         distance(other_node): Calculates the distance between this node and another node.
         distance_by_x_y(x, y): Calculates the distance between this node and a given (x, y) coordinate.
         distance_in_future(other_node, exec_time_estimate): Predicts the future distance between this node and another node.
-        append_task(task): Appends a task to the node's task list and updates the node's power.
+        append_task(task): Appends a task to the node's task list, updates the node's power and schedules the
+            completion of the task.
+        get_finish_time(task): Calculates the time at which the node finishes a task, from the current positions.
         generate_task(task_data): Generates a task based on the provided task data.
         is_in_range(x, y): Checks if a given (x, y) coordinate is within the node's coverage range.
         is_in_range_in_future(x, y, exec_time_estimate): Checks if a given (x, y) coordinate will be in range in the future.
         deliver_task_result(task): Delivers the result of a task and checks if the deadline is missed.
         is_done(task): Checks if a task is completed based on the current time.
-        remove_task(task): Removes a task from the node's task list and updates the node's power.
-        get_pred_x_y(exec_time_estimate): Predicts the future (x, y) position of the node.
+        remove_task(task): Removes a task from the node's task list, updates the node's power, cancels the
+            completion of the task and publishes the freed power.
+        get_pred_x_y(exec_time_estimate): Predicts the future (x, y) position of the node, memoized for the tick.
+        predict_x_y(exec_time_estimate): Computes the future (x, y) position of the node from its velocity.
 """
 
 import math
@@ -33,6 +42,11 @@ from Clock import Clock
 from Evaluater import Evaluator
 from Config import Config
 from Learner import Action
+import NodeStore
+from NodeStore import node_field, motion_field
+import CompletionScheduler
+import TaskQueue
+import DistanceCache
 
 
 class Layer:
@@ -42,8 +56,19 @@ class Layer:
 
 
 class Node:
+    __slots__ = ("id", "layer", "store", "slot", "_tasks", "__weakref__")
+
+    x = node_field(NodeStore.X)
+    y = node_field(NodeStore.Y)
+    speed = motion_field(NodeStore.SPEED)
+    angle = motion_field(NodeStore.ANGLE)
+    vx = node_field(NodeStore.VX)
+    vy = node_field(NodeStore.VY)
+    power = node_field(NodeStore.POWER)
+    coverage_radius = node_field(NodeStore.COVERAGE_RADIUS)
+
     def __init__(self, id, layer, power=Config.FOG_POWER, x=0, y=0, coverage_radius=Config.FOG_COVERAGE_RADIUS, speed=0,
-                 angle=0):
+                 angle=0, store=None):
         """
         Initializes a new Node instance.
 
@@ -55,17 +80,28 @@ class Node:
             y (float, optional): The Y-coordinate of the node. Defaults to 0.
             coverage_radius (float, optional): The coverage radius of the node. Defaults to Config.FOG_COVERAGE_RADIUS.
             speed (float, optional): The speed of the node (for mobile nodes). Defaults to 0.
-            angle (float, optional): The direction in which the node is moving. Defaults to 0.
+            angle (float, optional): The direction in which the node is moving, in degrees. Defaults to 0.
+            store (NodeStore, optional): The store of the node. Defaults to the shared NodeStore.store.
         """
         self.id = id
         self.layer = layer
-        self.power = power
-        self.x = x
-        self.y = y
-        self.speed = speed
-        self.coverage_radius = coverage_radius
-        self.angle = angle
-        self.tasks = []
+        self.store = store if store is not None else NodeStore.store
+        self.slot = self.store.allocate()
+        self.store.set(self.slot, x=x, y=y, speed=speed, angle=angle, power=power, coverage_radius=coverage_radius)
+        self._tasks = None
+
+    def __del__(self):
+        # the slot is missing when __init__ failed before allocating it
+        slot = getattr(self, "slot", None)
+        if slot is not None:
+            self.store.release(slot)
+
+    @property
+    def tasks(self):
+        # most of the nodes of the trace never get a task, so their list is only created when needed
+        if self._tasks is None:
+            self._tasks = []
+        return self._tasks
 
     def __repr__(self):
         return f"Node(id={self.id}, x={self.x}, y={self.y})"
@@ -98,6 +134,7 @@ class Node:
         task.set_assignee(node=self, action=Action.from_fog_node(self))
         self.tasks.append(task)
         self.power -= task.power_needed
+        CompletionScheduler.scheduler.push(self, task, self.get_finish_time(task))
 
     def generate_task(self, task_data):
         task = Task(
@@ -127,11 +164,13 @@ class Node:
             print(f"Task {task.name} is done but delivered late!")
             Evaluator.increment_deadline_misses()
 
-    def is_done(self, task):
-        distance = self.distance(task.creator)
+    def get_finish_time(self, task):
+        distance = DistanceCache.get_distance(self, task.creator)
         is_cloud = self.layer == Layer.Cloud
-        if Clock.time >= (task.creation_time + self.get_exec_time(distance, task, is_cloud=is_cloud,
-                                                                  is_migrated=task.is_migrated)):
+        return task.creation_time + self.get_exec_time(distance, task, is_cloud=is_cloud, is_migrated=task.is_migrated)
+
+    def is_done(self, task):
+        if Clock.time >= self.get_finish_time(task):
             task.set_result("Random Result")
             return True
         return False
@@ -139,11 +178,14 @@ class Node:
     def remove_task(self, task):
         self.tasks.remove(task)
         self.power += task.power_needed
+        CompletionScheduler.scheduler.cancel(task)
+        TaskQueue.capacity_events.publish_node(self)
 
     def get_pred_x_y(self, exec_time_estimate):
-        pred_x = self.x + self.speed * exec_time_estimate * math.cos(math.radians(self.angle))
-        pred_y = self.y + self.speed * exec_time_estimate * math.sin(math.radians(self.angle))
-        return pred_x, pred_y
+        return DistanceCache.get_pred_x_y(self, exec_time_estimate)
+
+    def predict_x_y(self, exec_time_estimate):
+        return self.x + self.vx * exec_time_estimate, self.y + self.vy * exec_time_estimate
 
     @staticmethod
     def get_exec_time(distance, task, is_cloud, is_migrated):
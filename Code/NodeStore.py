@@ -0,0 +1,137 @@
+"""
+    Columnar storage of the numeric data of the nodes: one float64 array per field (x, y, speed, angle, power,
+    coverage_radius, vx, vy), indexed by the slot of the node. Node objects are views over a slot of the store, so the
+    existing code keeps reading and writing node.x, while hot paths like MobilityGraph.update_graph work on
+    whole arrays at once.
+
+    The velocity vector (vx, vy) of a node is derived from its speed and angle (in degrees) whenever they are set, so
+    the predictions of the positions don't need any trigonometry. MobilityGraph.update_graph copies it along with
+    the positions of the tick.
+
+    The arrays grow by doubling, so the slots of the nodes stay valid but the arrays themselves must not be kept
+    across the creation of nodes. The slot of a node is released when the node is garbage collected.
+"""
+
+import math
+
+import numpy as np
+
+FIELDS = ("x", "y", "speed", "angle", "power", "coverage_radius", "vx", "vy")
+X, Y, SPEED, ANGLE, POWER, COVERAGE_RADIUS, VX, VY = range(len(FIELDS))
+
+
+class NodeStore:
+    def __init__(self, capacity=1024):
+        # one row per field, so every field is a contiguous array over the slots
+        self.data = np.zeros((len(FIELDS), capacity), dtype=np.float64)
+        self.free_slots = []
+        self.slots_count = 0
+
+    @property
+    def capacity(self):
+        return self.data.shape[1]
+
+    @property
+    def nodes_count(self):
+        return self.slots_count - len(self.free_slots)
+
+    def allocate(self):
+        if self.free_slots:
+            return self.free_slots.pop()
+        if self.slots_count == self.capacity:
+            grown = np.zeros((len(FIELDS), self.capacity * 2), dtype=np.float64)
+            grown[:, :self.capacity] = self.data
+            self.data = grown
+        slot = self.slots_count
+        self.slots_count += 1
+        return slot
+
+    def set(self, slot, x, y, speed, angle, power, coverage_radius):
+        angle_radians = math.radians(angle)
+        self.data[:, slot] = (x, y, speed, angle, power, coverage_radius, speed * math.cos(angle_radians),
+                              speed * math.sin(angle_radians))
+
+    def update_velocity(self, slot):
+        speed = self.data.item(SPEED, slot)
+        angle_radians = math.radians(self.data.item(ANGLE, slot))
+        self.data[VX, slot] = speed * math.cos(angle_radians)
+        self.data[VY, slot] = speed * math.sin(angle_radians)
+
+    def release(self, slot):
+        self.data[:, slot] = 0
+        self.free_slots.append(slot)
+
+    def column(self, field):
+        return self.data[field, :self.slots_count]
+
+    def gather(self, fields, nodes):
+        """
+        Returns:
+            np.ndarray: The given fields of the nodes, one row per node, in one vectorized read.
+        """
+        slots = np.fromiter((node.slot for node in nodes), dtype=np.int64, count=len(nodes))
+        return self.data[np.ix_(fields, slots)].T
+
+    @property
+    def x(self):
+        return self.column(X)
+
+    @property
+    def y(self):
+        return self.column(Y)
+
+    @property
+    def speed(self):
+        return self.column(SPEED)
+
+    @property
+    def angle(self):
+        return self.column(ANGLE)
+
+    @property
+    def power(self):
+        return self.column(POWER)
+
+    @property
+    def coverage_radius(self):
+        return self.column(COVERAGE_RADIUS)
+
+    @property
+    def vx(self):
+        return self.column(VX)
+
+    @property
+    def vy(self):
+        return self.column(VY)
+
+
+store = NodeStore()
+
+
+def node_field(field):
+    """
+    A property of Node that reads and writes one field of its slot in the store, as a Python float.
+    """
+
+    def get(node):
+        return node.store.data.item(field, node.slot)
+
+    def set(node, value):
+        node.store.data[field, node.slot] = value
+
+    return property(get, set)
+
+
+def motion_field(field):
+    """
+    A node_field for the speed and the angle, that keeps the velocity vector of the node in sync when written.
+    """
+
+    def get(node):
+        return node.store.data.item(field, node.slot)
+
+    def set(node, value):
+        node.store.data[field, node.slot] = value
+        node.store.update_velocity(node.slot)
+
+    return property(get, set)
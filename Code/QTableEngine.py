@@ -0,0 +1,233 @@
+"""
+    Storage engines of the q-tables. Both behave as a mapping of {state: {action: q_value}}, so the learner, the
+    q-table files and the evaluator can use either of them, and both provide the operations of the q-learning
+    update that can be done on the whole set of actions of a state at once:
+        - max_value(state): the maximum q-value of a state, 0 if it has no action
+        - best_action(state): the action with the maximum q-value, the earliest inserted one on ties
+        - values_of(state, actions): the q-values of the given actions, None for the ones that aren't stored
+    Both also count the actions of every state at once, actions_counts(), for the q-table sizes of the evaluator.
+
+    DictQTable keeps the nested dicts. DenseQTable gives integer ids to the states and the actions, and keeps the
+    q-values in a growable 2-D NumPy array with a validity mask, which saves the per-entry objects and turns the
+    operations above into array operations. The cells without an entry hold -inf, so the maximum of a row needs
+    no masking. The rows of the deleted states and the columns of the actions that no state holds anymore are
+    reused, so its memory grows with (number of states x number of distinct actions) stored at once, and it suits
+    zones whose fog nodes don't produce too many distinct actions at a time.
+
+    make_q_table picks one of them by name (Config.Q_TABLE_ENGINE).
+"""
+
+from collections.abc import MutableMapping
+
+import numpy as np
+
+
+def make_q_table(kind, entries=None):
+    if kind == "dict":
+        q_table = DictQTable()
+    elif kind == "dense":
+        q_table = DenseQTable()
+    else:
+        error = f"Invalid q-table engine: {kind}"
+        raise ValueError(error)
+    if entries:
+        for state, actions in entries.items():
+            q_table[state] = actions
+    return q_table
+
+
+class DictQTable(dict):
+    def max_value(self, state):
+        actions = self[state]
+        if len(actions) == 0:
+            return 0
+        return max(actions.values())
+
+    def best_action(self, state):
+        actions = self[state]
+        if len(actions) == 0:
+            return None
+        return max(actions, key=actions.get)
+
+    def values_of(self, state, actions):
+        state_actions = self[state]
+        return [state_actions.get(action) for action in actions]
+
+    def actions_counts(self):
+        return [len(actions) for actions in self.values()]
+
+
+class DenseActions(MutableMapping):
+    """
+    The actions of one state of a DenseQTable, as a mapping of {action: q_value}.
+    Iteration follows the order in which the actions were inserted, as in a dict.
+    """
+
+    def __init__(self, q_table, row):
+        self.q_table = q_table
+        self.row = row
+
+    def columns(self):
+        q_table = self.q_table
+        columns = np.flatnonzero(q_table.valid[self.row, :len(q_table.actions)])
+        return columns[np.argsort(q_table.order[self.row, columns], kind="stable")]
+
+    def __getitem__(self, action):
+        column = self.q_table.action_ids.get(action)
+        if column is None or not self.q_table.valid[self.row, column]:
+            raise KeyError(action)
+        return float(self.q_table.q_values[self.row, column])
+
+    def __setitem__(self, action, value):
+        q_table = self.q_table
+        column = q_table.action_id(action)
+        if not q_table.valid[self.row, column]:
+            q_table.sequence += 1
+            q_table.order[self.row, column] = q_table.sequence
+            q_table.valid[self.row, column] = True
+            q_table.column_counts[column] += 1
+        q_table.q_values[self.row, column] = value
+
+    def __delitem__(self, action):
+        column = self.q_table.action_ids.get(action)
+        if column is None or not self.q_table.valid[self.row, column]:
+            raise KeyError(action)
+        self.q_table.clear_cells(self.row, [column])
+
+    def __contains__(self, action):
+        column = self.q_table.action_ids.get(action)
+        return column is not None and bool(self.q_table.valid[self.row, column])
+
+    def __iter__(self):
+        actions = self.q_table.actions
+        return iter([actions[column] for column in self.columns()])
+
+    def __len__(self):
+        return int(np.count_nonzero(self.q_table.valid[self.row, :len(self.q_table.actions)]))
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class DenseQTable(MutableMapping):
+    def __init__(self, states_capacity=256, actions_capacity=64):
+        self.state_ids = {}
+        self.free_rows = []
+        self.action_ids = {}
+        # column -> action, None for a free column
+        self.actions = []
+        # column -> number of states holding an entry of its action, a column is freed when it drops to 0
+        self.column_counts = []
+        self.free_columns = []
+        self.q_values = np.full((states_capacity, actions_capacity), -np.inf)
+        self.valid = np.zeros((states_capacity, actions_capacity), dtype=bool)
+        # insertion sequence of the entries, for iterating the actions of a state in insertion order
+        self.order = np.zeros((states_capacity, actions_capacity), dtype=np.int64)
+        self.sequence = 0
+        self.rows_count = 0
+
+    def grow(self, rows, columns):
+        capacity_rows, capacity_columns = self.q_values.shape
+        if rows <= capacity_rows and columns <= capacity_columns:
+            return
+        while capacity_rows < rows:
+            capacity_rows *= 2
+        while capacity_columns < columns:
+            capacity_columns *= 2
+        for name, empty in (("q_values", -np.inf), ("valid", False), ("order", 0)):
+            array = getattr(self, name)
+            grown = np.full((capacity_rows, capacity_columns), empty, dtype=array.dtype)
+            grown[:array.shape[0], :array.shape[1]] = array
+            setattr(self, name, grown)
+
+    def action_id(self, action):
+        column = self.action_ids.get(action)
+        if column is None:
+            if self.free_columns:
+                column = self.free_columns.pop()
+                self.actions[column] = action
+            else:
+                column = len(self.actions)
+                self.grow(self.q_values.shape[0], column + 1)
+                self.actions.append(action)
+                self.column_counts.append(0)
+            self.action_ids[action] = column
+        return column
+
+    def clear_cells(self, row, columns):
+        """
+        Removes the entries of a row in the given columns, and frees the columns left without any entry.
+        """
+        self.valid[row, columns] = False
+        self.q_values[row, columns] = -np.inf
+        for column in columns:
+            self.column_counts[column] -= 1
+            if self.column_counts[column] == 0:
+                del self.action_ids[self.actions[column]]
+                self.actions[column] = None
+                self.free_columns.append(column)
+
+    def clear_row(self, row):
+        self.clear_cells(row, np.flatnonzero(self.valid[row, :len(self.actions)]).tolist())
+
+    def __getitem__(self, state):
+        return DenseActions(self, self.state_ids[state])
+
+    def __setitem__(self, state, actions):
+        row = self.state_ids.get(state)
+        if row is None:
+            if self.free_rows:
+                row = self.free_rows.pop()
+            else:
+                row = self.rows_count
+                self.rows_count += 1
+                self.grow(self.rows_count, self.q_values.shape[1])
+            self.state_ids[state] = row
+        # the entries are read before the row is cleared, in case they are the ones of this row
+        entries = list(actions.items())
+        self.clear_row(row)
+        row_actions = DenseActions(self, row)
+        for action, value in entries:
+            row_actions[action] = value
+
+    def __delitem__(self, state):
+        row = self.state_ids.pop(state)
+        self.clear_row(row)
+        self.free_rows.append(row)
+
+    def __contains__(self, state):
+        return state in self.state_ids
+
+    def __iter__(self):
+        return iter(self.state_ids)
+
+    def __len__(self):
+        return len(self.state_ids)
+
+    def max_value(self, state):
+        max_q_value = self.q_values[self.state_ids[state], :len(self.actions)].max(initial=-np.inf)
+        return 0 if max_q_value == -np.inf else float(max_q_value)
+
+    def best_action(self, state):
+        row = self.state_ids[state]
+        q_values = self.q_values[row, :len(self.actions)]
+        if len(q_values) == 0:
+            return None
+        column = int(q_values.argmax())
+        if q_values[column] == -np.inf:
+            return None
+        if np.count_nonzero(q_values == q_values[column]) > 1:
+            # on ties, the earliest inserted action wins, as max() over a dict does
+            best_columns = np.flatnonzero(q_values == q_values[column])
+            column = best_columns[np.argmin(self.order[row, best_columns])]
+        return self.actions[column]
+
+    def values_of(self, state, actions):
+        row = self.state_ids[state]
+        columns = np.array([self.action_ids.get(action, -1) for action in actions], dtype=np.int64)
+        q_values = np.where(columns >= 0, self.q_values[row, columns], -np.inf)
+        return [None if q_value == -np.inf else q_value for q_value in q_values.tolist()]
+
+    def actions_counts(self):
+        rows = np.fromiter(self.state_ids.values(), dtype=np.int64, count=len(self.state_ids))
+        return np.count_nonzero(self.valid[rows, :len(self.actions)], axis=1).tolist()
@@ -0,0 +1,206 @@
+"""
+    Binary, memory-mappable storage of the q-tables, replacing the JSON round-trip of str(State)/str(Action) keys.
+
+    A file is a header followed by four sections of fixed-width records, each one readable with numpy.memmap:
+        - states:    the task data of the state, where its fog nodes and its entries start, and how many they are
+        - fog nodes: the discretized data of the fog nodes of all the states, one record per fog node
+        - actions:   the fog node id and the (x, y, speed, angle, power) of the action, as float64
+        - entries:   (action number, q-value as float64), grouped by state
+    QTableFile decodes the records into State/Action objects only when they are accessed. Loading a q-table for a
+    learner decodes the whole file at once: the learner hashes and indexes all of its states up front (exact
+    lookups, the nearest-state index, eviction), so there is no part of the file it could leave undecoded.
+
+    Usage for converting the existing JSON q-tables:
+        python QTableStore.py Zone0_q_table.txt Zone0_q_table.qtb
+"""
+
+import struct
+import sys
+
+import numpy as np
+
+import Learner
+from StateIndex import TASK_FEATURES, FOG_NODE_FEATURES
+
+MAGIC = b"MCQT"
+VERSION = 1
+EXTENSION = ".qtb"
+
+# magic, version, then the number of states, fog nodes, actions and entries, and the offset of each section
+HEADER = struct.Struct("<4sI4Q4Q")
+ACTION_ID_SIZE = 32
+
+STATE_DTYPE = np.dtype([
+    ("task", "<i2", (TASK_FEATURES,)),
+    ("fog_nodes_start", "<u8"),
+    ("fog_nodes_count", "<u4"),
+    ("entries_start", "<u8"),
+    ("entries_count", "<u4"),
+])
+FOG_NODE_DTYPE = np.dtype(("<i2", (FOG_NODE_FEATURES,)))
+ACTION_DTYPE = np.dtype([
+    ("id", f"S{ACTION_ID_SIZE}"),
+    ("x", "<f8"),
+    ("y", "<f8"),
+    ("speed", "<f8"),
+    ("angle", "<f8"),
+    ("power", "<f8"),
+])
+ENTRY_DTYPE = np.dtype([
+    ("action", "<u4"),
+    ("value", "<f8"),
+])
+SECTION_DTYPES = (STATE_DTYPE, FOG_NODE_DTYPE, ACTION_DTYPE, ENTRY_DTYPE)
+
+
+def is_binary_path(file_path):
+    return str(file_path).endswith(EXTENSION)
+
+
+def align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def save(q_table, file_path):
+    """
+    Saves a q-table of the form {state: {action: q_value}}. As in the JSON format, states without entries,
+    zero q-values and None actions are not saved.
+    """
+    states = []
+    fog_nodes = []
+    actions = []
+    action_numbers = {}
+    entries = []
+    for state, state_actions in q_table.items():
+        state_entries = []
+        for action, q_value in state_actions.items():
+            if q_value == 0 or action is None:
+                continue
+            action_key = (action.id, action.x, action.y, action.speed, action.angle, action.power)
+            if action_key not in action_numbers:
+                action_numbers[action_key] = len(actions)
+                actions.append(action_key)
+            state_entries.append((action_numbers[action_key], q_value))
+        if len(state_entries) == 0:
+            continue
+        states.append((tuple(state.task_data), len(fog_nodes), len(state.fog_nodes_data), len(entries),
+                       len(state_entries)))
+        fog_nodes.extend(tuple(data) for data in state.fog_nodes_data)
+        entries.extend(state_entries)
+
+    for action_key in actions:
+        if len(str(action_key[0]).encode()) > ACTION_ID_SIZE:
+            error = f"Fog node id {action_key[0]} is longer than {ACTION_ID_SIZE} bytes"
+            raise ValueError(error)
+    sections = (
+        np.array(states, dtype=STATE_DTYPE),
+        np.array(fog_nodes, dtype=np.int16).reshape(-1, FOG_NODE_FEATURES),
+        np.array([(str(key[0]).encode(),) + key[1:] for key in actions], dtype=ACTION_DTYPE),
+        np.array(entries, dtype=ENTRY_DTYPE),
+    )
+    offsets = []
+    offset = align(HEADER.size)
+    for section in sections:
+        offsets.append(offset)
+        offset = align(offset + section.nbytes)
+    with open(file_path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, *(len(section) for section in sections), *offsets))
+        for section, section_offset in zip(sections, offsets):
+            file.seek(section_offset)
+            file.write(section.tobytes())
+
+
+class QTableFile:
+    """
+    A q-table file mapped in memory. The records are decoded into State/Action objects only on access.
+    """
+
+    def __init__(self, file_path):
+        with open(file_path, "rb") as file:
+            header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            error = f"{file_path} is not a q-table file"
+            raise ValueError(error)
+        magic, version, *counts_and_offsets = HEADER.unpack(header)
+        if magic != MAGIC:
+            error = f"{file_path} is not a q-table file"
+            raise ValueError(error)
+        if version != VERSION:
+            error = f"Unsupported q-table file version {version} in {file_path}"
+            raise ValueError(error)
+        counts, offsets = counts_and_offsets[:4], counts_and_offsets[4:]
+        self.states, self.fog_nodes, self.actions, self.entries = (
+            np.memmap(file_path, dtype=dtype, mode="r", offset=offset, shape=(count,)) if count > 0
+            else np.zeros(0, dtype=dtype)
+            for dtype, count, offset in zip(SECTION_DTYPES, counts, offsets)
+        )
+        self.decoded_actions = {}
+
+    def __len__(self):
+        return len(self.states)
+
+    def state(self, number):
+        record = self.states[number]
+        start = int(record["fog_nodes_start"])
+        fog_nodes_data = [tuple(data) for data in self.fog_nodes[start:start + int(record["fog_nodes_count"])].tolist()]
+        return Learner.State(fog_nodes_data, tuple(record["task"].tolist()))
+
+    def action(self, number):
+        action = self.decoded_actions.get(number)
+        if action is None:
+            id, x, y, speed, angle, power = self.actions[number].tolist()
+            action = Learner.Action.intern(Learner.Action(id.decode(), x, y, speed, angle, power))
+            self.decoded_actions[number] = action
+        return action
+
+    def state_entries(self, number):
+        record = self.states[number]
+        start = int(record["entries_start"])
+        entries = self.entries[start:start + int(record["entries_count"])]
+        return {self.action(action): value for action, value in entries.tolist()}
+
+    def items(self):
+        for number in range(len(self)):
+            yield self.state(number), self.state_entries(number)
+
+    def to_q_table(self):
+        """
+        Decodes the whole file. The sections are converted to Python lists at once, which is much faster than
+        decoding the records one by one when all of them are needed.
+        """
+        fog_nodes = [tuple(data) for data in self.fog_nodes.tolist()]
+        entries = self.entries.tolist()
+        action_columns = (self.actions[name].tolist() for name in ACTION_DTYPE.names)
+        actions = [Learner.Action.intern(Learner.Action(id.decode(), x, y, speed, angle, power))
+                   for id, x, y, speed, angle, power in zip(*action_columns)]
+        q_table = {}
+        columns = (self.states[name].tolist() for name in STATE_DTYPE.names)
+        for task, fog_nodes_start, fog_nodes_count, entries_start, entries_count in zip(*columns):
+            state = Learner.State(fog_nodes[fog_nodes_start:fog_nodes_start + fog_nodes_count], tuple(task))
+            # states that only differ in the order of their fog nodes share the same entry
+            state_entries = q_table.setdefault(state, {})
+            for action, value in entries[entries_start:entries_start + entries_count]:
+                state_entries[actions[action]] = value
+        return q_table
+
+
+def load(file_path):
+    """
+    Returns:
+        dict: The whole q-table of the file, decoded eagerly with QTableFile.to_q_table.
+    """
+    return QTableFile(file_path).to_q_table()
+
+
+def convert_json_q_table(json_path, binary_path):
+    q_table = Learner.Learner.load_json_q_table(json_path)
+    save(q_table, binary_path)
+    return len(q_table)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python QTableStore.py <json q-table> <binary q-table>")
+        sys.exit(1)
+    states_count = convert_json_q_table(sys.argv[1], sys.argv[2])
+    print(f"Converted {states_count} states from {sys.argv[1]} to {sys.argv[2]}")
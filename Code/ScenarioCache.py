@@ -0,0 +1,383 @@
+"""
+    Compiled binary cache of a scenario, the five XML files of the vehicles, the mobile fog nodes, the tasks, the
+    fixed fog nodes and the zones, so that only the first run of a scenario pays for parsing the XML.
+
+    A bundle is keyed by the SHA-256 of the contents of the five files, so any change of the scenario compiles a
+    new one. It is a header followed by sections of fixed-width records, each one readable with numpy.memmap:
+        - strings:         the ids of the nodes and the names and creators of the tasks and zones, as UTF-8
+        - timesteps:       the time, where its records and departures start and how many they are, and whether it
+                           is a keyframe, one record per time step of the trace, which gives random access to them
+        - records:         (node, layer, x, y, speed, angle, power, coverage_radius), NaN for the absent attributes
+        - departures:      the nodes that left the trace at a delta time step
+        - tasks, fixed fog nodes, zones: the columns of parse_task, parse_fixed_fog_node and parse_zone
+    The trace is delta-encoded. A keyframe holds all the records of its time step, as they are in the XML files,
+    and is written every Config.SCENARIO_KEYFRAME_INTERVAL time steps. The other time steps only hold the records
+    that changed or arrived since the previous time step and the departures, unless the time step can't be
+    rebuilt from them in its original order, in which case it is written as a keyframe too.
+
+    ScenarioBundle provides the methods of SumoXMLParser that MobilityGraph uses, so it can replace the parser.
+
+    Usage for compiling a scenario ahead of the first run:
+        python ScenarioCache.py vehicles.xml mobileFogNodes.xml tasks.xml fixedFogNodes.xml zones.xml
+"""
+
+import hashlib
+import math
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from Config import Config
+from SumoXMLParser import SumoXMLParser
+from TaskSchedule import TaskSchedule
+
+MAGIC = b"MCSC"
+VERSION = 1
+EXTENSION = ".scn"
+NO_STRING = 0xFFFFFFFF
+# the value of the absent attributes in the records, a single object so that equal records compare equal
+ABSENT = math.nan
+
+# magic, version, size of the strings, then the number of records of each section and the offset of each section
+HEADER = struct.Struct("<4sII7Q7Q")
+
+TIMESTEP_DTYPE = np.dtype([
+    ("time", "<f8"),
+    ("records_start", "<u8"),
+    ("records_count", "<u4"),
+    ("departures_start", "<u8"),
+    ("departures_count", "<u4"),
+    ("keyframe", "u1"),
+])
+RECORD_DTYPE = np.dtype([
+    ("node", "<u4"),
+    ("layer", "u1"),
+    ("x", "<f8"),
+    ("y", "<f8"),
+    ("speed", "<f8"),
+    ("angle", "<f8"),
+    ("power", "<f8"),
+    ("coverage_radius", "<f8"),
+])
+DEPARTURE_DTYPE = np.dtype("<u4")
+TASK_DTYPE = np.dtype([
+    ("name", "<u4"),
+    ("creator", "<u4"),
+    ("creation_time", "<f8"),
+    ("deadline", "<f8"),
+    ("power_needed", "<f8"),
+    ("size", "<f8"),
+])
+FIXED_FOG_NODE_DTYPE = np.dtype([
+    ("id", "<u4"),
+    ("x", "<f8"),
+    ("y", "<f8"),
+    ("power", "<f8"),
+    ("coverage_radius", "<f8"),
+])
+ZONE_DTYPE = np.dtype([
+    ("name", "<u4"),
+    ("x", "<f8"),
+    ("y", "<f8"),
+    ("coverage_radius", "<f8"),
+])
+# the records section is written first, as the trace is read
+SECTIONS = ("records", "strings", "timesteps", "departures", "tasks", "fixed_fog_nodes", "zones")
+
+
+def align(offset, alignment=8):
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def get_file_paths(parser):
+    return (parser.filepath, parser.mobileFilepath, parser.taskFilePath, parser.fixedFogNodeFilePath,
+            parser.zoneFilePath)
+
+
+def get_key(file_paths):
+    """
+    Returns:
+        str: The SHA-256 of the format version and of the contents of the files, in hexadecimal.
+    """
+    digest = hashlib.sha256(struct.pack("<I", VERSION))
+    for file_path in file_paths:
+        digest.update(struct.pack("<Q", os.path.getsize(file_path)))
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_bundle_path(key):
+    data_dir = 'Code/data/' if Config.IS_IMAN else './data/'
+    return f'{data_dir}scenarios/scenario_{key}{EXTENSION}'
+
+
+def apply_keyframe(records):
+    """
+    Returns:
+        dict: The state of the trace after a keyframe, {node: record} in the order of the records.
+    """
+    state = {}
+    for record in records:
+        state[record[0]] = record
+    return state
+
+
+def apply_delta(state, records, departures):
+    """
+    Returns:
+        dict: The state of the trace after a delta time step: the departed nodes are removed, the changed ones are
+            updated in place and the arrived ones are added at the end, in the order of the records.
+    """
+    departures = set(departures)
+    new_state = {node: record for node, record in state.items() if node not in departures}
+    for record in records:
+        new_state[record[0]] = record
+    return new_state
+
+
+class StringTable:
+    def __init__(self):
+        self.numbers = {}
+        self.strings = []
+
+    def number(self, string):
+        if string is None:
+            return NO_STRING
+        number = self.numbers.get(string)
+        if number is None:
+            number = len(self.strings)
+            self.numbers[string] = number
+            self.strings.append(string.encode())
+        return number
+
+
+def to_record(strings, vehicle_record):
+    vehicle_id, layer, x, y, speed, angle, power, coverage_radius = vehicle_record
+    return (strings.number(vehicle_id), layer, x, y, speed, angle,
+            ABSENT if power is None else power, ABSENT if coverage_radius is None else coverage_radius)
+
+
+def compile_scenario(parser, bundle_path, keyframe_interval=None):
+    """
+    Compiles the scenario of a parser into a bundle. The trace is streamed, only the state of the current time
+    step is kept in memory. The bundle is written to a temporary file of its directory first, so a bundle is either
+    complete or absent, and the temporary file is removed if the compilation fails.
+
+    Returns:
+        int: The number of time steps of the trace.
+    """
+    keyframe_interval = keyframe_interval or Config.SCENARIO_KEYFRAME_INTERVAL
+    strings = StringTable()
+    timesteps = []
+    departures = []
+    records_count = 0
+    state = {}
+    directory = os.path.dirname(bundle_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    # a unique temporary file, so that two processes compiling the same bundle don't write into the same file
+    descriptor, temporary_path = tempfile.mkstemp(suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(descriptor, "wb") as file:
+            records_offset = align(HEADER.size)
+            file.seek(records_offset)
+            for number, (time, vehicle_records) in enumerate(parser.iter_trace_records()):
+                records = [to_record(strings, vehicle_record) for vehicle_record in vehicle_records]
+                keyframe = number % keyframe_interval == 0
+                if not keyframe:
+                    nodes = {record[0] for record in records}
+                    step_departures = [node for node in state if node not in nodes]
+                    changed = [record for record in records if state.get(record[0]) != record]
+                    new_state = apply_delta(state, changed, step_departures)
+                    # duplicated nodes or a new order of the nodes can't be rebuilt from a delta
+                    keyframe = list(new_state.values()) != records
+                if keyframe:
+                    step_records = records
+                    step_departures = []
+                    state = apply_keyframe(records)
+                else:
+                    step_records = changed
+                    state = new_state
+                timesteps.append((time, records_count, len(step_records), len(departures), len(step_departures),
+                                  keyframe))
+                file.write(np.array(step_records, dtype=RECORD_DTYPE).tobytes())
+                records_count += len(step_records)
+                departures.extend(step_departures)
+
+            tasks = [(strings.number(task["name"]), strings.number(task["creator"]), task["creation_time"],
+                      task["deadline"], task["power_needed"], task["size"]) for task in parser.parse_task()]
+            fixed_fog_nodes = [(strings.number(id), x, y, power, ABSENT if coverage_radius is None else coverage_radius)
+                               for id, x, y, power, coverage_radius in parser.parse_fixed_fog_node_records()]
+            zones = [(strings.number(name), x, y, coverage_radius)
+                     for name, x, y, coverage_radius in parser.parse_zone_records()]
+            string_size = max((len(string) for string in strings.strings), default=1)
+            sections = (
+                np.array(strings.strings, dtype=f"S{string_size}"),
+                np.array(timesteps, dtype=TIMESTEP_DTYPE),
+                np.array(departures, dtype=DEPARTURE_DTYPE),
+                np.array(tasks, dtype=TASK_DTYPE),
+                np.array(fixed_fog_nodes, dtype=FIXED_FOG_NODE_DTYPE),
+                np.array(zones, dtype=ZONE_DTYPE),
+            )
+            counts = [records_count]
+            offsets = [records_offset]
+            offset = align(records_offset + records_count * RECORD_DTYPE.itemsize)
+            for section in sections:
+                counts.append(len(section))
+                offsets.append(offset)
+                file.seek(offset)
+                file.write(section.tobytes())
+                offset = align(offset + section.nbytes)
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, VERSION, string_size, *counts, *offsets))
+        os.replace(temporary_path, bundle_path)
+    finally:
+        # left behind only when the compilation failed
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return len(timesteps)
+
+
+class ScenarioBundle:
+    """
+    A scenario bundle mapped in memory. Opening one only reads its header, the records are decoded into nodes,
+    tasks and zones on access.
+    """
+
+    def __init__(self, bundle_path):
+        with open(bundle_path, "rb") as file:
+            header = file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            error = f"{bundle_path} is not a scenario bundle"
+            raise ValueError(error)
+        magic, version, string_size, *counts_and_offsets = HEADER.unpack(header)
+        if magic != MAGIC:
+            error = f"{bundle_path} is not a scenario bundle"
+            raise ValueError(error)
+        if version != VERSION:
+            error = f"Unsupported scenario bundle version {version} in {bundle_path}"
+            raise ValueError(error)
+        self.bundle_path = bundle_path
+        counts, offsets = counts_and_offsets[:len(SECTIONS)], counts_and_offsets[len(SECTIONS):]
+        dtypes = (RECORD_DTYPE, np.dtype(f"S{string_size}"), TIMESTEP_DTYPE, DEPARTURE_DTYPE, TASK_DTYPE,
+                  FIXED_FOG_NODE_DTYPE, ZONE_DTYPE)
+        for name, dtype, count, offset in zip(SECTIONS, dtypes, counts, offsets):
+            section = (np.memmap(bundle_path, dtype=dtype, mode="r", offset=offset, shape=(count,)) if count > 0
+                       else np.zeros(0, dtype=dtype))
+            setattr(self, name, section)
+        self.keyframes = np.flatnonzero(self.timesteps["keyframe"])
+        self.decoded_strings = {}
+
+    def __len__(self):
+        return len(self.timesteps)
+
+    def string(self, number):
+        if number == NO_STRING:
+            return None
+        string = self.decoded_strings.get(number)
+        if string is None:
+            string = self.strings[number].decode()
+            self.decoded_strings[number] = string
+        return string
+
+    def make_node(self, record):
+        node, layer, x, y, speed, angle, power, coverage_radius = record
+        return SumoXMLParser.make_vehicle_node((self.string(node), layer, x, y, speed, angle,
+                                                None if math.isnan(power) else power,
+                                                None if math.isnan(coverage_radius) else coverage_radius))
+
+    def read_timestep(self, number, state):
+        """
+        Returns:
+            tuple: The (time, records, state) of a time step, given the state after the previous one.
+        """
+        time, records_start, records_count, departures_start, departures_count, keyframe = (
+            self.timesteps[number].tolist())
+        records = self.records[records_start:records_start + records_count].tolist()
+        if keyframe:
+            return time, records, apply_keyframe(records)
+        departures = self.departures[departures_start:departures_start + departures_count].tolist()
+        state = apply_delta(state, records, departures)
+        return time, list(state.values()), state
+
+    def iter_trace(self):
+        """
+        Yields the (time, nodes) of the time steps of the trace in increasing order of time, as
+        SumoXMLParser.iter_trace does.
+        """
+        state = {}
+        for number in range(len(self)):
+            time, records, state = self.read_timestep(number, state)
+            yield time, [self.make_node(record) for record in records]
+
+    def get_timestep(self, number):
+        """
+        Random access to a time step, replayed from the keyframe before it.
+
+        Returns:
+            tuple: The (time, nodes) of the time step with the given number.
+        """
+        if not 0 <= number < len(self):
+            raise IndexError(number)
+        keyframe = int(self.keyframes[np.searchsorted(self.keyframes, number, side="right") - 1])
+        state = {}
+        for step in range(keyframe, number + 1):
+            time, records, state = self.read_timestep(step, state)
+        return time, [self.make_node(record) for record in records]
+
+    def parse_task(self):
+        columns = (self.tasks[name].tolist() for name in TASK_DTYPE.names)
+        return [{"name": self.string(name),
+                 "power_needed": power_needed,
+                 "size": size,
+                 "deadline": deadline,
+                 "creator": self.string(creator),
+                 "creation_time": creation_time}
+                for name, creator, creation_time, deadline, power_needed, size in zip(*columns)]
+
+    def parse_task_schedule(self):
+        """
+        Returns:
+            TaskSchedule: The schedule of the tasks, built from the columns of the bundle without task dicts.
+        """
+        return TaskSchedule([self.string(name) for name in self.tasks["name"].tolist()],
+                            [self.string(creator) for creator in self.tasks["creator"].tolist()],
+                            self.tasks["creation_time"], self.tasks["deadline"], self.tasks["power_needed"],
+                            self.tasks["size"])
+
+    def parse_fixed_fog_node(self):
+        return [SumoXMLParser.make_fixed_fog_node((self.string(id), x, y, power,
+                                                   None if math.isnan(coverage_radius) else coverage_radius))
+                for id, x, y, power, coverage_radius in self.fixed_fog_nodes.tolist()]
+
+    def parse_zone(self):
+        return [SumoXMLParser.make_zone(self.string(name), x, y, coverage_radius)
+                for name, x, y, coverage_radius in self.zones.tolist()]
+
+
+def load_or_compile(parser):
+    """
+    Returns:
+        ScenarioBundle: The bundle of the scenario of the parser, compiled first if there is none for the current
+            contents of its files.
+    """
+    bundle_path = get_bundle_path(get_key(get_file_paths(parser)))
+    if not os.path.exists(bundle_path):
+        timesteps_count = compile_scenario(parser, bundle_path)
+        print(f"Compiled {timesteps_count} time steps of the scenario into {bundle_path}")
+    return ScenarioBundle(bundle_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 6:
+        print("Usage: python ScenarioCache.py <vehicles xml> <mobile fog nodes xml> <tasks xml> "
+              "<fixed fog nodes xml> <zones xml>")
+        sys.exit(1)
+    scenario_parser = SumoXMLParser(*sys.argv[1:])
+    bundle = load_or_compile(scenario_parser)
+    print(f"{bundle.bundle_path}: {len(bundle)} time steps, {len(bundle.keyframes)} keyframes, "
+          f"{len(bundle.records)} records, {os.path.getsize(bundle.bundle_path)} bytes")
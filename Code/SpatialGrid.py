@@ -0,0 +1,233 @@
+"""
+    Uniform-grid spatial index of the zones, used instead of checking every zone for every task.
+
+    The area covered by the zones and by the fixed fog nodes is split into square cells. Built once from the zones
+    of zones_data*.xml (and the fixed fog nodes), the grid keeps for every cell:
+        - the zones whose coverage disc intersects the cell, the candidates of the coverage queries
+        - the zones whose centre is in the cell, searched ring by ring for the nearest zone query
+        - the fixed fog nodes whose coverage disc intersects the cell, since their coverage never changes
+    The candidates of a cell are kept in the order of the zones (or fog nodes), and the exact checks are left to
+    the zones themselves, so the results are the same as the ones of a scan over the list, ties included.
+
+    FogNodeGrid adds the mobile fog nodes to the same raster. It is rebuilt after every move of the mobility graph,
+    and answers which fog nodes cover a point and have enough power, looking only at the fog nodes of its cell.
+
+    For the batches of tasks of a step, both grids also answer for many points at once, with one NumPy distance
+    matrix instead of the cells (see Topology.assign_tasks). The comparisons are the same as the ones of the
+    zones and fog nodes, so are the results.
+"""
+
+import math
+
+import numpy as np
+
+from Config import Config
+
+# slack of the disc-cell intersection test, so that rounding never drops a candidate
+INTERSECTION_TOLERANCE = 1e-9
+
+
+def get_default_cell_size(zones):
+    radii = sorted(zone.coverage_radius for zone in zones)
+    if len(radii) == 0 or radii[len(radii) // 2] <= 0:
+        return 1.0
+    return radii[len(radii) // 2]
+
+
+class ZoneGrid:
+    def __init__(self, zones, fixed_fog_nodes=(), cell_size=None):
+        """
+        Args:
+            zones (list): The zone managers, in the order used for breaking ties.
+            fixed_fog_nodes (list): The fog nodes that never move, rasterized with the zones.
+            cell_size (float, optional): The side of a cell. Defaults to the median coverage radius of the zones.
+        """
+        self.zones = list(zones)
+        self.zone_numbers = {zone: number for number, zone in enumerate(self.zones)}
+        self.fixed_fog_nodes = list(fixed_fog_nodes)
+        self.zone_x = np.array([zone.x for zone in self.zones], dtype=np.float64)
+        self.zone_y = np.array([zone.y for zone in self.zones], dtype=np.float64)
+        self.zone_radii = np.array([zone.coverage_radius for zone in self.zones], dtype=np.float64)
+        self.cell_size = cell_size or Config.SPATIAL_GRID_CELL_SIZE or get_default_cell_size(self.zones)
+        discs = [(item.x, item.y, item.coverage_radius) for item in list(self.zones) + list(fixed_fog_nodes)]
+        if discs:
+            self.min_x = min(x - radius for x, y, radius in discs)
+            self.min_y = min(y - radius for x, y, radius in discs)
+            self.max_cell_x, self.max_cell_y = self.get_cell(max(x + radius for x, y, radius in discs),
+                                                             max(y + radius for x, y, radius in discs))
+        else:
+            self.min_x = self.min_y = 0.0
+            self.max_cell_x = self.max_cell_y = -1
+
+        self.zone_cells = {}
+        self.centre_cells = {}
+        self.fixed_fog_node_cells = {}
+        for zone in self.zones:
+            self.add_disc(self.zone_cells, zone, zone.x, zone.y, zone.coverage_radius)
+            self.centre_cells.setdefault(self.get_cell(zone.x, zone.y), []).append(zone)
+        for fog_node in self.fixed_fog_nodes:
+            self.add_disc(self.fixed_fog_node_cells, fog_node, fog_node.x, fog_node.y, fog_node.coverage_radius)
+
+    def get_cell(self, x, y):
+        return math.floor((x - self.min_x) / self.cell_size), math.floor((y - self.min_y) / self.cell_size)
+
+    def is_valid_cell(self, cell_x, cell_y):
+        return 0 <= cell_x <= self.max_cell_x and 0 <= cell_y <= self.max_cell_y
+
+    def add_disc(self, cells, item, x, y, radius, clip=True):
+        """
+        Adds the item to the cells that its disc intersects.
+
+        Args:
+            clip (bool, optional): Whether to skip the cells out of the grid, the ones of the zones and fixed fog nodes
+                are never queried since nothing else covers them. Defaults to True.
+        """
+        first_x, first_y = self.get_cell(x - radius, y - radius)
+        last_x, last_y = self.get_cell(x + radius, y + radius)
+        if clip:
+            first_x, first_y = max(first_x, 0), max(first_y, 0)
+            last_x, last_y = min(last_x, self.max_cell_x), min(last_y, self.max_cell_y)
+        for cell_x in range(first_x, last_x + 1):
+            left = self.min_x + cell_x * self.cell_size
+            dx = max(left - x, 0, x - left - self.cell_size)
+            for cell_y in range(first_y, last_y + 1):
+                bottom = self.min_y + cell_y * self.cell_size
+                dy = max(bottom - y, 0, y - bottom - self.cell_size)
+                if dx * dx + dy * dy <= radius * radius + INTERSECTION_TOLERANCE:
+                    cells.setdefault((cell_x, cell_y), []).append(item)
+
+    def get_zone_candidates(self, x, y):
+        """
+        Returns:
+            list: The zones whose coverage may contain the point, in the order of the zones.
+        """
+        return self.zone_cells.get(self.get_cell(x, y), [])
+
+    def get_zones_by_position(self, x, y):
+        return [zone for zone in self.get_zone_candidates(x, y) if zone.is_within_coverage(x, y)]
+
+    def get_zones_by_positions(self, xs, ys):
+        """
+        Args:
+            xs (np.ndarray): The X-coordinates of the points.
+            ys (np.ndarray): The Y-coordinates of the points.
+
+        Returns:
+            list: For every point, the zones whose coverage contains it, in the order of the zones.
+        """
+        covered = np.sqrt((xs[:, None] - self.zone_x) ** 2 + (ys[:, None] - self.zone_y) ** 2) <= self.zone_radii
+        zones = self.zones
+        return [[zones[number] for number in np.flatnonzero(row)] for row in covered]
+
+    def get_fixed_fog_node_candidates(self, x, y):
+        """
+        Returns:
+            list: The fixed fog nodes whose coverage may contain the point, in the order they were given.
+        """
+        return self.fixed_fog_node_cells.get(self.get_cell(x, y), [])
+
+    def get_ring_cells(self, cell_x, cell_y, ring):
+        """
+        Yields the valid cells at Chebyshev distance ring from the given cell.
+        """
+        if ring == 0:
+            if self.is_valid_cell(cell_x, cell_y):
+                yield cell_x, cell_y
+            return
+        for x in range(max(cell_x - ring, 0), min(cell_x + ring, self.max_cell_x) + 1):
+            for y in (cell_y - ring, cell_y + ring):
+                if self.is_valid_cell(x, y):
+                    yield x, y
+        for y in range(max(cell_y - ring + 1, 0), min(cell_y + ring - 1, self.max_cell_y) + 1):
+            for x in (cell_x - ring, cell_x + ring):
+                if self.is_valid_cell(x, y):
+                    yield x, y
+
+    def get_nearest_zone(self, x, y):
+        """
+        Searches the cells ring by ring around the point. The centres of ring r and beyond are at least r - 1 cells
+        away, so the search stops once the nearest centre found is closer than that.
+
+        Returns:
+            The zone with the nearest centre, the first one in the order of the zones on ties, or None without zones.
+        """
+        cell_x, cell_y = self.get_cell(x, y)
+        # rings that don't reach the grid are skipped
+        first_ring = max(-cell_x, cell_x - self.max_cell_x, -cell_y, cell_y - self.max_cell_y, 0)
+        last_ring = max(cell_x, self.max_cell_x - cell_x, cell_y, self.max_cell_y - cell_y)
+        nearest_zone = None
+        nearest_key = (float('inf'), 0)
+        for ring in range(first_ring, last_ring + 1):
+            if nearest_zone is not None and nearest_key[0] < (ring - 1) * self.cell_size - INTERSECTION_TOLERANCE:
+                break
+            for cell in self.get_ring_cells(cell_x, cell_y, ring):
+                for zone in self.centre_cells.get(cell, ()):
+                    key = (math.sqrt((x - zone.x) ** 2 + (y - zone.y) ** 2), self.zone_numbers[zone])
+                    if key < nearest_key:
+                        nearest_key = key
+                        nearest_zone = zone
+        return nearest_zone
+
+
+class FogNodeGrid:
+    """
+    The fog nodes on the raster of a ZoneGrid: the fixed ones are taken from it, the mobile ones are rasterized
+    again by update() after every move of the mobility graph.
+    """
+
+    def __init__(self, zone_grid, mobile_fog_nodes=()):
+        self.zone_grid = zone_grid
+        self.mobile_fog_nodes = []
+        self.mobile_fog_node_cells = {}
+        # (x, y) -> the fog nodes whose coverage contains the point, whatever their power, found by prefetch
+        self.fog_nodes_in_range = {}
+        self.update(mobile_fog_nodes)
+
+    def update(self, mobile_fog_nodes):
+        self.mobile_fog_nodes = list(mobile_fog_nodes)
+        self.mobile_fog_node_cells = {}
+        self.fog_nodes_in_range = {}
+        for fog_node in self.mobile_fog_nodes:
+            self.zone_grid.add_disc(self.mobile_fog_node_cells, fog_node, fog_node.x, fog_node.y,
+                                    fog_node.coverage_radius, clip=False)
+
+    def get_candidates(self, x, y):
+        """
+        Returns:
+            list: The fog nodes whose coverage may contain the point, the fixed ones first.
+        """
+        cell = self.zone_grid.get_cell(x, y)
+        return self.zone_grid.fixed_fog_node_cells.get(cell, []) + self.mobile_fog_node_cells.get(cell, [])
+
+    def get_fog_nodes_in_range(self, x, y, power_needed=0):
+        """
+        Returns:
+            list: The fog nodes whose coverage contains the point and whose power is at least power_needed.
+        """
+        in_range = self.fog_nodes_in_range.get((x, y))
+        if in_range is not None:
+            return [fog_node for fog_node in in_range if fog_node.power >= power_needed]
+        return [fog_node for fog_node in self.get_candidates(x, y)
+                if fog_node.power >= power_needed and fog_node.is_in_range(x, y)]
+
+    def prefetch(self, xs, ys):
+        """
+        Finds the fog nodes in range of many points at once, and keeps them for the queries of get_fog_nodes_in_range
+        at these points until the next update. The power of the fog nodes is still checked by every query.
+
+        Args:
+            xs (np.ndarray): The X-coordinates of the points.
+            ys (np.ndarray): The Y-coordinates of the points.
+
+        Returns:
+            tuple: The fog nodes, the fixed ones first, the matrix of the distances from the points (one row per
+                point) to them, and the matrix telling which ones cover the points.
+        """
+        fog_nodes = self.zone_grid.fixed_fog_nodes + self.mobile_fog_nodes
+        fog_node_data = np.array([(fog_node.x, fog_node.y, fog_node.coverage_radius) for fog_node in fog_nodes],
+                                 dtype=np.float64).reshape(-1, 3)
+        distances = np.sqrt((fog_node_data[:, 0] - xs[:, None]) ** 2 + (fog_node_data[:, 1] - ys[:, None]) ** 2)
+        in_range = distances <= fog_node_data[:, 2]
+        for x, y, row in zip(xs.tolist(), ys.tolist(), in_range):
+            self.fog_nodes_in_range[(x, y)] = [fog_nodes[number] for number in np.flatnonzero(row)]
+        return fog_nodes, distances, in_range
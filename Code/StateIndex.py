@@ -0,0 +1,359 @@
+"""
+    The StateIndex class keeps the states of a q-table in padded NumPy arrays, so that the distance of a query state
+    to every stored state is computed by one batched call instead of one Python double loop per stored state.
+
+    Rows are kept in insertion order (the order of the q-table dict), removed states leave a hole that is skipped,
+    and ties are broken in favour of the earliest row, so the nearest state is the same one that a scan over
+    q_table.keys() with calculate_distance_of_states returns.
+
+    The distance of two states is the one of Learner.calculate_distance_of_states:
+        - every fog node of the state with fewer fog nodes is matched to its nearest fog node of the other state
+        - the squared distances of these matches and the squared distance of the task data are summed up
+        - the result is the square root of that sum
+
+    StateIndex itself is the exact brute-force index. Two sub-linear variants are built on a fixed-length embedding
+    of the states (the task data followed by the mean of the fog nodes data):
+        - TaskBucketStateIndex is exact: the task part of the distance is a lower bound of the whole distance,
+          so the stored states are bucketed by their task data and the buckets are searched from the nearest one,
+          stopping as soon as a bucket can no longer beat the best state found
+        - LSHStateIndex is approximate: the embeddings are hashed by p-stable locality sensitive hashing, and only
+          the states sharing a bucket with the query in at least one table are compared
+    make_state_index picks one of them by name, and recall() compares an index with the brute-force search.
+"""
+
+import math
+
+import numpy as np
+
+from Config import Config
+
+FOG_NODE_FEATURES = 5
+TASK_FEATURES = 7
+
+# upper bound of the number of int64 cells of the temporary pairwise distance array of one chunk
+CHUNK_CELLS = 1 << 22
+EMBEDDING_SIZE = TASK_FEATURES + FOG_NODE_FEATURES
+# large enough to never be picked as a minimum, small enough to not overflow when summed up
+PADDING_DISTANCE = 1 << 40
+# the number of rows of the first batch of buckets evaluated by TaskBucketStateIndex
+MIN_BUCKET_BATCH_ROWS = 64
+
+
+def embed_state(state):
+    """
+    The fixed-length embedding of a state: its task data followed by the mean of its fog nodes data.
+    """
+    fog_nodes, task = StateIndex.to_arrays(state)
+    fog_nodes_mean = fog_nodes.mean(axis=0) if len(fog_nodes) > 0 else np.zeros(FOG_NODE_FEATURES)
+    return np.concatenate((task, fog_nodes_mean))
+
+
+def make_state_index(kind, states=()):
+    if kind == "brute_force":
+        return StateIndex(states)
+    elif kind == "task_bucket":
+        return TaskBucketStateIndex(states)
+    elif kind == "lsh":
+        return LSHStateIndex(states)
+    else:
+        error = f"Invalid state index: {kind}"
+        raise ValueError(error)
+
+
+class StateIndex:
+    def __init__(self, states=(), capacity=1024):
+        self.states = []
+        self.row_of_state = {}
+        self.fog_nodes = np.zeros((capacity, 1, FOG_NODE_FEATURES), dtype=np.int64)
+        self.fog_node_counts = np.zeros(capacity, dtype=np.int64)
+        self.task = np.zeros((capacity, TASK_FEATURES), dtype=np.int64)
+        self.valid = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        for state in states:
+            self.add(state)
+
+    def __len__(self):
+        return len(self.row_of_state)
+
+    def __contains__(self, state):
+        return state in self.row_of_state
+
+    @staticmethod
+    def to_arrays(state):
+        fog_nodes = np.array(state.fog_nodes_data, dtype=np.int64).reshape(-1, FOG_NODE_FEATURES)
+        task = np.array(state.task_data, dtype=np.int64).reshape(TASK_FEATURES)
+        return fog_nodes, task
+
+    def add(self, state):
+        if state in self.row_of_state:
+            return self.row_of_state[state]
+        fog_nodes, task = self.to_arrays(state)
+        self.reserve(self.size + 1, len(fog_nodes))
+        row = self.size
+        self.fog_nodes[row, :len(fog_nodes)] = fog_nodes
+        self.fog_node_counts[row] = len(fog_nodes)
+        self.task[row] = task
+        self.valid[row] = True
+        self.states.append(state)
+        self.row_of_state[state] = row
+        self.size += 1
+        return row
+
+    def remove(self, state):
+        row = self.row_of_state.pop(state, None)
+        if row is None:
+            return
+        self.valid[row] = False
+        self.states[row] = None
+        if self.size > 1024 and len(self.row_of_state) < self.size // 2:
+            self.compact()
+
+    def reserve(self, rows, fog_nodes_count):
+        capacity, max_fog_nodes, _ = self.fog_nodes.shape
+        if rows <= capacity and fog_nodes_count <= max_fog_nodes:
+            return
+        new_capacity = max(capacity, 1)
+        while new_capacity < rows:
+            new_capacity *= 2
+        new_max_fog_nodes = max(max_fog_nodes, fog_nodes_count)
+        fog_nodes = np.zeros((new_capacity, new_max_fog_nodes, FOG_NODE_FEATURES), dtype=np.int64)
+        fog_nodes[:self.size, :max_fog_nodes] = self.fog_nodes[:self.size]
+        self.fog_nodes = fog_nodes
+        self.fog_node_counts = self.grow(self.fog_node_counts, new_capacity)
+        self.task = self.grow(self.task, new_capacity)
+        self.valid = self.grow(self.valid, new_capacity)
+
+    @staticmethod
+    def grow(array, capacity):
+        if len(array) == capacity:
+            return array
+        grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def compact(self):
+        """
+        Drops the holes left by removed states, keeping the remaining rows in their order.
+        """
+        rows = np.flatnonzero(self.valid[:self.size])
+        count = len(rows)
+        self.fog_nodes[:count] = self.fog_nodes[rows]
+        self.fog_node_counts[:count] = self.fog_node_counts[rows]
+        self.task[:count] = self.task[rows]
+        self.valid[:count] = True
+        self.valid[count:] = False
+        self.states = [self.states[row] for row in rows]
+        self.row_of_state = {state: row for row, state in enumerate(self.states)}
+        self.size = count
+
+    def squared_distances(self, state, rows=None):
+        """
+        Computes the squared distance of the given state to the stored states.
+        :param state: the query state
+        :param rows: the rows to compute the distance to, all rows if None
+        :return: an int64 array with one squared distance per row, removed rows are set to PADDING_DISTANCE
+        """
+        query_fog_nodes, query_task = self.to_arrays(state)
+        if rows is None:
+            rows = np.arange(self.size)
+        result = np.empty(len(rows), dtype=np.int64)
+        max_fog_nodes = self.fog_nodes.shape[1]
+        chunk = max(1, CHUNK_CELLS // max(1, len(query_fog_nodes) * max_fog_nodes))
+        for start in range(0, len(rows), chunk):
+            chunk_rows = rows[start:start + chunk]
+            result[start:start + chunk] = self.squared_distances_of_rows(query_fog_nodes, query_task, chunk_rows)
+        return result
+
+    def squared_distances_of_rows(self, query_fog_nodes, query_task, rows):
+        counts = self.fog_node_counts[rows]
+        task_distance = ((self.task[rows] - query_task) ** 2).sum(axis=1)
+        query_count = len(query_fog_nodes)
+        if query_count == 0:
+            fog_distance = np.zeros(len(rows), dtype=np.int64)
+        else:
+            stored = self.fog_nodes[rows]
+            # pairwise[r, i, j] is the squared distance of query fog node i and fog node j of row r
+            pairwise = np.zeros((len(rows), query_count, stored.shape[1]), dtype=np.int64)
+            for feature in range(FOG_NODE_FEATURES):
+                pairwise += (query_fog_nodes[None, :, None, feature] - stored[:, None, :, feature]) ** 2
+            padding = np.arange(stored.shape[1])[None, :] >= counts[:, None]
+            # the query has fewer (or as many) fog nodes: match each of its fog nodes to the stored ones
+            query_side = np.where(padding[:, None, :], PADDING_DISTANCE, pairwise).min(axis=2).sum(axis=1)
+            # the stored state has fewer fog nodes: match each of its fog nodes to the ones of the query
+            stored_side = np.where(padding, 0, pairwise.min(axis=1)).sum(axis=1)
+            fog_distance = np.where(query_count > counts, stored_side, query_side)
+        distance = fog_distance + task_distance
+        distance[~self.valid[rows]] = PADDING_DISTANCE
+        return distance
+
+    def find_nearest(self, state, threshold=None):
+        """
+        Finds the stored state that is nearest to the given state.
+        :param state: the query state
+        :param threshold: the maximum distance of the nearest state, no limit if None
+        :return: a tuple of (nearest state, distance), or (None, inf) if there is no state within the threshold
+        """
+        if len(self.row_of_state) == 0:
+            return None, float('inf')
+        squared_distances = self.squared_distances(state)
+        row = int(np.argmin(squared_distances))
+        return self.nearest_within(row, int(squared_distances[row]), threshold)
+
+    def nearest_within(self, row, squared_distance, threshold):
+        if squared_distance >= PADDING_DISTANCE:
+            return None, float('inf')
+        distance = math.sqrt(squared_distance)
+        if threshold is not None and distance > threshold:
+            return None, float('inf')
+        return self.states[row], distance
+
+    def recall(self, query_states, threshold=None):
+        """
+        Measures how often this index finds the same nearest state as the brute-force search over the same rows.
+        :return: the fraction of the query states for which both searches agree
+        """
+        if len(query_states) == 0:
+            return 1.0
+        hits = 0
+        for state in query_states:
+            found, _ = self.find_nearest(state, threshold)
+            expected, _ = StateIndex.find_nearest(self, state, threshold)
+            if found is expected:
+                hits += 1
+        return hits / len(query_states)
+
+
+class TaskBucketStateIndex(StateIndex):
+    def __init__(self, states=(), capacity=1024):
+        # task data -> bucket number, and for each bucket the rows of its states in increasing order
+        self.bucket_of_task = {}
+        self.bucket_rows = []
+        self.bucket_tasks = np.zeros((0, TASK_FEATURES), dtype=np.int64)
+        super().__init__(states, capacity)
+
+    def add(self, state):
+        if state in self.row_of_state:
+            return self.row_of_state[state]
+        row = super().add(state)
+        self.add_to_bucket(state, row)
+        return row
+
+    def add_to_bucket(self, state, row):
+        task_key = state.key[1]
+        bucket = self.bucket_of_task.get(task_key)
+        if bucket is None:
+            bucket = len(self.bucket_rows)
+            self.bucket_of_task[task_key] = bucket
+            self.bucket_rows.append([])
+            if bucket >= len(self.bucket_tasks):
+                self.bucket_tasks = self.grow(self.bucket_tasks, max(1, 2 * len(self.bucket_tasks)))
+            self.bucket_tasks[bucket] = task_key
+        self.bucket_rows[bucket].append(row)
+
+    def remove(self, state):
+        row = self.row_of_state.get(state)
+        if row is None:
+            return
+        self.bucket_rows[self.bucket_of_task[state.key[1]]].remove(row)
+        super().remove(state)
+
+    def compact(self):
+        super().compact()
+        self.bucket_of_task = {}
+        self.bucket_rows = []
+        for row, state in enumerate(self.states):
+            self.add_to_bucket(state, row)
+
+    def find_nearest(self, state, threshold=None):
+        if len(self.row_of_state) == 0:
+            return None, float('inf')
+        _, query_task = self.to_arrays(state)
+        buckets_count = len(self.bucket_rows)
+        # the task part of the distance alone is a lower bound of the distance to every state of a bucket
+        lower_bounds = ((self.bucket_tasks[:buckets_count] - query_task) ** 2).sum(axis=1)
+        best_row = -1
+        best_distance = PADDING_DISTANCE
+        batch = []
+        batch_size = MIN_BUCKET_BATCH_ROWS
+        for bucket in np.argsort(lower_bounds, kind="stable"):
+            lower_bound = int(lower_bounds[bucket])
+            if lower_bound > best_distance or (threshold is not None and math.sqrt(lower_bound) > threshold):
+                break
+            batch.extend(self.bucket_rows[bucket])
+            if len(batch) < batch_size:
+                continue
+            # the buckets are evaluated in batches of growing size, so that near states are found early
+            # while the far ones don't cost one call per bucket
+            best_distance, best_row = self.best_of_rows(state, batch, best_distance, best_row)
+            batch = []
+            batch_size *= 2
+        if len(batch) > 0:
+            best_distance, best_row = self.best_of_rows(state, batch, best_distance, best_row)
+        if best_row == -1:
+            return None, float('inf')
+        return self.nearest_within(best_row, best_distance, threshold)
+
+
+    def best_of_rows(self, state, rows, best_distance, best_row):
+        rows = np.array(rows, dtype=np.int64)
+        squared_distances = self.squared_distances(state, rows)
+        # ties go to the earliest row, as in the brute-force search
+        distance = int(squared_distances.min())
+        row = int(rows[squared_distances == distance].min())
+        if distance < best_distance or (distance == best_distance and row < best_row):
+            return distance, row
+        return best_distance, best_row
+
+
+class LSHStateIndex(StateIndex):
+    def __init__(self, states=(), capacity=1024, tables=None, hashes=None, bucket_width=None, seed=0):
+        tables = tables or Config.Q_LEARNING_LSH_TABLES
+        hashes = hashes or Config.Q_LEARNING_LSH_HASHES
+        self.bucket_width = bucket_width or Config.Q_LEARNING_LSH_BUCKET_WIDTH
+        rng = np.random.default_rng(seed)
+        # p-stable hashing: h(v) = floor((a . v + b) / w), with a drawn from a normal distribution
+        self.projections = rng.normal(size=(tables, hashes, EMBEDDING_SIZE))
+        self.offsets = rng.uniform(0, self.bucket_width, size=(tables, hashes))
+        self.tables = [{} for _ in range(tables)]
+        super().__init__(states, capacity)
+
+    def hash_state(self, state):
+        embedding = embed_state(state)
+        hashes = np.floor((self.projections @ embedding + self.offsets) / self.bucket_width).astype(np.int64)
+        return [tuple(table_hashes) for table_hashes in hashes.tolist()]
+
+    def add(self, state):
+        if state in self.row_of_state:
+            return self.row_of_state[state]
+        row = super().add(state)
+        self.add_to_tables(state, row)
+        return row
+
+    def add_to_tables(self, state, row):
+        for table, bucket in zip(self.tables, self.hash_state(state)):
+            table.setdefault(bucket, []).append(row)
+
+    def remove(self, state):
+        row = self.row_of_state.get(state)
+        if row is None:
+            return
+        for table, bucket in zip(self.tables, self.hash_state(state)):
+            table[bucket].remove(row)
+        super().remove(state)
+
+    def compact(self):
+        super().compact()
+        self.tables = [{} for _ in self.tables]
+        for row, state in enumerate(self.states):
+            self.add_to_tables(state, row)
+
+    def find_nearest(self, state, threshold=None):
+        candidates = set()
+        for table, bucket in zip(self.tables, self.hash_state(state)):
+            candidates.update(table.get(bucket, ()))
+        if len(candidates) == 0:
+            return None, float('inf')
+        rows = np.array(sorted(candidates), dtype=np.int64)
+        squared_distances = self.squared_distances(state, rows)
+        i = int(np.argmin(squared_distances))
+        return self.nearest_within(int(rows[i]), int(squared_distances[i]), threshold)
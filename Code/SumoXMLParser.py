@@ -7,10 +7,12 @@
 import xml.etree.ElementTree as ET
 import Node
 from Config import Config
+from TaskSchedule import TaskSchedule
 from ZoneManagerQLearning import ZoneManagerQlearning
 from ZoneManagerRandom import ZoneManagerRandom
 from ZoneManagerHeuristic import ZoneManagerHeuristic
 from ZoneManagerA3C import ZoneManagerA3C
+from ZoneManagerMatching import ZoneManagerMatching
 
 
 class SumoXMLParser:
@@ -37,40 +39,125 @@ class SumoXMLParser:
         for timestep in root.findall('timestep'):
             time = float(timestep.get('time'))
             for vehicle in timestep.findall('vehicle'):
-                vehicle_id = vehicle.get('id')
-                x = float(vehicle.get('x'))
-                y = float(vehicle.get('y'))
-                speed = float(vehicle.get('speed'))
-                angle = float(vehicle.get('angle'))
                 if time not in vehicles:
                     vehicles[time] = []
-                type = vehicle.get('type')
-
-                if type == 'mobileFog':
-                    # vehicles[time].append(
-                    node = Node.Node(
-                        vehicle_id,
-                        Node.Layer.Fog,
-                        x=x,
-                        y=y,
-                        speed=speed,
-                        angle=angle,
-                        # coverage_radius=Config.FOG_COVERAGE_RADIUS,
-                    )
-                    if vehicle.get('power'):
-                        node.power = float(vehicle.get('power'))
-                    if vehicle.get('coverage_radius'):
-                        node.coverage_radius = float(vehicle.get('coverage_radius'))
-                    vehicles[time].append(node)
-                else:
-                    vehicles[time].append(Node.Node(
-                        id=vehicle_id,
-                        layer=Node.Layer.Users,
-                        x=x,
-                        y=y,
-                        speed=speed,
-                        angle=angle
-                    ))
+                vehicles[time].append(self.parse_vehicle(vehicle))
+
+    @staticmethod
+    def parse_vehicle(vehicle):
+        return SumoXMLParser.make_vehicle_node(SumoXMLParser.parse_vehicle_record(vehicle))
+
+    @staticmethod
+    def parse_vehicle_record(vehicle):
+        """
+        Returns:
+            tuple: The (id, layer, x, y, speed, angle, power, coverage_radius) of a vehicle element. The power and
+                the coverage radius are None when the element doesn't set them, and always for the users.
+        """
+        vehicle_id = vehicle.get('id')
+        x = float(vehicle.get('x'))
+        y = float(vehicle.get('y'))
+        speed = float(vehicle.get('speed'))
+        angle = float(vehicle.get('angle'))
+        type = vehicle.get('type')
+
+        if type == 'mobileFog':
+            power = float(vehicle.get('power')) if vehicle.get('power') else None
+            coverage_radius = float(vehicle.get('coverage_radius')) if vehicle.get('coverage_radius') else None
+            return vehicle_id, Node.Layer.Fog, x, y, speed, angle, power, coverage_radius
+        return vehicle_id, Node.Layer.Users, x, y, speed, angle, None, None
+
+    @staticmethod
+    def make_vehicle_node(record):
+        vehicle_id, layer, x, y, speed, angle, power, coverage_radius = record
+        if layer == Node.Layer.Fog:
+            node = Node.Node(
+                vehicle_id,
+                Node.Layer.Fog,
+                x=x,
+                y=y,
+                speed=speed,
+                angle=angle,
+                # coverage_radius=Config.FOG_COVERAGE_RADIUS,
+            )
+            if power is not None:
+                node.power = power
+            if coverage_radius is not None:
+                node.coverage_radius = coverage_radius
+            return node
+        return Node.Node(
+            id=vehicle_id,
+            layer=Node.Layer.Users,
+            x=x,
+            y=y,
+            speed=speed,
+            angle=angle
+        )
+
+    @staticmethod
+    def make_zone(name, x, y, coverage_radius):
+        mode = Config.RUNNING_MODE
+        if mode == Config.RUNNING_MODE_Q_LEARNING:
+            return ZoneManagerQlearning(x=x, y=y, coverage_radius=coverage_radius, name=name)
+        elif mode == Config.RUNNING_MODE_RANDOM or mode == Config.RUNNING_MODE_FULLY_RANDOM:
+            return ZoneManagerRandom(x=x, y=y, coverage_radius=coverage_radius, name=name)
+        elif mode == Config.RUNNING_MODE_HEURISTIC:
+            return ZoneManagerHeuristic(x=x, y=y, coverage_radius=coverage_radius, name=name)
+        elif mode == Config.RUNNING_MODE_A3C:
+            return ZoneManagerA3C(x=x, y=y, coverage_radius=coverage_radius, name=name)
+        elif mode == Config.RUNNING_MODE_MATCHING:
+            return ZoneManagerMatching(x=x, y=y, coverage_radius=coverage_radius, name=name)
+        else:
+            error = f"Invalid running mode: {mode}"
+            raise ValueError(error)
+
+    def iter_timestep_records(self, file_path):
+        """
+        Yields the (time, records) of the time steps of a trace file one by one, as they are read, with the records
+        of parse_vehicle_record. The elements of a time step are cleared once it is parsed, so the memory used
+        doesn't depend on the length of the file. Time steps without vehicles are skipped, as in parse.
+        """
+        context = iter(ET.iterparse(file_path, events=("start", "end")))
+        _, root = next(context)
+        for event, element in context:
+            if event != "end" or element.tag != 'timestep':
+                continue
+            time = float(element.get('time'))
+            records = [self.parse_vehicle_record(vehicle) for vehicle in element.findall('vehicle')]
+            root.clear()
+            if records:
+                yield time, records
+
+    def iter_timesteps(self, file_path):
+        """
+        Yields the (time, nodes) of the time steps of a trace file one by one, as they are read.
+        """
+        for time, records in self.iter_timestep_records(file_path):
+            yield time, [self.make_vehicle_node(record) for record in records]
+
+    def iter_trace_records(self):
+        """
+        Yields the (time, records) of the time steps of the vehicles and mobile fog nodes files, merged by time, in
+        increasing order of time. The records of the vehicles come first.
+        """
+        streams = [self.iter_timestep_records(self.filepath), self.iter_timestep_records(self.mobileFilepath)]
+        heads = [next(stream, None) for stream in streams]
+        while any(head is not None for head in heads):
+            time = min(head[0] for head in heads if head is not None)
+            nodes = []
+            for i, head in enumerate(heads):
+                if head is not None and head[0] == time:
+                    nodes.extend(head[1])
+                    heads[i] = next(streams[i], None)
+            yield time, nodes
+
+    def iter_trace(self):
+        """
+        Streaming version of parse: yields the (time, nodes) of the time steps of the vehicles and mobile fog nodes
+        files, merged by time, in increasing order of time.
+        """
+        for time, records in self.iter_trace_records():
+            yield time, [self.make_vehicle_node(record) for record in records]
 
     def parse_task(self):
         tree = ET.parse(self.taskFilePath)
@@ -92,10 +179,21 @@ class SumoXMLParser:
 
         return task_data
 
+    def parse_task_schedule(self):
+        return TaskSchedule.from_task_data(self.parse_task())
+
     def parse_fixed_fog_node(self):
+        return [self.make_fixed_fog_node(record) for record in self.parse_fixed_fog_node_records()]
+
+    def parse_fixed_fog_node_records(self):
+        """
+        Returns:
+            list: The (id, x, y, power, coverage_radius) of the fixed fog nodes, the coverage radius is None when
+                the element doesn't set it.
+        """
         tree = ET.parse(self.fixedFogNodeFilePath)
         root = tree.getroot()
-        nodes = []
+        records = []
         for n in root.findall('node'):
             id = n.get('id')
             x = float(n.get('x'))
@@ -103,31 +201,33 @@ class SumoXMLParser:
             type = n.get('type')
             power = float(n.get('power'))
             lane = int(n.get('lane'))
-            node = Node.Node(id, Node.Layer.Fog, power=power, x=x, y=y, coverage_radius=Config.FOG_COVERAGE_RADIUS)
-            if n.get('coverage_radius'):
-                node.coverage_radius = float(n.get('coverage_radius'))
-            nodes.append(node)
-        return nodes
+            coverage_radius = float(n.get('coverage_radius')) if n.get('coverage_radius') else None
+            records.append((id, x, y, power, coverage_radius))
+        return records
+
+    @staticmethod
+    def make_fixed_fog_node(record):
+        id, x, y, power, coverage_radius = record
+        node = Node.Node(id, Node.Layer.Fog, power=power, x=x, y=y, coverage_radius=Config.FOG_COVERAGE_RADIUS)
+        if coverage_radius is not None:
+            node.coverage_radius = coverage_radius
+        return node
 
     def parse_zone(self):
+        return [self.make_zone(*record) for record in self.parse_zone_records()]
+
+    def parse_zone_records(self):
+        """
+        Returns:
+            list: The (name, x, y, coverage_radius) of the zones.
+        """
         tree = ET.parse(self.zoneFilePath)
         root = tree.getroot()
-        zones = []
+        records = []
         for z in root.findall('zone'):
             name = z.get('name')
             x = float(z.get('x'))
             y = float(z.get('y'))
             coverage_radius = float(z.get('coverage_radius'))
-            mode = Config.RUNNING_MODE
-            if mode == Config.RUNNING_MODE_Q_LEARNING:
-                zones.append(ZoneManagerQlearning(x=x, y=y, coverage_radius=coverage_radius, name=name))
-            elif mode == Config.RUNNING_MODE_RANDOM or mode == Config.RUNNING_MODE_FULLY_RANDOM:
-                zones.append(ZoneManagerRandom(x=x, y=y, coverage_radius=coverage_radius, name=name))
-            elif mode == Config.RUNNING_MODE_HEURISTIC:
-                zones.append(ZoneManagerHeuristic(x=x, y=y, coverage_radius=coverage_radius, name=name))
-            elif mode == Config.RUNNING_MODE_A3C:
-                zones.append(ZoneManagerA3C(x=x, y=y, coverage_radius=coverage_radius, name=name))
-            else:
-                error = f"Invalid running mode: {mode}"
-                raise ValueError(error)
-        return zones
+            records.append((name, x, y, coverage_radius))
+        return records
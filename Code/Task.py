@@ -28,6 +28,11 @@ class Task:
         self.creation_state = None
         self.is_migrated = False
         self.is_deadline_missed = False
+        # set by the CompletionScheduler when the task is appended to a node
+        self.finish_time = None
+        self.completion_number = None
+        # set by the TaskQueue: the zones the task waits for capacity in, None when it is retried on every step
+        self.waiting_zones = None
 
     def set_creation_state(self, state):
         self.creation_state = state
@@ -0,0 +1,170 @@
+"""
+    The queue of the tasks that found neither a fog node nor the cloud, retried on every step by
+    Topology.process_task_queue.
+
+    The tasks are kept in a min-heap ordered by their deadline slack, the time that would be left before the deadline
+    if the task were executed right away: deadline - current time - exec_time. The current time is the same for all
+    the tasks, so the heap is keyed by deadline - exec_time.
+        - A task with a negative slack can't finish before its deadline on any node, even at no distance. It is
+          expired as soon as it is pushed or found in the queue, and counted as a deadline miss, instead of being
+          broadcast to the zones again.
+        - On overflow, the tasks of lowest value are shed. The tasks carry no value of their own, so the value of a
+          queued task is its slack: the ones closest to expiring are the least likely to be placed in time by a retry.
+          They are at the top of the heap.
+
+    A queued task is only retried when something that could place it changed. When it fails, it subscribes to the
+    zones it targeted and to the cloud, and the fog nodes and zones publish the capacity that appears:
+        - a task removed from a fog node or the cloud frees its power (Node.remove_task)
+        - a fog node handed to a zone brings its power to the zone (ZoneManagerBase.add_fog_node)
+    These events are collected in capacity_events during a step and published to the queue by the topology at the
+    next one, where they wake the subscribed tasks whose needed power is available now. A task is also retried
+    when its user moved to other target zones, and on every step when it has no subscription, as the tasks of the
+    fully random mode and the ones queued back by a leaving fog node. The moves of the fog nodes inside a zone don't
+    wake the tasks.
+"""
+
+import heapq
+
+from Config import Config
+from Evaluater import Evaluator
+
+# the subscription key of the cloud, targeted by all the tasks after their zones
+CLOUD = "cloud"
+
+
+def get_slack(task, time):
+    return task.deadline - time - task.exec_time
+
+
+class CapacityEvents:
+    """
+    The fog nodes that freed power and the zones that were handed a fog node since the last step, with the power
+    that appeared.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.zones = []
+
+    def publish_node(self, node):
+        self.nodes.append(node)
+
+    def publish_zone(self, zone, fog_node):
+        self.zones.append((zone, fog_node))
+
+    def clear(self):
+        self.nodes = []
+        self.zones = []
+
+
+capacity_events = CapacityEvents()
+
+
+class TaskQueue:
+    def __init__(self, max_size=Config.TASK_QUEUE_SIZE):
+        # (deadline - exec_time, entry number, task), the entry number keeps the order of the pushes on ties
+        self.heap = []
+        self.entries_count = 0
+        self.max_size = max_size
+        # subscription key (zone or CLOUD) -> the queued tasks waiting for capacity there
+        self.subscribers = {}
+        # the queued tasks to retry at the next step
+        self.woken_tasks = set()
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, task, time, target_zones=None):
+        """
+        Queues a task, subscribed to its target zones and to the cloud. Without target zones, the task is retried
+        on every step.
+        """
+        if get_slack(task, time) < 0:
+            self.expire_task(task)
+            return
+        heapq.heappush(self.heap, (task.deadline - task.exec_time, self.entries_count, task))
+        self.entries_count += 1
+        if target_zones is None:
+            task.waiting_zones = None
+            self.woken_tasks.add(task)
+            return
+        task.waiting_zones = frozenset(target_zones)
+        for key in list(task.waiting_zones) + [CLOUD]:
+            self.subscribers.setdefault(key, set()).add(task)
+
+    def unsubscribe(self, task):
+        self.woken_tasks.discard(task)
+        if task.waiting_zones is None:
+            return
+        for key in list(task.waiting_zones) + [CLOUD]:
+            self.subscribers[key].discard(task)
+
+    def publish(self, key, power):
+        """
+        Wakes the tasks subscribed to a zone, or to the cloud, that need at most the given power.
+        """
+        subscribers = self.subscribers.get(key)
+        if not subscribers:
+            return
+        self.woken_tasks.update(task for task in subscribers if task.power_needed <= power)
+
+    @staticmethod
+    def expire_task(task):
+        Evaluator.increment_expired_tasks()
+        Evaluator.increment_deadline_misses()
+        print("Task expired:", task.name, "can't meet its deadline anymore.")
+
+    def expire(self, time):
+        """
+        Expires the queued tasks whose slack became negative, they are the ones at the top of the heap.
+        """
+        while self.heap and self.heap[0][0] - time < 0:
+            _, _, task = heapq.heappop(self.heap)
+            self.unsubscribe(task)
+            self.expire_task(task)
+
+    def shed(self):
+        """
+        Drops the tasks of lowest value until the queue fits in its maximum size.
+        """
+        while len(self.heap) > self.max_size:
+            _, _, task = heapq.heappop(self.heap)
+            self.unsubscribe(task)
+            Evaluator.increment_deadline_misses()
+            print("Task missed:", task.name, "due to queue overflow.")
+
+    def drain(self):
+        """
+        Returns:
+            list: All the queued tasks in increasing order of slack, the queue is left empty.
+        """
+        tasks = [task for _, _, task in sorted(self.heap)]
+        for task in tasks:
+            self.unsubscribe(task)
+        self.heap = []
+        return tasks
+
+    def take_ready(self, is_moved):
+        """
+        Takes the tasks to retry out of the queue: the woken ones, and the ones for which is_moved(task) tells that
+        their target zones changed. The others stay queued with their subscriptions.
+
+        Returns:
+            list: The tasks to retry, in increasing order of slack.
+        """
+        ready = []
+        waiting = []
+        for entry in self.heap:
+            task = entry[2]
+            if task in self.woken_tasks or is_moved(task):
+                ready.append(entry)
+            else:
+                waiting.append(entry)
+        if not ready:
+            return []
+        heapq.heapify(waiting)
+        self.heap = waiting
+        tasks = [task for _, _, task in sorted(ready)]
+        for task in tasks:
+            self.unsubscribe(task)
+        return tasks
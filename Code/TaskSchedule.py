@@ -0,0 +1,82 @@
+"""
+    The tasks of a scenario as a columnar table sorted by creation time, with a release cursor, replacing the scan of
+    the whole list of task dicts on every tick.
+
+    The numeric attributes are kept in NumPy arrays and the creators as numbers into the list of the distinct
+    creators. The sort is stable, so the tasks of a tick keep the order of the task file. release(time) hands out
+    the tasks created at the given time, found by binary search from the cursor, and builds their task data only
+    then; the Task objects are created from it by the creator node, as before. As in the scan, a task whose creation
+    time is not one of the ticks of the simulation is never released.
+"""
+
+import numpy as np
+
+
+class TaskSchedule:
+    def __init__(self, names, creators, creation_times, deadlines, powers_needed, sizes):
+        """
+        Args:
+            names (list): The names of the tasks.
+            creators (list): The ids of the nodes that create the tasks, None for no creator.
+            creation_times, deadlines, powers_needed, sizes (list): The numeric attributes of the tasks.
+        """
+        order = np.argsort(np.asarray(creation_times, dtype=np.float64), kind="stable")
+        self.creation_times = np.asarray(creation_times, dtype=np.float64)[order]
+        self.deadlines = np.asarray(deadlines, dtype=np.float64)[order]
+        self.powers_needed = np.asarray(powers_needed, dtype=np.float64)[order]
+        self.sizes = np.asarray(sizes, dtype=np.float64)[order]
+        self.names = [names[number] for number in order.tolist()]
+        self.creators = []
+        creator_numbers = {}
+        for creator in creators:
+            if creator not in creator_numbers:
+                creator_numbers[creator] = len(self.creators)
+                self.creators.append(creator)
+        self.creator_numbers = np.array([creator_numbers[creator] for creator in creators],
+                                        dtype=np.int32)[order]
+        self.cursor = 0
+
+    @classmethod
+    def from_task_data(cls, task_data):
+        """
+        Returns:
+            TaskSchedule: The schedule of a list of task dicts, as returned by SumoXMLParser.parse_task.
+        """
+        return cls([task["name"] for task in task_data],
+                   [task["creator"] for task in task_data],
+                   [task["creation_time"] for task in task_data],
+                   [task["deadline"] for task in task_data],
+                   [task["power_needed"] for task in task_data],
+                   [task["size"] for task in task_data])
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def pending_count(self):
+        return len(self) - self.cursor
+
+    def get_task_data(self, number):
+        """
+        Returns:
+            dict: The task data of the task with the given number in the schedule, as used by Node.generate_task.
+        """
+        return {"name": self.names[number],
+                "power_needed": self.powers_needed.item(number),
+                "size": self.sizes.item(number),
+                "deadline": self.deadlines.item(number),
+                "creator": self.creators[self.creator_numbers.item(number)],
+                "creation_time": self.creation_times.item(number)}
+
+    def release(self, time):
+        """
+        Moves the cursor to the given time, which must not be before the time of the previous call. The tasks
+        created before it and not released yet are skipped.
+
+        Returns:
+            list: The task data of the tasks created at the given time, in the order of the task file.
+        """
+        start = max(int(np.searchsorted(self.creation_times, time, side="left")), self.cursor)
+        end = max(int(np.searchsorted(self.creation_times, time, side="right")), self.cursor)
+        self.cursor = end
+        return [self.get_task_data(number) for number in range(start, end)]
@@ -1,9 +1,19 @@
+import heapq
 import random
-from collections import deque
+import time
+
+import numpy as np
 
 from Clock import Clock
+import CompletionScheduler
+import DistanceCache
+import NodeStore
+from TaskQueue import TaskQueue, CLOUD, capacity_events
+from DistanceCache import get_distance
 from ZoneManagerBase import *
 from ZoneBroadcaster import ZoneBroadcaster
+from ZoneManagerMatching import match_tasks
+from SpatialGrid import ZoneGrid, FogNodeGrid
 
 """
     The Topology class serves as the central management component of the system, integrating different layers: 
@@ -13,7 +23,7 @@ from ZoneBroadcaster import ZoneBroadcaster
     The Topology class also updates the state of the network as nodes move and tasks are completed.
 """
 
-from Node import Node
+from Node import Node, Layer
 
 
 class Topology:
@@ -25,91 +35,216 @@ class Topology:
         self.TIMESLOT_LENGTH = timeslot_length
         self.zones = []
         self.zone_broadcaster = ZoneBroadcaster()
-        self.task_queue = deque()
+        self.zone_grid = None
+        self.fog_node_grid = None
+        self.task_queue = TaskQueue()
+        # zone (or the cloud layer) -> the (node, task) of its tasks that finished in the current step
+        self.finished_tasks = {}
+        # queued task -> the target zones that is_moved found for it in the current step, reused by its retry
+        self.moved_target_zones = {}
 
     def set_zones(self, zones):
-        self.zone_broadcaster.set_zones(zones)
+        self.zone_grid = ZoneGrid(zones, self.fog_layer.get_fixed_nodes())
+        self.fog_node_grid = FogNodeGrid(self.zone_grid, self.graph.get_moving_fog_nodes())
+        self.zone_broadcaster.set_zones(zones, self.zone_grid)
         self.zones = zones
+        for zone in zones:
+            zone.fog_node_grid = self.fog_node_grid
 
     def update_topology(self):
         self.graph.update_graph()
+        for node in self.graph.departed_nodes:
+            if node.layer == Layer.Fog:
+                self.remove_fog_node(node)
+        for node in self.graph.arrived_nodes:
+            if node.layer == Layer.Fog:
+                self.fog_layer.add_node(node)
+                self.assign_fog_nodes_to_zones(node)
+        self.fog_node_grid.update(self.graph.get_moving_fog_nodes())
+        self.collect_finished_tasks()
         for zone_manager in self.zones:
             zone_manager.update(self)
-        for node in self.cloud_layer.get_nodes():
-            for task in node.tasks:
-                if node.is_done(task):
-                    node.remove_task(task)
-                    self.send_cloud_task_result_to_owner(task)
+        for node, task in self.pop_finished_tasks(self.cloud_layer):
+            node.remove_task(task)
+            self.send_cloud_task_result_to_owner(task)
+
+    def collect_finished_tasks(self):
+        """
+        Pops the tasks that finish by the current time from the completion scheduler, and hands the ones of the
+        fog nodes to the first zone that has their fog node, as the zones used to find them in turn. The ones of the
+        fog nodes that no zone has wait until a zone adds their fog node.
+        """
+        self.finished_tasks = {}
+        for node, task in CompletionScheduler.scheduler.pop_finished(Clock.time):
+            if node.layer == Layer.Cloud:
+                owner = self.cloud_layer
+            else:
+                owner = next((zone for zone in self.zones if node in zone.fog_node_numbers), None)
+                if owner is None:
+                    CompletionScheduler.scheduler.defer(node, task)
+                    continue
+            task.set_result("Random Result")
+            self.finished_tasks.setdefault(owner, []).append((node, task))
+
+    def pop_finished_tasks(self, owner):
+        """
+        Returns:
+            list: The (node, task) of the tasks of a zone, or of the cloud layer, that finished in the current step.
+        """
+        return self.finished_tasks.pop(owner, [])
+
+    def remove_fog_node(self, fog_node):
+        """
+        Removes a mobile fog node that left the trace. Its unfinished tasks go back to the task queue,
+        to be assigned again in the next step.
+        """
+        self.fog_layer.remove_node(fog_node)
+        for zone in self.zones:
+            if fog_node in zone.fog_node_numbers:
+                zone.remove_fog_node(fog_node)
+        for task in list(fog_node.tasks):
+            fog_node.remove_task(task)
+            task.remove_assignee()
+            self.task_queue.push(task, Clock.time)
+            print(f"Task {task.name} is queued again since fog node {fog_node.id} left")
+        # its deferred tasks were among its tasks, queued again above
+        CompletionScheduler.scheduler.drop(fog_node)
+        print(f"Fog node {fog_node.id} left the simulation")
+
+    def get_task_owner(self, task: Task):
+        """
+        The owner of a task, the node object that created it if the owner is not in the trace anymore.
+        """
+        owner = self.get_node(task.creator.id)
+        if owner is None:
+            owner = task.creator
+        return owner
 
     def send_cloud_task_result_to_owner(self, task: Task):
         owner_id = task.creator.id
-        owner = self.get_node(owner_id)
+        owner = self.get_task_owner(task)
         x, y = owner.x, owner.y
         owner.deliver_task_result(task)
         print(f"Task {task.name} is sent to owner {owner_id} at ({x}, {y})")
 
     def assign_fog_nodes_to_zones(self, fog_node, limit=False):
         assigned_count = 0
-        for zone in self.zones:
-            if zone.is_within_coverage(fog_node.x, fog_node.y):
-                zone.add_fog_node(fog_node)
-                assigned_count += 1
-                if limit:
-                    if assigned_count >= 3:
-                        break
+        for zone in self.zone_grid.get_zones_by_position(fog_node.x, fog_node.y):
+            zone.add_fog_node(fog_node)
+            assigned_count += 1
+            if limit:
+                if assigned_count >= 3:
+                    break
 
     def assign_task(self, user_node: Node, task):
         if Config.RUNNING_MODE == Config.RUNNING_MODE_FULLY_RANDOM:
             self.assign_task_random(user_node, task)
             return
 
-        zone_broadcaster = self.zone_broadcaster
-        target_zones = self.get_target_zones(task.exec_time, user_node, zone_broadcaster)
-        offers = zone_broadcaster.broadcast_to_zones(target_zones, user_node, task)
+        target_zones = self.get_target_zones(task.exec_time, user_node, self.zone_broadcaster)
+        self.place_task(user_node, task, target_zones)
+
+    def assign_tasks(self, tasks):
+        """
+        Assigns the tasks released in a step as one batch. The nodes don't move within a step, so the target zones
+        of all the tasks, the fog nodes in range of their users and the distances to them and to the cloud are
+        computed at once with NumPy. The offers are then resolved task by task, in the order of the batch, exactly
+        as assign_task does: every commit takes the power of its fog node before the offers of the next task.
+        In the matching mode, the tasks are first matched to the fog nodes together (see ZoneManagerMatching), and
+        only the ones left out go through the offers.
 
+        Args:
+            tasks (list): The tasks, whose creators are the user nodes of the trace.
+        """
+        if Config.RUNNING_MODE == Config.RUNNING_MODE_FULLY_RANDOM or len(tasks) == 0:
+            for task in tasks:
+                self.assign_task(task.creator, task)
+            return
+        users = [task.creator for task in tasks]
+        exec_times = np.array([task.exec_time for task in tasks], dtype=np.float64)
+        # the nodes of the trace are all kept in the shared store
+        xs, ys, vxs, vys = NodeStore.store.gather([NodeStore.X, NodeStore.Y, NodeStore.VX, NodeStore.VY], users).T
+        current_zones = self.zone_broadcaster.get_zones_by_positions(xs, ys)
+        predicted_zones = self.zone_broadcaster.get_zones_by_positions(xs + vxs * exec_times, ys + vys * exec_times)
+        self.prefetch_distances(users, xs, ys)
+        target_zones_list = [self.select_target_zones(current, predicted)
+                             for current, predicted in zip(current_zones, predicted_zones)]
+        numbers = range(len(tasks))
+        if Config.RUNNING_MODE == Config.RUNNING_MODE_MATCHING:
+            numbers = match_tasks(tasks, target_zones_list, self.cloud_layer.get_nodes()[0])
+        for number in numbers:
+            self.place_task(users[number], tasks[number], target_zones_list[number])
+
+    def prefetch_distances(self, users, xs, ys):
+        """
+        Finds the fog nodes in range of the users of a batch, and puts their distances to the users, and the ones
+        of the cloud, in the distance cache of the step.
+        """
+        start = time.perf_counter()
+        fog_nodes, distances, in_range = self.fog_node_grid.prefetch(xs, ys)
+        if not Config.DISTANCE_CACHE:
+            return
         cloud = self.cloud_layer.get_nodes()[0]
-        cloud_distance = cloud.distance(user_node)
-
-        is_successful = False
-        while not is_successful and len(offers) > 0:
-            min_distance = float('inf')
-            best_zone = None
-            best_offer = None
-            for offer in offers:
-                zone_name, fog_node = offer
-                zone = zone_broadcaster.get_zone(zone_name)
-                distance = fog_node.distance(user_node)
-                if distance < min_distance:
-                    min_distance = distance
-                    best_zone = zone
-                    best_offer = offer
-            # accept offer
-            if min_distance < 0.5 * cloud_distance:
-                is_successful = best_zone.accept_offer(user_node, task, best_offer)
-                if not is_successful:
-                    offers.remove(best_offer)
-            else:
+        cloud_distances = np.sqrt((cloud.x - xs) ** 2 + (cloud.y - ys) ** 2)
+        batch_distances = {(cloud, user_node): distance
+                           for user_node, distance in zip(users, cloud_distances.tolist())}
+        for user_number, fog_node_number in zip(*np.nonzero(in_range)):
+            batch_distances[(fog_nodes[fog_node_number], users[user_number])] = \
+                distances.item(user_number, fog_node_number)
+        DistanceCache.cache.update(batch_distances, time.perf_counter() - start)
+
+    def place_task(self, user_node, task, target_zones):
+        """
+        Offers a task to its target zones and accepts the offer of the nearest fog node, as long as it is closer than
+        half the distance to the cloud. Without any, the task goes to the cloud, or to the task queue.
+
+        The offers are taken from a min-heap of their distances, the first offer in the order of the zones on ties,
+        so a refused offer only costs a pop. The first offer beyond the cutoff ends the search, the others being
+        farther.
+        """
+        offers = self.zone_broadcaster.broadcast_to_zones(target_zones, user_node, task)
+        offers_heap = [(offer.distance, number, offer) for number, offer in enumerate(offers)]
+        heapq.heapify(offers_heap)
+
+        cloud = self.cloud_layer.get_nodes()[0]
+        max_distance = 0.5 * get_distance(cloud, user_node)
+
+        while offers_heap:
+            distance, _, offer = offers_heap[0]
+            if distance >= max_distance:
                 break
+            heapq.heappop(offers_heap)
+            if offer.zone.accept_offer(user_node, task, offer):
+                Evaluator.increment_accepted_offers()
+                return
 
-        if len(offers) == 0 and not is_successful:
+        if len(offers_heap) == 0:
             cloud = self.cloud_layer.get_nodes()[0]
 
             if cloud.power >= task.power_needed and cloud.is_in_range(user_node.x, user_node.y) \
-                    and ZoneManagerBase.not_enough_time(task, cloud.distance(user_node), is_cloud=True):
+                    and ZoneManagerBase.not_enough_time(task, get_distance(cloud, user_node), is_cloud=True):
                 cloud.append_task(task)
                 Evaluator.cloud_tasks += 1
                 return
             else:
-                self.task_queue.append(task)
+                self.task_queue.push(task, Clock.time, target_zones)
 
     def get_target_zones(self, exec_time_estimate, user_node, zone_broadcast):
-        new_x = user_node.x + user_node.speed * exec_time_estimate * math.cos(user_node.angle)
-        new_y = user_node.y + user_node.speed * exec_time_estimate * math.sin(user_node.angle)
+        new_x, new_y = user_node.get_pred_x_y(exec_time_estimate)
         current_zones = zone_broadcast.get_zones_by_position(user_node.x, user_node.y)
         if Config.RUNNING_MODE == Config.RUNNING_MODE_FULLY_RANDOM:
             return current_zones
         predicted_zones = zone_broadcast.get_zones_by_position(new_x, new_y)
-        ideal_zones = set(current_zones).intersection(set(predicted_zones))
+        return self.select_target_zones(current_zones, predicted_zones)
+
+    @staticmethod
+    def select_target_zones(current_zones, predicted_zones):
+        """
+        Returns:
+            The zones that cover the user both now and at its predicted position, or the current ones if none does.
+        """
+        # in the order of the current zones, so that seeded runs don't depend on the hashes of the zones
+        ideal_zones = [zone for zone in current_zones if zone in predicted_zones]
         if ideal_zones:
             target_zones = ideal_zones
         else:
@@ -120,6 +255,8 @@ class Topology:
         return self.graph.get_node(node_id)
 
     def get_nearest_zone(self, x, y):
+        if self.zone_grid is not None:
+            return self.zone_grid.get_nearest_zone(x, y)
         nearest_zone = None
         min_distance = float('inf')
         for zone in self.zones:
@@ -130,35 +267,73 @@ class Topology:
         return nearest_zone
 
     def process_task_queue(self):
-        queue_length = len(self.task_queue)
-        if queue_length > Config.TASK_QUEUE_SIZE:
-            for _ in range(queue_length - Config.TASK_QUEUE_SIZE):
-                task = self.task_queue.popleft()
-                Evaluator.increment_deadline_misses()
-                print("Task missed:", task.name, "due to queue overflow.")
-        for _ in range(queue_length):
-            task = self.task_queue.popleft()
+        """
+        Expires the queued tasks that can't meet their deadline anymore, sheds the ones of lowest value on overflow,
+        and retries once the ones that capacity appeared for or whose user moved to other zones, in increasing order
+        of slack. The ones that fail again are queued back. The retry of a moved task reuses the target zones found
+        by is_moved.
+        """
+        self.publish_capacity_events()
+        self.task_queue.expire(Clock.time)
+        self.task_queue.shed()
+        self.moved_target_zones = {}
+        for task in self.task_queue.take_ready(self.is_moved):
             task.creation_time = Clock.time
             user_node = task.creator
-            self.assign_task(user_node, task)
+            target_zones = self.moved_target_zones.pop(task, None)
+            if target_zones is None:
+                self.assign_task(user_node, task)
+            else:
+                self.place_task(user_node, task, target_zones)
+
+    def publish_capacity_events(self):
+        """
+        Publishes to the task queue the capacity that appeared since the last step, in the zones of the fog nodes
+        that freed power, in the zones that were handed a fog node and in the cloud.
+        """
+        if len(self.task_queue) > 0:
+            for node in dict.fromkeys(capacity_events.nodes):
+                if node.layer == Layer.Cloud:
+                    self.task_queue.publish(CLOUD, node.power)
+                    continue
+                for zone in self.zones:
+                    if node in zone.fog_node_numbers:
+                        self.task_queue.publish(zone, node.power)
+            for zone, fog_node in capacity_events.zones:
+                self.task_queue.publish(zone, fog_node.power)
+        capacity_events.clear()
+
+    def is_moved(self, task):
+        """
+        Returns:
+            bool: Whether the user of a queued task moved to other target zones than the ones the task waits for.
+        """
+        if task.waiting_zones is None:
+            return True
+        target_zones = self.get_target_zones(task.exec_time, task.creator, self.zone_broadcaster)
+        if frozenset(target_zones) == task.waiting_zones:
+            return False
+        # the nodes don't move until the retry, so the target zones are the same then
+        self.moved_target_zones[task] = target_zones
+        return True
 
     def assign_task_random(self, user_node, task):
         fog_nodes = self.fog_layer.get_nodes()
         if len(fog_nodes) == 0:
             cloud = self.cloud_layer.get_nodes()[0]
             if cloud.power >= task.power_needed and cloud.is_in_range(user_node.x, user_node.y) \
-                    and ZoneManagerBase.not_enough_time(task, cloud.distance(user_node), is_cloud=True):
+                    and ZoneManagerBase.not_enough_time(task, get_distance(cloud, user_node), is_cloud=True):
                 cloud.append_task(task)
                 Evaluator.cloud_tasks += 1
                 return
             else:
-                self.task_queue.append(task)
+                self.task_queue.push(task, Clock.time)
                 return
         else:
             fog_node = random.choice(fog_nodes)
             if fog_node.power >= task.power_needed and fog_node.is_in_range(user_node.x, user_node.y) \
-                    and not ZoneManagerBase.not_enough_time(task, fog_node.distance(user_node), fog_node):
+                    and not ZoneManagerBase.not_enough_time(task, get_distance(fog_node, user_node), fog_node):
                 fog_node.append_task(task)
             else:
-                self.task_queue.append(task)
+                self.task_queue.push(task, Clock.time)
                 return
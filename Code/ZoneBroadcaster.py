@@ -2,23 +2,33 @@
 class ZoneBroadcaster:
     def __init__(self):
         self.zones = []
+        self.zones_by_name = {}
+        self.zone_grid = None
 
-    def set_zones(self, zones):
+    def set_zones(self, zones, zone_grid=None):
         self.zones = zones
+        self.zones_by_name = {}
+        for zone in zones:
+            self.zones_by_name.setdefault(zone.name, zone)
+        self.zone_grid = zone_grid
 
     def get_zone(self, zone_name):
-        for zone in self.zones:
-            if zone.name == zone_name:
-                return zone
-        return None
+        return self.zones_by_name.get(zone_name)
 
     def get_zones_by_position(self, x, y):
+        if self.zone_grid is not None:
+            return self.zone_grid.get_zones_by_position(x, y)
         possible_zones = []
         for zone in self.zones:
             if zone.is_within_coverage(x, y):
                 possible_zones.append(zone)
         return possible_zones
 
+    def get_zones_by_positions(self, xs, ys):
+        if self.zone_grid is not None:
+            return self.zone_grid.get_zones_by_positions(xs, ys)
+        return [self.get_zones_by_position(x, y) for x, y in zip(xs.tolist(), ys.tolist())]
+
     @staticmethod
     def broadcast_to_zones(target_zones, user_node, task):
         offers = []
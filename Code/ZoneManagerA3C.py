@@ -1,6 +1,7 @@
 from ZoneManagerBase import ZoneManagerBase
 from LearnerA3C import LearnerA3C
 from Learner import *
+from DistanceCache import get_distance
 
 
 class ZoneManagerA3C(ZoneManagerBase):
@@ -21,13 +22,14 @@ class ZoneManagerA3C(ZoneManagerBase):
         assignee = self.learner.get_suggested_assignee(
             all_fog_nodes=self.fog_nodes,
             possible_fog_nodes=possible_fog_nodes,
-            task=task
+            task=task,
+            fog_nodes_by_id=self.fog_nodes_by_id
         )
         if assignee is None:
             # in this case, we should assign the task to fog node with least predicted + current distance
             assignee = min(possible_fog_nodes,
-                           key=lambda fog_node: fog_node.distance(user_node) + fog_node.distance_in_future(user_node,
-                                                                                                           task.exec_time))
+                           key=lambda fog_node: get_distance(fog_node, user_node) + fog_node.distance_in_future(
+                               user_node, task.exec_time))
         return assignee
 
     def get_possible_fog_nodes(self, task, user_node):
@@ -43,7 +45,7 @@ class ZoneManagerA3C(ZoneManagerBase):
     @timer_log
     def accept_offer(self, user_node, task, offer):
         possible_nodes = self.get_possible_fog_nodes(task, user_node)
-        assignee = offer[1]
+        assignee = offer.fog_node
         if assignee in possible_nodes:
             assignee.append_task(task)
             state = self.get_state(task)
@@ -55,8 +57,7 @@ class ZoneManagerA3C(ZoneManagerBase):
         return State.get_from_fog_nodes_and_task(self.fog_nodes, task)
 
     def send_task_result_to_owner(self, task, topology):
-        ownder_id = task.creator.id
-        owner = topology.get_node(ownder_id)
+        owner = topology.get_task_owner(task)
         x, y = owner.x, owner.y
         owner.deliver_task_result(task)
 
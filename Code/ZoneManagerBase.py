@@ -3,9 +3,27 @@ from abc import ABC, abstractmethod
 
 from Node import Node
 from Task import Task
+import CompletionScheduler
+from TaskQueue import capacity_events
+from DistanceCache import get_distance
 from Evaluater import *
 
 
+class Offer:
+    """
+    The offer of a zone for a task: the fog node the zone would assign the task to, and its distance to the user.
+    """
+    __slots__ = ("zone", "fog_node", "distance")
+
+    def __init__(self, zone, fog_node, distance):
+        self.zone = zone
+        self.fog_node = fog_node
+        self.distance = distance
+
+    def __repr__(self):
+        return f"Offer(zone={self.zone.name}, fog_node={self.fog_node.id}, distance={self.distance})"
+
+
 class ZoneManagerBase(ABC):
     @abstractmethod
     def __init__(self, x, y, coverage_radius, name):
@@ -14,6 +32,13 @@ class ZoneManagerBase(ABC):
         self.coverage_radius = coverage_radius
         self.name = name
         self.fog_nodes = []
+        # fog node -> insertion number, for membership checks and for keeping the order of self.fog_nodes
+        self.fog_node_numbers = {}
+        self.fog_nodes_count = 0
+        # fog node id -> the first fog node of the zone with that id
+        self.fog_nodes_by_id = {}
+        # the FogNodeGrid shared by the zones, set by the topology. Without it the fog nodes are scanned one by one
+        self.fog_node_grid = None
 
     @abstractmethod
     def is_within_coverage(self, point_x, point_y):
@@ -22,8 +47,13 @@ class ZoneManagerBase(ABC):
 
     @abstractmethod
     def add_fog_node(self, fog_node):
-        if fog_node not in self.fog_nodes:
+        if fog_node not in self.fog_node_numbers:
             self.fog_nodes.append(fog_node)
+            self.fog_node_numbers[fog_node] = self.fog_nodes_count
+            self.fog_nodes_count += 1
+            self.fog_nodes_by_id.setdefault(fog_node.id, fog_node)
+            CompletionScheduler.scheduler.resume(fog_node)
+            capacity_events.publish_zone(self, fog_node)
 
     @abstractmethod
     def find_assignee(self, user_node: Node, task: Task):
@@ -44,34 +74,52 @@ class ZoneManagerBase(ABC):
         fog = self.find_assignee(node, task)
         if fog is None:
             return None
-        offer = (self.name, fog)
+        offer = Offer(self, fog, get_distance(fog, node))
         return offer
 
     @abstractmethod
     def accept_offer(self, user_node, task, offer):
         possible_nodes = self.get_possible_fog_nodes(task, user_node)
-        assignee = offer[1]
+        assignee = offer.fog_node
         if assignee in possible_nodes:
             assignee.append_task(task)
             return True
         return False
 
+    def remove_fog_node(self, fog_node):
+        self.fog_nodes.remove(fog_node)
+        del self.fog_node_numbers[fog_node]
+        if self.fog_nodes_by_id.get(fog_node.id) is fog_node:
+            del self.fog_nodes_by_id[fog_node.id]
+            other_node = next((node for node in self.fog_nodes if node.id == fog_node.id), None)
+            if other_node is not None:
+                self.fog_nodes_by_id[fog_node.id] = other_node
+
+    def get_fog_nodes_in_range(self, task, user_node):
+        """
+        The fog nodes of the zone that can reach the user and have enough power, in the order of self.fog_nodes.
+        """
+        if self.fog_node_grid is None:
+            return [node for node in self.fog_nodes
+                    if node.power >= task.power_needed and node.is_in_range(user_node.x, user_node.y)]
+        in_range = self.fog_node_grid.get_fog_nodes_in_range(user_node.x, user_node.y, task.power_needed)
+        numbers = self.fog_node_numbers
+        return sorted((node for node in in_range if node in numbers), key=numbers.get)
+
     @abstractmethod
     def get_possible_fog_nodes(self, task, user_node):
         possible_fog_nodes = []
         # they should be reachable and also have enough power and time to process the task
-        for node in self.fog_nodes:
-            if node.power >= task.power_needed \
-                    and node.is_in_range(user_node.x, user_node.y):
-                if not self.not_enough_time(task, node.distance(user_node), node):
-                    possible_fog_nodes.append(node)
+        for node in self.get_fog_nodes_in_range(task, user_node):
+            if not self.not_enough_time(task, get_distance(node, user_node), node):
+                possible_fog_nodes.append(node)
         return possible_fog_nodes
 
     @abstractmethod
     @timer_log
     def send_task_result_to_owner(self, task, topology):
         owner_id = task.creator.id
-        owner = topology.get_node(owner_id)
+        owner = topology.get_task_owner(task)
         x, y = owner.x, owner.y
         owner.deliver_task_result(task)
         task.check_deadline_missed()
@@ -80,25 +128,24 @@ class ZoneManagerBase(ABC):
     @abstractmethod
     def update(self, topology):
         # print(len(self.fog_nodes))
-        for fog_node in self.fog_nodes:
-            for task in fog_node.tasks:
-                if fog_node.is_done(task):
-                    fog_node.remove_task(task)
-                    creator = topology.get_node(task.creator.id)
-                    nearest_zone = topology.get_nearest_zone(creator.x, creator.y)
-                    if self.is_within_coverage(creator.x, creator.y):
-                        nearest_zone = self
-                    if nearest_zone == self:
-                        self.send_task_result_to_owner(task, topology)
-                    else:
-                        Evaluator.increment_migrations()
-                        task.is_migrated = True
-                        print(
-                            f"The result of task {task.name} is sent to zone {nearest_zone.name} from zone {self.name}")
-                        nearest_zone.send_task_result_to_owner(task, topology)
-
-        for fog_node in self.fog_nodes:
+        for fog_node, task in topology.pop_finished_tasks(self):
+            fog_node.remove_task(task)
+            creator = topology.get_task_owner(task)
+            nearest_zone = topology.get_nearest_zone(creator.x, creator.y)
+            if self.is_within_coverage(creator.x, creator.y):
+                nearest_zone = self
+            if nearest_zone == self:
+                self.send_task_result_to_owner(task, topology)
+            else:
+                Evaluator.increment_migrations()
+                task.is_migrated = True
+                print(
+                    f"The result of task {task.name} is sent to zone {nearest_zone.name} from zone {self.name}")
+                nearest_zone.send_task_result_to_owner(task, topology)
+
+        # over a copy, as the fog nodes that left the coverage are removed from the zone along the way
+        for fog_node in list(self.fog_nodes):
             if not self.is_within_coverage(fog_node.x, fog_node.y):
-                self.fog_nodes.remove(fog_node)
+                self.remove_fog_node(fog_node)
                 topology.assign_fog_nodes_to_zones(fog_node, limit=True)
                 # print(f"The moving fog node {fog_node.id} is now out of zone {self.name}")
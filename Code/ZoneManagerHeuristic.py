@@ -4,6 +4,7 @@ from Node import Node
 from Task import Task
 from ZoneManagerBase import ZoneManagerBase
 from Evaluater import timer_log
+from DistanceCache import get_distance
 
 
 class ZoneManagerHeuristic(ZoneManagerBase):
@@ -28,13 +29,13 @@ class ZoneManagerHeuristic(ZoneManagerBase):
 
     def iterate_over_outputs(self, possible_fog_nodes, user_node, task):
         # sort the fog nodes based on the distance from the user node, to consider the worst case
-        possible_fog_nodes = sorted(possible_fog_nodes, key=lambda fog_node: -fog_node.distance(user_node))
+        possible_fog_nodes = sorted(possible_fog_nodes, key=lambda fog_node: -get_distance(fog_node, user_node))
         branching_factor = 10
         assignee = None
         best_value = +math.inf
         for fog_node in possible_fog_nodes:
             branching_factor -= 1
-            distance = fog_node.distance(user_node)
+            distance = get_distance(fog_node, user_node)
             future_distance = fog_node.distance_in_future(user_node, task.exec_time)
             if distance + future_distance < best_value:
                 assignee = fog_node
@@ -0,0 +1,176 @@
+"""
+    The zones of the matching running mode. The other modes decide task by task, in the order of arrival, so the
+    first tasks of a step can take the capacity that the next ones needed more. Here the tasks released in a step
+    are assigned together, as a capacity-constrained min-cost matching of the tasks to the fog nodes (see
+    match_tasks, called by Topology.assign_tasks):
+        - the candidates of a task are the possible fog nodes of its target zones that are closer to the user than
+          half its distance to the cloud, the ones whose offers the topology would accept
+        - the power of a fog node is split in slots, as many as the tasks of lowest power needed it could host
+        - the cost of a task on a fog node is the current distance plus the weighted predicted distance at the exec
+          time of the task, plus the weighted deadline slack of the task. Every task also has a rejection column,
+          more costly than any fog node, so when the slots are short the matching leaves out the tasks that can
+          wait the most
+    The slots don't know the power needed by the tasks, so the matches are committed in increasing order of slack,
+    through the offers of the zones that check the power. The tasks left out go through the offers of the zones as
+    in the other modes, to the cloud or to the task queue. The tasks are solved in batches of
+    Config.MATCHING_BATCH_SIZE, in increasing order of slack, which bounds the time of a solve.
+
+    A single task, as the ones retried from the task queue, is assigned to its possible fog node of lowest cost.
+"""
+
+import math
+import time
+
+import numpy as np
+
+from Clock import Clock
+from Config import Config
+from Evaluater import Evaluator, timer_log
+from MinCostMatching import solve_assignment
+from Node import Node
+from Task import Task
+from TaskQueue import get_slack
+from ZoneManagerBase import ZoneManagerBase, Offer
+from DistanceCache import get_distance
+
+
+def get_cost(fog_node, user_node, task):
+    return get_distance(fog_node, user_node) \
+           + Config.MATCHING_FUTURE_DISTANCE_WEIGHT * fog_node.distance_in_future(user_node, task.exec_time)
+
+
+def match_tasks(tasks, target_zones_list, cloud):
+    """
+    Assigns the tasks of a step to the fog nodes of their target zones with min-cost matchings.
+
+    Args:
+        tasks (list): The tasks, whose creators are the user nodes.
+        target_zones_list (list): The target zones of each task.
+        cloud (Node): The cloud node, whose distance bounds the candidates.
+
+    Returns:
+        list: The indices of the tasks that were left out, in increasing order.
+    """
+    numbers = sorted(range(len(tasks)), key=lambda number: get_slack(tasks[number], Clock.time))
+    left_out = []
+    for first in range(0, len(numbers), Config.MATCHING_BATCH_SIZE):
+        left_out += match_batch(tasks, target_zones_list, numbers[first:first + Config.MATCHING_BATCH_SIZE], cloud)
+    return sorted(left_out)
+
+
+def match_batch(tasks, target_zones_list, numbers, cloud):
+    """
+    Returns:
+        list: The indices of the tasks of the batch that were left out.
+    """
+    left_out = []
+    # (index of the task, fog node -> the first target zone that has it)
+    rows = []
+    for number in numbers:
+        task = tasks[number]
+        user_node = task.creator
+        max_distance = 0.5 * get_distance(cloud, user_node)
+        candidates = {}
+        for zone in target_zones_list[number]:
+            if not zone.is_within_coverage(user_node.x, user_node.y):
+                continue
+            for fog_node in zone.get_possible_fog_nodes(task, user_node):
+                if fog_node not in candidates and get_distance(fog_node, user_node) < max_distance:
+                    candidates[fog_node] = zone
+        if candidates:
+            rows.append((number, candidates))
+        else:
+            left_out.append(number)
+    if len(rows) == 0:
+        return left_out
+
+    # the columns of the slots of every fog node, in the order of their first candidate task
+    hosted_tasks = {}
+    for number, candidates in rows:
+        for fog_node in candidates:
+            hosted_tasks.setdefault(fog_node, []).append(tasks[number])
+    slot_fog_nodes = []
+    # fog node -> the range of its slots
+    slot_ranges = {}
+    for fog_node, fog_node_tasks in hosted_tasks.items():
+        min_power_needed = min(task.power_needed for task in fog_node_tasks)
+        # a candidate fog node has the power of its tasks, so it has at least one slot
+        fog_node_slots_count = min(len(fog_node_tasks), math.floor(fog_node.power / min_power_needed))
+        slot_ranges[fog_node] = slice(len(slot_fog_nodes), len(slot_fog_nodes) + fog_node_slots_count)
+        slot_fog_nodes += [fog_node] * fog_node_slots_count
+
+    slots_count = len(slot_fog_nodes)
+    fog_node_costs = np.full((len(rows), slots_count), np.nan)
+    for row, (number, candidates) in enumerate(rows):
+        task = tasks[number]
+        slack_cost = Config.MATCHING_SLACK_WEIGHT * get_slack(task, Clock.time)
+        for fog_node in candidates:
+            fog_node_costs[row, slot_ranges[fog_node]] = get_cost(fog_node, task.creator, task) + slack_cost
+    rejection_cost = np.nanmax(fog_node_costs) + 1
+    costs = np.full((len(rows), slots_count + len(rows)), rejection_cost)
+    # the slots of the fog nodes that aren't candidates of a task are never better than its rejection columns
+    costs[:, :slots_count] = np.where(np.isnan(fog_node_costs), rejection_cost + 1, fog_node_costs)
+
+    start = time.perf_counter()
+    assignment = solve_assignment(costs)
+    Evaluator.add_matching_solve(len(rows), time.perf_counter() - start)
+
+    for row, (number, candidates) in enumerate(rows):
+        task = tasks[number]
+        slot = assignment[row]
+        fog_node = slot_fog_nodes[slot] if slot < slots_count else None
+        if fog_node is None or fog_node not in candidates:
+            left_out.append(number)
+            continue
+        zone = candidates[fog_node]
+        if zone.accept_offer(task.creator, task, Offer(zone, fog_node, get_distance(fog_node, task.creator))):
+            Evaluator.increment_accepted_offers()
+            Evaluator.increment_matched_tasks()
+        else:
+            left_out.append(number)
+    return left_out
+
+
+class ZoneManagerMatching(ZoneManagerBase):
+    def __init__(self, x, y, coverage_radius, name):
+        super().__init__(x, y, coverage_radius, name)
+
+    @timer_log
+    def is_within_coverage(self, point_x, point_y):
+        return super().is_within_coverage(point_x, point_y)
+
+    @timer_log
+    def add_fog_node(self, fog_node):
+        return super().add_fog_node(fog_node)
+
+    @timer_log
+    def find_assignee(self, user_node: Node, task: Task):
+        possible_fog_nodes = self.get_possible_fog_nodes(task, user_node)
+        if len(possible_fog_nodes) == 0:
+            return None
+        return min(possible_fog_nodes, key=lambda fog_node: get_cost(fog_node, user_node, task))
+
+    @timer_log
+    def get_possible_fog_nodes(self, task, user_node):
+        return super().get_possible_fog_nodes(task, user_node)
+
+    @staticmethod
+    @timer_log
+    def not_enough_time(task, distance, fog_node=None, is_cloud=False, is_migrated=False):
+        return ZoneManagerBase.not_enough_time(task, distance, fog_node, is_cloud, is_migrated)
+
+    @timer_log
+    def create_offer(self, node, task):
+        return super().create_offer(node, task)
+
+    @timer_log
+    def accept_offer(self, user_node, task, offer):
+        return super().accept_offer(user_node, task, offer)
+
+    @timer_log
+    def send_task_result_to_owner(self, task, topology):
+        return super().send_task_result_to_owner(task, topology)
+
+    @timer_log
+    def update(self, topology):
+        return super().update(topology)
@@ -5,6 +5,7 @@ from Evaluater import Evaluator
 from Node import Node
 from ZoneManagerBase import ZoneManagerBase
 from Evaluater import timer_log
+from DistanceCache import get_distance
 
 
 class ZoneManagerQlearning(ZoneManagerBase):
@@ -28,13 +29,14 @@ class ZoneManagerQlearning(ZoneManagerBase):
         assignee = self.learner.get_suggested_assignee(
             all_fog_nodes=self.fog_nodes,
             possible_fog_nodes=possible_fog_nodes,
-            task=task
+            task=task,
+            fog_nodes_by_id=self.fog_nodes_by_id
         )
         if assignee is None:
             # in this case, we should assign the task to fog node with least predicted + current distance
             assignee = min(possible_fog_nodes,
-                           key=lambda fog_node: fog_node.distance(user_node) + fog_node.distance_in_future(user_node,
-                                                                                                           task.exec_time))
+                           key=lambda fog_node: get_distance(fog_node, user_node) + fog_node.distance_in_future(
+                               user_node, task.exec_time))
         return assignee
 
     @timer_log
@@ -53,7 +55,7 @@ class ZoneManagerQlearning(ZoneManagerBase):
     @timer_log
     def accept_offer(self, user_node, task, offer):
         possible_nodes = self.get_possible_fog_nodes(task, user_node)
-        assignee = offer[1]
+        assignee = offer.fog_node
         if assignee in possible_nodes:
             assignee.append_task(task)
             state = self.get_state(task)
@@ -72,7 +74,7 @@ class ZoneManagerQlearning(ZoneManagerBase):
     @timer_log
     def send_task_result_to_owner(self, task: Task, topology):
         owner_id = task.creator.id
-        owner = topology.get_node(owner_id)
+        owner = topology.get_task_owner(task)
         x, y = owner.x, owner.y
         owner.deliver_task_result(task)
 
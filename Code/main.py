@@ -1,5 +1,6 @@
 import time
 import os
+import random
 import Node
 from Learner import Learner
 from Visualizer import Visualizer
@@ -13,7 +14,7 @@ from Clock import Clock
 from Evaluater import Evaluator
 from Config import Config
 
-global user_layer, fog_layer, cloud_layer, zone_broadcaster, topology, task_data
+global user_layer, fog_layer, cloud_layer, zone_broadcaster, topology, task_schedule
 
 is_iman = Config.IS_IMAN
 
@@ -39,7 +40,7 @@ def get_file_paths():
 
 
 def init_system():
-    global user_layer, fog_layer, cloud_layer, topology, task_data
+    global user_layer, fog_layer, cloud_layer, topology, task_schedule
 
     file_paths = get_file_paths()
 
@@ -51,7 +52,7 @@ def init_system():
         zone_file_path=file_paths['zone_file_path']
     )
 
-    task_data = graph.get_tasks()
+    task_schedule = graph.get_task_schedule()
     user_layer = UsersLayer(graph)
     fog_layer = FogLayer(graph)
     cloud_layer = CloudLayer()
@@ -91,25 +92,30 @@ def init_system():
             f"{zone.name} x:{zone.x} y:{zone.y} coverage_radius:{zone.coverage_radius} covers nodes: {zone.fog_nodes}")
 
     if Config.OFFLINE_MODE:
-        save_path = f'Code/data/' if is_iman else './data/'
         for zone in zones:
-            file_path = f'{save_path}{zone.name}_q_table.txt'
+            file_path = Learner.get_q_table_path(zone.name)
             if os.path.exists(file_path):
                 os.remove(file_path)
 
 
 def step():
-    global task_data
+    global task_schedule
     log_current_state()
     topology.process_task_queue()
-    for i in task_data:
-        if i["creation_time"] == Clock.time:
-            node: Node = user_layer.get_nodes_by_id(i["creator"])
-            task = node.generate_task(i)
-            topology.assign_task(node, task)
+    tasks = []
+    for i in task_schedule.release(Clock.time):
+        node: Node = user_layer.get_nodes_by_id(i["creator"])
+        if node is None:
+            print(f"Task {i['name']} is skipped since its creator {i['creator']} is not in the trace")
+            Evaluator.increment_skipped_tasks()
+            continue
+        tasks.append(node.generate_task(i))
+    topology.assign_tasks(tasks)
 
     topology.update_topology()
     Evaluator.track_step_metrics()
+    if Config.RUNNING_MODE == Config.RUNNING_MODE_Q_LEARNING:
+        Evaluator.track_q_table_size([zone.learner for zone in topology.zones])
     if Config.ENABLE_VISUALIZATION:
         visualizer.visualize_mobility(graph=topology.graph, title=f"Time: {Clock.time}")
 
@@ -123,6 +129,8 @@ def log_current_state():
             print("Cloud Node", node.id, "Tasks", len(node.tasks))
 
 
+if Config.RANDOM_SEED is not None:
+    random.seed(Config.RANDOM_SEED)
 init_system()
 visualizer = Visualizer(x_range=Config.X_RANGE, y_range=Config.Y_RANGE)
 start = time.perf_counter()
@@ -139,10 +147,7 @@ if Config.ENABLE_VISUALIZATION_METRICS:
 
 def save_all_q_tables():
     for zone in topology.zones:
-        if is_iman:
-            zone.learner.save_q_table(f'Code/data/{zone.name}_q_table.txt')
-        else:
-            zone.learner.save_q_table(f'./data/{zone.name}_q_table.txt')
+        zone.learner.save_q_table(Learner.get_q_table_path(zone.name))
 
 
 if Config.OFFLINE_MODE:
@@ -0,0 +1,83 @@
+import pytest
+
+import CompletionScheduler
+from Clock import Clock
+from Config import Config
+from Node import Node, Layer
+from Task import Task
+
+
+class ScheduledTask:
+    # the attributes of Task that the scheduler uses
+    def __init__(self, name, assigned_node=None):
+        self.name = name
+        self.assigned_node = assigned_node
+        self.finish_time = None
+        self.completion_number = None
+
+
+def test_pop_finished_in_the_order_of_the_finish_times():
+    scheduler = CompletionScheduler.CompletionScheduler()
+    node = object()
+    tasks = [ScheduledTask(f"t{number}", node) for number in range(4)]
+    for task, finish_time in zip(tasks, (3.5, 1.0, 3.5, 7.0)):
+        scheduler.push(node, task, finish_time)
+    assert scheduler.pop_finished(0) == []
+    # ties in the order of the pushes
+    assert scheduler.pop_finished(4) == [(node, tasks[1]), (node, tasks[0]), (node, tasks[2])]
+    assert scheduler.pop_finished(10) == [(node, tasks[3])]
+    assert len(scheduler) == 0
+
+
+def test_cancelled_tasks_are_skipped():
+    scheduler = CompletionScheduler.CompletionScheduler()
+    node = object()
+    tasks = [ScheduledTask(f"t{number}", node) for number in range(3)]
+    for task in tasks:
+        scheduler.push(node, task, 2.0)
+    scheduler.cancel(tasks[1])
+    assert scheduler.pop_finished(2) == [(node, tasks[0]), (node, tasks[2])]
+
+    # a task pushed again after being cancelled only finishes at its new time
+    scheduler.push(node, tasks[1], 1.0)
+    scheduler.cancel(tasks[1])
+    scheduler.push(node, tasks[1], 5.0)
+    assert scheduler.pop_finished(4) == []
+    assert scheduler.pop_finished(5) == [(node, tasks[1])]
+
+
+def test_resume_pushes_back_the_deferred_tasks_still_on_the_node():
+    scheduler = CompletionScheduler.CompletionScheduler()
+    node = object()
+    other_node = object()
+    tasks = [ScheduledTask(f"t{number}", node) for number in range(3)]
+    for task in tasks:
+        scheduler.push(node, task, 1.0)
+    for _, task in scheduler.pop_finished(1):
+        scheduler.defer(node, task)
+    # one task left the node, one moved to another node while deferred
+    scheduler.cancel(tasks[0])
+    tasks[1].assigned_node = other_node
+
+    scheduler.resume(other_node)
+    assert scheduler.pop_finished(1) == []
+    scheduler.resume(node)
+    assert scheduler.pop_finished(1) == [(node, tasks[2])]
+    assert scheduler.deferred_tasks == {}
+
+
+def test_removing_tasks_of_a_node(monkeypatch):
+    monkeypatch.setattr(CompletionScheduler, "scheduler", CompletionScheduler.CompletionScheduler())
+    user = Node("veh0", Layer.Users, x=0, y=0)
+    fog_node = Node("fog0", Layer.Fog, power=Config.FOG_POWER, x=1, y=0)
+    tasks = [Task(power_needed=1, name=f"task{number}", size=2, deadline=Clock.time + 100, creator=user,
+                  creation_time=Clock.time) for number in range(4)]
+    for task in tasks:
+        fog_node.append_task(task)
+    # removing tasks while the others are scheduled doesn't skip any of them
+    for task in tasks[:2]:
+        fog_node.remove_task(task)
+    assert fog_node.power == Config.FOG_POWER - 2
+    finished = CompletionScheduler.scheduler.pop_finished(max(task.finish_time for task in tasks))
+    assert finished == [(fog_node, task) for task in tasks[2:]]
+    assert tasks[2].finish_time == pytest.approx(fog_node.get_finish_time(tasks[2]))
@@ -0,0 +1,89 @@
+import pytest
+
+from Clock import Clock
+from Config import Config
+from Graph import MobilityGraph
+from Node import Layer
+
+
+def write_vehicles(file_path, timesteps):
+    with open(file_path, 'w') as file:
+        file.write('<fcd-export>\n')
+        for time, vehicles in timesteps:
+            file.write(f'<timestep time="{time}.00">\n')
+            for vehicle_id, vehicle_type, x in vehicles:
+                file.write(f'<vehicle id="{vehicle_id}" x="{x}" y="1" angle="90" type="{vehicle_type}" speed="1"/>\n')
+            file.write('</timestep>\n')
+        file.write('</fcd-export>\n')
+
+
+@pytest.fixture
+def make_graph(tmp_path, monkeypatch):
+    def make(vehicles, mobile_fog_nodes):
+        file_paths = [str(tmp_path / name) for name in
+                      ("vehicles.xml", "mobile_fog_nodes.xml", "tasks.xml", "fixed_fog_nodes.xml", "zones.xml")]
+        write_vehicles(file_paths[0], vehicles)
+        write_vehicles(file_paths[1], mobile_fog_nodes)
+        with open(file_paths[2], 'w') as file:
+            file.write('<tasks>\n</tasks>\n')
+        with open(file_paths[3], 'w') as file:
+            file.write('<nodes>\n</nodes>\n')
+        with open(file_paths[4], 'w') as file:
+            file.write('<zones>\n<zone name="zone0" x="5" y="5" coverage_radius="10"/>\n</zones>\n')
+        return MobilityGraph(*file_paths)
+    # the data directory of the scenario bundles is relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    return make
+
+
+def positions(nodes):
+    return [(node.id, node.x) for node in nodes]
+
+
+@pytest.mark.parametrize("scenario_cache", [False, True])
+def test_update_graph_follows_arrivals_and_departures(make_graph, monkeypatch, scenario_cache):
+    monkeypatch.setattr(Config, "SCENARIO_CACHE", scenario_cache)
+    graph = make_graph(
+        vehicles=[(0, [("veh0", "car", 0), ("veh1", "car", 10)]),
+                  (1, [("veh1", "car", 11), ("veh2", "car", 20)]),
+                  (2, [("veh2", "car", 21), ("veh1", "car", 12), ("veh0", "car", 3)])],
+        mobile_fog_nodes=[(0, [("fog0", "mobileFog", 5)]), (1, [("fog0", "mobileFog", 6)]),
+                          (2, [("fog0", "mobileFog", 7)])])
+    assert Clock.time == 0
+    assert positions(graph.nodes) == [("veh0", 0), ("veh1", 10), ("fog0", 5)]
+    veh1 = graph.get_node("veh1")
+    fog0 = graph.get_node("fog0")
+    assert fog0.layer == Layer.Fog
+
+    graph.update_graph()
+    assert Clock.time == 1
+    assert positions(graph.nodes) == [("veh1", 11), ("fog0", 6), ("veh2", 20)]
+    assert positions(graph.departed_nodes) == [("veh0", 0)]
+    assert positions(graph.arrived_nodes) == [("veh2", 20)]
+    assert graph.get_node("veh0") is None
+    # the nodes that stay in the trace are moved in place
+    assert graph.get_node("veh1") is veh1
+    assert graph.get_moving_fog_nodes() == [fog0]
+
+    graph.update_graph()
+    assert positions(graph.nodes) == [("veh1", 12), ("fog0", 7), ("veh2", 21), ("veh0", 3)]
+    assert graph.departed_nodes == []
+    assert positions(graph.arrived_nodes) == [("veh0", 3)]
+    assert [node.id for node in graph.get_user_nodes()] == ["veh1", "veh2", "veh0"]
+
+
+def test_update_graph_keeps_the_nodes_on_an_empty_time_step(make_graph, monkeypatch):
+    monkeypatch.setattr(Config, "SCENARIO_CACHE", False)
+    graph = make_graph(vehicles=[(0, [("veh0", "car", 0)]), (1, [("veh0", "car", 1)]), (3, [("veh0", "car", 3)])],
+                       mobile_fog_nodes=[])
+    veh0 = graph.get_node("veh0")
+    graph.update_graph()
+    # no record at time 2: the node stays where it was
+    graph.update_graph()
+    assert Clock.time == 2
+    assert positions(graph.nodes) == [("veh0", 1)]
+    assert graph.departed_nodes == []
+    assert graph.arrived_nodes == []
+    graph.update_graph()
+    assert positions(graph.nodes) == [("veh0", 3)]
+    assert graph.get_node("veh0") is veh0
@@ -0,0 +1,80 @@
+import pytest
+
+from Config import Config
+from Learner import Learner, State, Action
+
+
+def make_state(number):
+    return State([(number % 5, number // 5 % 5, 0, 0, 0)], (number // 25, 0, 0, 0, 0, 0, 0))
+
+
+def make_action(number):
+    return Action(f"fog{number}", number % 10, 1.0, 0.0, 0.0, 10.0)
+
+
+@pytest.fixture
+def capacity(monkeypatch):
+    def set_capacity(max_states=None, policy="lru", max_actions=None):
+        monkeypatch.setattr(Config, "Q_TABLE_MAX_STATES", max_states)
+        monkeypatch.setattr(Config, "Q_TABLE_EVICTION_POLICY", policy)
+        monkeypatch.setattr(Config, "Q_TABLE_EVICTION_LOW_WATERMARK", 0.8)
+        monkeypatch.setattr(Config, "Q_TABLE_MAX_ACTIONS_PER_STATE", max_actions)
+    return set_capacity
+
+
+def test_evicts_the_least_recently_used_states(capacity):
+    capacity(max_states=10, policy="lru")
+    learner = Learner("test")
+    states = [make_state(number) for number in range(11)]
+    for state in states[:10]:
+        learner.add_state(state)
+    # the first two states are the most recently used ones
+    learner.visit_state(states[0])
+    learner.visit_state(states[1])
+
+    learner.add_state(states[10])
+    # down to the low watermark of the capacity, the state just added is kept
+    assert list(learner.q_table) == [states[0], states[1]] + states[5:11]
+    assert learner.evicted_states_count == 3
+    assert len(learner.state_index) == len(learner.q_table)
+    assert all(state in learner.state_index for state in learner.q_table)
+
+
+def test_evicts_the_least_visited_states(capacity):
+    capacity(max_states=5, policy="visits")
+    learner = Learner("test")
+    states = [make_state(number) for number in range(6)]
+    for state in states[:5]:
+        learner.add_state(state)
+    for state in states[:3]:
+        learner.visit_state(state)
+
+    learner.add_state(states[5])
+    assert list(learner.q_table) == states[:3] + [states[5]]
+    assert learner.evicted_states_count == 2
+    assert states[3] not in learner.state_index
+
+
+def test_keeps_the_actions_of_highest_q_values(capacity):
+    capacity(max_actions=3)
+    learner = Learner("test")
+    state = make_state(0)
+    actions = [make_action(number) for number in range(5)]
+    for action, reward in zip(actions, (5, -5, 3, 1, -10)):
+        learner.update_q_table(state, action, reward, state)
+    # the last action is kept as the one just updated, with the two highest others
+    assert set(learner.q_table[state]) == {actions[0], actions[2], actions[4]}
+    assert learner.evicted_actions_count == 2
+
+
+def test_lookups_dont_add_states(capacity):
+    capacity()
+    learner = Learner("test")
+    state = make_state(0)
+    assert learner.get_q_value(state, make_action(0)) == 0
+    assert learner.get_max_q_value(state) == 0
+    assert learner.get_best_q_entry(state) is None
+    assert len(learner.q_table) == 0
+
+    learner.update_q_table(state, make_action(0), 10, state)
+    assert list(learner.q_table) == [state]
@@ -0,0 +1,38 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from MinCostMatching import solve_assignment
+
+
+def brute_force_cost(costs):
+    rows_count, columns_count = costs.shape
+    return min(costs[range(rows_count), list(columns)].sum()
+               for columns in itertools.permutations(range(columns_count), rows_count))
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (1, 4), (3, 3), (4, 6), (5, 5), (5, 8)])
+def test_solve_assignment_matches_brute_force(shape):
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        # few distinct values, so that there are ties
+        costs = rng.integers(0, 6, size=shape).astype(np.float64)
+        assignment = solve_assignment(costs)
+        assert len(set(assignment.tolist())) == shape[0]
+        assert costs[range(shape[0]), assignment].sum() == pytest.approx(brute_force_cost(costs))
+
+
+def test_solve_assignment_with_rejection_columns():
+    # the layout of ZoneManagerMatching: one column per slot, then one rejection column per row
+    costs = np.array([[1.0, 2.0, 9.0, 9.0, 9.0],
+                      [1.0, 8.0, 9.0, 9.0, 9.0],
+                      [1.0, 3.0, 9.0, 9.0, 9.0]])
+    assignment = solve_assignment(costs)
+    assert costs[range(3), assignment].sum() == pytest.approx(brute_force_cost(costs))
+    assert sorted(assignment.tolist())[:2] == [0, 1]
+
+
+def test_solve_assignment_rejects_more_rows_than_columns():
+    with pytest.raises(ValueError):
+        solve_assignment(np.zeros((3, 2)))
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from QTableEngine import make_q_table
+
+
+def assert_same_q_tables(dict_q_table, dense_q_table, actions):
+    assert list(dense_q_table) == list(dict_q_table)
+    for state in dict_q_table:
+        assert list(dense_q_table[state].items()) == list(dict_q_table[state].items())
+        assert dense_q_table.max_value(state) == dict_q_table.max_value(state)
+        assert dense_q_table.best_action(state) == dict_q_table.best_action(state)
+        assert dense_q_table.values_of(state, actions) == dict_q_table.values_of(state, actions)
+    assert dense_q_table.actions_counts() == dict_q_table.actions_counts()
+    # only the actions still held by a state keep a column
+    assert set(dense_q_table.action_ids) == {action for state in dict_q_table for action in dict_q_table[state]}
+
+
+def test_dense_engine_behaves_as_the_dict_engine():
+    rng = random.Random(0)
+    states = [("state", number) for number in range(12)]
+    actions = [("action", number) for number in range(20)]
+    dict_q_table = make_q_table("dict")
+    dense_q_table = make_q_table("dense")
+    for _ in range(3000):
+        operation = rng.random()
+        state = rng.choice(states)
+        if state not in dict_q_table or operation < 0.05:
+            # a new state, or one whose actions are replaced
+            entries = {action: float(rng.randint(-2, 2)) for action in rng.sample(actions, rng.randint(0, 3))}
+            dict_q_table[state] = dict(entries)
+            dense_q_table[state] = dict(entries)
+        elif operation < 0.1:
+            del dict_q_table[state]
+            del dense_q_table[state]
+        elif operation < 0.3 and len(dict_q_table[state]) > 0:
+            action = rng.choice(list(dict_q_table[state]))
+            del dict_q_table[state][action]
+            del dense_q_table[state][action]
+        else:
+            # few distinct values, so that there are ties for the best action
+            action = rng.choice(actions)
+            value = float(rng.randint(-2, 2))
+            dict_q_table[state][action] = value
+            dense_q_table[state][action] = value
+        assert_same_q_tables(dict_q_table, dense_q_table, rng.sample(actions, 5))
+
+
+def test_dense_engine_reuses_the_columns_of_evicted_actions():
+    q_table = make_q_table("dense")
+    shared_action = ("action", "shared")
+    for number in range(10):
+        q_table[("state", number)] = {("action", number): 1.0, shared_action: 0.0}
+    assert len(q_table.actions) == 11
+    for number in range(10, 100):
+        # as the learner evicts the oldest state to make room for a new one
+        del q_table[("state", number - 10)]
+        q_table[("state", number)] = {("action", number): 1.0, shared_action: 0.0}
+    assert len(q_table.actions) == 11
+    assert len(q_table.action_ids) == 11
+    assert ("action", 0) not in q_table.action_ids
+    assert q_table.best_action(("state", 99)) == ("action", 99)
+
+    # an action deleted from the last state that holds it frees its column as well
+    del q_table[("state", 99)][("action", 99)]
+    assert ("action", 99) not in q_table.action_ids
+    q_table[("state", 99)][("action", 100)] = 2.0
+    assert len(q_table.actions) == 11
+    assert list(q_table[("state", 99)].items()) == [(shared_action, 0.0), (("action", 100), 2.0)]
+
+    for state in list(q_table):
+        del q_table[state]
+    assert q_table.action_ids == {}
+    assert sorted(q_table.free_columns) == list(range(11))
+
+
+@pytest.mark.parametrize("kind", ["dict", "dense"])
+def test_empty_state(kind):
+    q_table = make_q_table(kind, {"state": {}})
+    assert q_table.max_value("state") == 0
+    assert q_table.best_action("state") is None
+    assert q_table.values_of("state", ["action"]) == [None]
+    assert len(q_table["state"]) == 0
+    assert q_table.actions_counts() == [0]
+
+
+def test_invalid_engine():
+    with pytest.raises(ValueError):
+        make_q_table("sparse")
@@ -0,0 +1,56 @@
+import random
+
+import QTableStore
+from Learner import State, Action
+
+
+def random_q_table(rng, states_count=50):
+    actions = [Action(f"fog{number}", rng.uniform(0, 10), rng.uniform(0, 10), rng.uniform(0, 3),
+                      rng.uniform(0, 360), rng.uniform(0, 20)) for number in range(10)]
+    q_table = {}
+    for _ in range(states_count):
+        fog_nodes_data = [tuple(rng.randint(0, 5) for _ in range(5)) for _ in range(rng.randint(1, 6))]
+        state = State(fog_nodes_data, tuple(rng.randint(0, 5) for _ in range(7)))
+        q_table[state] = {action: rng.uniform(-5, 5) for action in rng.sample(actions, rng.randint(1, 4))}
+    return q_table
+
+
+def test_round_trip(tmp_path):
+    q_table = random_q_table(random.Random(0))
+    file_path = tmp_path / f"q_table{QTableStore.EXTENSION}"
+    QTableStore.save(q_table, file_path)
+
+    loaded = QTableStore.load(file_path)
+    assert loaded == q_table
+    for state, state_actions in q_table.items():
+        assert {action.key: q_value for action, q_value in loaded[state].items()} == \
+               {action.key: q_value for action, q_value in state_actions.items()}
+
+    # the raw fields of the actions are saved as they are
+    q_table_file = QTableStore.QTableFile(file_path)
+    saved_actions = {(action.id, action.x, action.y, action.speed, action.angle, action.power)
+                     for state_actions in q_table.values() for action in state_actions}
+    assert {(id.decode(),) + tuple(fields) for id, *fields in q_table_file.actions.tolist()} == saved_actions
+
+    # the records decoded one by one give the same q-table
+    assert len(q_table_file) == len(q_table)
+    assert dict(q_table_file.items()) == q_table
+
+
+def test_skips_empty_entries(tmp_path):
+    action = Action("fog0", 1.0, 2.0, 0.5, 90.0, 10.0)
+    kept_state = State([(1, 2, 3, 4, 5)], (0, 1, 2, 3, 4, 5, 0))
+    q_table = {
+        kept_state: {action: 1.5, None: 2.0},
+        State([(0, 0, 0, 0, 0)], (1, 1, 1, 1, 1, 1, 1)): {action: 0},
+        State([(5, 5, 5, 5, 5)], (2, 2, 2, 2, 2, 2, 2)): {},
+    }
+    file_path = tmp_path / f"q_table{QTableStore.EXTENSION}"
+    QTableStore.save(q_table, file_path)
+    assert QTableStore.load(file_path) == {kept_state: {action: 1.5}}
+
+
+def test_empty_q_table(tmp_path):
+    file_path = tmp_path / f"q_table{QTableStore.EXTENSION}"
+    QTableStore.save({}, file_path)
+    assert QTableStore.load(file_path) == {}
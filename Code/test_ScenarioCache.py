@@ -0,0 +1,96 @@
+import math
+import os
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import ScenarioCache
+from Node import Layer
+
+
+def make_trace(rng, timesteps_count=40):
+    """
+    A trace with the cases of the delta encoding: unchanged, moved, arrived and departed nodes, time steps whose
+    nodes change order and duplicated nodes.
+    """
+    positions = {}
+    trace = []
+    for number in range(timesteps_count):
+        for node_id in list(positions):
+            if rng.random() < 0.1:
+                del positions[node_id]
+        for _ in range(rng.randint(0, 2)):
+            positions[f"veh{len(trace)}_{len(positions)}"] = (rng.uniform(0, 10), rng.uniform(0, 10))
+        for node_id, (x, y) in positions.items():
+            if rng.random() < 0.5:
+                positions[node_id] = (x + rng.uniform(-1, 1), y + rng.uniform(-1, 1))
+        records = [("fog0", Layer.Fog, 5.0, 5.0, 0.0, 0.0, 15.0, None)]
+        records += [(node_id, Layer.Users, x, y, 1.0, 90.0, None, None) for node_id, (x, y) in positions.items()]
+        if number % 13 == 5:
+            rng.shuffle(records)
+        if number % 17 == 8:
+            records.append(records[0])
+        trace.append((float(number), records))
+    return trace
+
+
+def make_parser(trace):
+    # the methods of SumoXMLParser that compile_scenario reads
+    return SimpleNamespace(iter_trace_records=lambda: iter(trace),
+                           parse_task=lambda: [],
+                           parse_fixed_fog_node_records=lambda: [],
+                           parse_zone_records=lambda: [("zone0", 5.0, 5.0, 3.0)])
+
+
+def decode(bundle, record):
+    node, layer, x, y, speed, angle, power, coverage_radius = record
+    return (bundle.string(node), int(layer), x, y, speed, angle, None if math.isnan(power) else power,
+            None if math.isnan(coverage_radius) else coverage_radius)
+
+
+def test_delta_replay_rebuilds_the_trace(tmp_path):
+    trace = make_trace(random.Random(0))
+    bundle_path = str(tmp_path / f"scenario{ScenarioCache.EXTENSION}")
+    assert ScenarioCache.compile_scenario(make_parser(trace), bundle_path, keyframe_interval=10) == len(trace)
+    bundle = ScenarioCache.ScenarioBundle(bundle_path)
+    assert len(bundle) == len(trace)
+    # most of the time steps are deltas
+    assert 4 <= len(bundle.keyframes) < len(trace) // 2
+
+    state = {}
+    for number, (time, records) in enumerate(trace):
+        bundle_time, bundle_records, state = bundle.read_timestep(number, state)
+        assert bundle_time == time
+        assert [decode(bundle, record) for record in bundle_records] == \
+               [(node_id, int(layer)) + tuple(fields) for node_id, layer, *fields in records]
+
+
+def test_get_timestep_replays_from_the_keyframe(tmp_path):
+    trace = make_trace(random.Random(1))
+    bundle_path = str(tmp_path / f"scenario{ScenarioCache.EXTENSION}")
+    ScenarioCache.compile_scenario(make_parser(trace), bundle_path, keyframe_interval=10)
+    bundle = ScenarioCache.ScenarioBundle(bundle_path)
+    streamed = [(time, [(node.id, node.x, node.y) for node in nodes]) for time, nodes in bundle.iter_trace()]
+    for number in (0, 9, 10, 23, len(trace) - 1):
+        time, nodes = bundle.get_timestep(number)
+        assert (time, [(node.id, node.x, node.y) for node in nodes]) == streamed[number]
+
+
+def test_a_failed_compilation_leaves_no_file(tmp_path):
+    trace = make_trace(random.Random(2))
+
+    def iter_trace_records():
+        yield from trace[:5]
+        raise ValueError("Invalid trace")
+
+    parser = make_parser(trace)
+    parser.iter_trace_records = iter_trace_records
+    bundle_path = str(tmp_path / f"scenario{ScenarioCache.EXTENSION}")
+    with pytest.raises(ValueError):
+        ScenarioCache.compile_scenario(parser, bundle_path)
+    assert os.listdir(tmp_path) == []
+
+    # the temporary file is written next to the bundle, and replaces it once complete
+    ScenarioCache.compile_scenario(make_parser(trace), bundle_path)
+    assert os.listdir(tmp_path) == [os.path.basename(bundle_path)]
@@ -0,0 +1,68 @@
+import math
+import random
+
+import pytest
+
+from Config import Config
+from Learner import State
+from StateIndex import make_state_index
+
+
+def random_state(rng, fog_nodes_range=(1, 8)):
+    levels = Config.DISCRETE_LEVELS
+    fog_nodes_data = [tuple(rng.randint(0, levels) for _ in range(5)) for _ in range(rng.randint(*fog_nodes_range))]
+    task_data = tuple(rng.randint(0, levels) for _ in range(7))
+    return State(fog_nodes_data, task_data)
+
+
+def brute_force_distance(state1, state2):
+    # the double loop of Learner.calculate_distance_of_states
+    if len(state1.fog_nodes_data) > len(state2.fog_nodes_data):
+        state1, state2 = state2, state1
+    distance = sum(min(sum((x1 - x2) ** 2 for x1, x2 in zip(data1, data2)) for data2 in state2.fog_nodes_data)
+                   for data1 in state1.fog_nodes_data)
+    distance += sum((x1 - x2) ** 2 for x1, x2 in zip(state1.task_data, state2.task_data))
+    return math.sqrt(distance)
+
+
+def brute_force_nearest(states, state, threshold=None):
+    # a scan in insertion order, so ties go to the earliest state
+    nearest_state = None
+    min_distance = float('inf')
+    for existing_state in states:
+        distance = brute_force_distance(state, existing_state)
+        if distance < min_distance:
+            min_distance = distance
+            nearest_state = existing_state
+    if threshold is not None and min_distance > threshold:
+        return None, float('inf')
+    return nearest_state, min_distance
+
+
+@pytest.mark.parametrize("kind", ["brute_force", "task_bucket"])
+@pytest.mark.parametrize("threshold", [None, 3])
+def test_find_nearest_matches_brute_force(kind, threshold):
+    rng = random.Random(0)
+    states = list({state: None for state in (random_state(rng) for _ in range(300))})
+    index = make_state_index(kind, states)
+    # removed states leave holes that the search must skip
+    for state in states[::7]:
+        index.remove(state)
+    states = [state for state in states if state in index]
+
+    queries = [random_state(rng) for _ in range(100)] + [rng.choice(states) for _ in range(20)]
+    for query in queries:
+        expected_state, expected_distance = brute_force_nearest(states, query, threshold)
+        found_state, found_distance = index.find_nearest(query, threshold)
+        assert found_state is expected_state
+        assert found_distance == pytest.approx(expected_distance)
+
+
+def test_lsh_finds_stored_states():
+    rng = random.Random(0)
+    states = list({state: None for state in (random_state(rng) for _ in range(300))})
+    index = make_state_index("lsh", states)
+    for state in states[:50]:
+        found_state, found_distance = index.find_nearest(state)
+        assert found_distance == 0
+        assert found_state == state
@@ -0,0 +1,87 @@
+from Evaluater import Evaluator
+from TaskQueue import TaskQueue, CLOUD
+
+
+class QueuedTask:
+    # the attributes of Task that the queue uses, hashed by identity as Task
+    def __init__(self, name, deadline, exec_time=1.0, power_needed=1.0):
+        self.name = name
+        self.deadline = deadline
+        self.exec_time = exec_time
+        self.power_needed = power_needed
+        self.waiting_zones = None
+
+
+def test_push_expires_infeasible_tasks():
+    queue = TaskQueue()
+    expired_tasks = Evaluator.expired_tasks
+    deadline_misses = Evaluator.deadline_misses
+    # slack: 10 - 8 - 3 < 0
+    queue.push(QueuedTask("late", deadline=10.0, exec_time=3.0), time=8)
+    assert len(queue) == 0
+    assert Evaluator.expired_tasks == expired_tasks + 1
+    assert Evaluator.deadline_misses == deadline_misses + 1
+
+
+def test_expire_pops_the_tasks_of_negative_slack():
+    queue = TaskQueue()
+    zone = object()
+    tasks = [QueuedTask("t0", deadline=5.0), QueuedTask("t1", deadline=9.0), QueuedTask("t2", deadline=7.0),
+             QueuedTask("t3", deadline=12.0)]
+    for task in tasks:
+        queue.push(task, time=0, target_zones=[zone])
+    expired_tasks = Evaluator.expired_tasks
+
+    # slacks at time 7: t0 -3, t2 -1, t1 1, t3 4
+    queue.expire(7)
+    assert Evaluator.expired_tasks == expired_tasks + 2
+    assert len(queue) == 2
+    # the expired tasks don't wait for capacity anymore
+    assert queue.subscribers[zone] == {tasks[1], tasks[3]}
+    assert queue.subscribers[CLOUD] == {tasks[1], tasks[3]}
+    assert queue.drain() == [tasks[1], tasks[3]]
+
+
+def test_shed_drops_the_tasks_of_lowest_slack():
+    queue = TaskQueue(max_size=2)
+    tasks = [QueuedTask(f"t{number}", deadline=deadline) for number, deadline in enumerate((8.0, 4.0, 6.0, 9.0))]
+    for task in tasks:
+        queue.push(task, time=0)
+    deadline_misses = Evaluator.deadline_misses
+    queue.shed()
+    assert Evaluator.deadline_misses == deadline_misses + 2
+    assert queue.drain() == [tasks[0], tasks[3]]
+    assert len(queue) == 0
+
+
+def test_publish_wakes_the_subscribed_tasks_that_fit():
+    queue = TaskQueue()
+    zones = [object(), object()]
+    tasks = [QueuedTask("t0", deadline=10.0, power_needed=2.0), QueuedTask("t1", deadline=11.0, power_needed=5.0),
+             QueuedTask("t2", deadline=12.0, power_needed=1.0)]
+    queue.push(tasks[0], time=0, target_zones=[zones[0]])
+    queue.push(tasks[1], time=0, target_zones=[zones[0]])
+    queue.push(tasks[2], time=0, target_zones=[zones[1]])
+    # nothing changed: no task is retried
+    assert queue.take_ready(lambda task: False) == []
+
+    queue.publish(zones[0], 3.0)
+    queue.publish(CLOUD, 0.5)
+    assert queue.take_ready(lambda task: False) == [tasks[0]]
+    assert queue.subscribers[zones[0]] == {tasks[1]}
+    assert queue.subscribers[CLOUD] == {tasks[1], tasks[2]}
+
+    # a task whose user moved is retried without any capacity event
+    assert queue.take_ready(lambda task: task is tasks[2]) == [tasks[2]]
+    queue.publish(CLOUD, 5.0)
+    assert queue.take_ready(lambda task: False) == [tasks[1]]
+    assert len(queue) == 0
+
+
+def test_tasks_without_target_zones_are_retried_on_every_step():
+    queue = TaskQueue()
+    task = QueuedTask("t0", deadline=10.0)
+    queue.push(task, time=0)
+    assert queue.take_ready(lambda task: False) == [task]
+    queue.push(task, time=1)
+    assert queue.take_ready(lambda task: False) == [task]
@@ -0,0 +1,30 @@
+from TaskSchedule import TaskSchedule
+
+
+def make_task_data(name, creation_time, creator="veh0"):
+    return {"name": name, "power_needed": 1.0, "size": 2.0, "deadline": creation_time + 10.0, "creator": creator,
+            "creation_time": creation_time}
+
+
+def test_release_matches_scan():
+    task_data = [make_task_data("t0", 3.0), make_task_data("t1", 1.0, "veh1"), make_task_data("t2", 3.0, None),
+                 make_task_data("t3", 2.5), make_task_data("t4", 0.0), make_task_data("t5", 1.0, "veh2")]
+    schedule = TaskSchedule.from_task_data(task_data)
+    assert len(schedule) == len(task_data)
+    for time in range(5):
+        # the scan of the task dicts that the schedule replaces
+        expected = [task for task in task_data if task["creation_time"] == time]
+        assert schedule.release(time) == expected
+    # a task created between two ticks is never released
+    assert schedule.pending_count == 0
+
+
+def test_release_skips_the_missed_times():
+    schedule = TaskSchedule.from_task_data([make_task_data(f"t{time}", float(time)) for time in range(5)])
+    assert [task["name"] for task in schedule.release(1)] == ["t1"]
+    assert [task["name"] for task in schedule.release(3)] == ["t3"]
+    assert schedule.pending_count == 1
+    # going back in time releases nothing
+    assert schedule.release(0) == []
+    assert [task["name"] for task in schedule.release(4)] == ["t4"]
+    assert schedule.release(5) == []
@@ -0,0 +1,174 @@
+import contextlib
+import io
+import random
+from types import SimpleNamespace
+
+import pytest
+
+import CompletionScheduler
+import DistanceCache
+from Clock import Clock
+from CloudLayer import CloudLayer
+from Config import Config
+from Node import Node, Layer
+from Task import Task
+from Topology import Topology
+from ZoneManagerBase import Offer
+from ZoneManagerRandom import ZoneManagerRandom
+
+
+class NearestZoneManager(ZoneManagerRandom):
+    # offers the nearest possible fog node, so that the assignments are deterministic
+    def find_assignee(self, user_node, task):
+        possible_fog_nodes = self.get_possible_fog_nodes(task, user_node)
+        if len(possible_fog_nodes) == 0:
+            return None
+        return min(possible_fog_nodes, key=lambda fog_node: DistanceCache.get_distance(fog_node, user_node))
+
+
+def make_topology(fog_nodes_count=30, zones_per_side=3, area_size=300, coverage_radius=60):
+    rng = random.Random(0)
+    zone_size = area_size / zones_per_side
+    zones = [NearestZoneManager(x=(i + 0.5) * zone_size, y=(j + 0.5) * zone_size, coverage_radius=zone_size,
+                                name=f"Zone{i}_{j}") for i in range(zones_per_side) for j in range(zones_per_side)]
+    fog_nodes = [Node(f"fog{i}", Layer.Fog, power=Config.FOG_POWER, x=rng.uniform(0, area_size),
+                      y=rng.uniform(0, area_size), coverage_radius=coverage_radius) for i in range(fog_nodes_count)]
+    cloud_layer = CloudLayer()
+    cloud_layer.add_node(Node(0, Layer.Cloud, power=Config.CLOUD_POWER, x=area_size * 10, y=area_size * 10,
+                              coverage_radius=area_size * 100))
+    fog_layer = SimpleNamespace(get_fixed_nodes=lambda: fog_nodes, get_nodes=lambda: fog_nodes,
+                                remove_node=fog_nodes.remove)
+    graph = SimpleNamespace(get_moving_fog_nodes=lambda: [])
+    topology = Topology(None, fog_layer, cloud_layer, graph)
+    topology.set_zones(zones)
+    for fog_node in fog_nodes:
+        topology.assign_fog_nodes_to_zones(fog_node)
+    return topology
+
+
+@pytest.fixture
+def isolated(monkeypatch):
+    monkeypatch.setattr(Config, "RUNNING_MODE", Config.RUNNING_MODE_RANDOM)
+    monkeypatch.setattr(CompletionScheduler, "scheduler", CompletionScheduler.CompletionScheduler())
+
+
+def test_assign_tasks_as_the_sequential_path(isolated):
+    rng = random.Random(0)
+    # more power needed than the fog nodes have, so that the order of the commits matters
+    users_data = [(rng.uniform(0, 300), rng.uniform(0, 300), rng.uniform(0, 30), rng.uniform(0, 360),
+                   rng.randint(1, 5), rng.randint(2, 20)) for _ in range(200)]
+    results = []
+    for batch in (False, True):
+        topology = make_topology()
+        DistanceCache.cache.invalidate()
+        tasks = [Task(power_needed=power_needed, name=f"task{i}", size=size, deadline=Clock.time + 100,
+                      creator=Node(f"veh{i}", Layer.Users, x=x, y=y, speed=speed, angle=angle),
+                      creation_time=Clock.time)
+                 for i, (x, y, speed, angle, power_needed, size) in enumerate(users_data)]
+        with contextlib.redirect_stdout(io.StringIO()):
+            if batch:
+                topology.assign_tasks(tasks)
+            else:
+                for task in tasks:
+                    topology.assign_task(task.creator, task)
+        results.append(([task.assigned_node.id if task.assigned_node else None for task in tasks],
+                        len(topology.task_queue)))
+    assert results[0] == results[1]
+    # some tasks went to the cloud or to the queue
+    assert any(node_id is None or node_id == 0 for node_id in results[0][0])
+
+
+def test_a_departed_fog_node_leaves_no_deferred_tasks(isolated, monkeypatch):
+    topology = make_topology()
+    # outside of all the zones, so that its finished tasks are deferred
+    fog_node = Node("fog_away", Layer.Fog, power=Config.FOG_POWER, x=5000, y=5000, coverage_radius=60)
+    topology.fog_layer.get_nodes().append(fog_node)
+    user = Node("veh0", Layer.Users, x=5000, y=5001)
+    tasks = [Task(power_needed=1, name=f"task{number}", size=2, deadline=Clock.time + 1000, creator=user,
+                  creation_time=Clock.time) for number in range(3)]
+    for task in tasks:
+        fog_node.append_task(task)
+    monkeypatch.setattr(Clock, "time", max(task.finish_time for task in tasks))
+    topology.collect_finished_tasks()
+    assert CompletionScheduler.scheduler.deferred_tasks == {fog_node: tasks}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        topology.remove_fog_node(fog_node)
+    assert CompletionScheduler.scheduler.deferred_tasks == {}
+    assert len(topology.task_queue) == 3
+    assert all(task.assigned_node is None for task in tasks)
+
+
+class OfferingZone:
+    # a zone that refuses the offers of the given fog nodes, and records the offers it is asked to accept
+    def __init__(self, refused_fog_nodes=()):
+        self.refused_fog_nodes = refused_fog_nodes
+        self.accepted_offers = []
+
+    def accept_offer(self, user_node, task, offer):
+        self.accepted_offers.append(offer.fog_node.id)
+        return offer.fog_node not in self.refused_fog_nodes
+
+
+def place_with_offers(topology, distances, refused):
+    zone = OfferingZone([f"fog{number}" for number in refused])
+    offers = [Offer(zone, f"fog{number}", distance) for number, distance in enumerate(distances)]
+    for offer in offers:
+        offer.fog_node = SimpleNamespace(id=offer.fog_node)
+    zone.refused_fog_nodes = [offer.fog_node for offer in offers if offer.fog_node.id in zone.refused_fog_nodes]
+    topology.zone_broadcaster = SimpleNamespace(broadcast_to_zones=lambda target_zones, user_node, task: offers)
+    user = Node("veh0", Layer.Users, x=3000, y=3000)
+    task = Task(power_needed=1, name="task0", size=2, deadline=Clock.time + 100, creator=user,
+                creation_time=Clock.time)
+    with contextlib.redirect_stdout(io.StringIO()):
+        topology.place_task(user, task, [zone])
+    return zone.accepted_offers, task
+
+
+def test_place_task_takes_the_nearest_offers_first(isolated):
+    # the cloud is far from the user at (3000, 3000), so no offer is beyond the cutoff
+    topology = make_topology()
+    topology.cloud_layer.get_nodes()[0].x = 0
+    topology.cloud_layer.get_nodes()[0].y = 0
+    DistanceCache.cache.invalidate()
+    accepted_offers, _ = place_with_offers(topology, [5.0, 2.0, 8.0, 2.0, 3.0], refused=[1, 4])
+    # ties in the order of the offers, a refused offer moves on to the next nearest
+    assert accepted_offers == ["fog1", "fog3"]
+
+
+def test_place_task_stops_at_the_cloud_cutoff(isolated):
+    topology = make_topology()
+    cloud = topology.cloud_layer.get_nodes()[0]
+    # the cloud is at distance 100 of the user, the offers are only taken below 50
+    cloud.x = 3000
+    cloud.y = 3100
+    DistanceCache.cache.invalidate()
+    accepted_offers, task = place_with_offers(topology, [60.0, 10.0, 40.0, 50.0], refused=[1, 2])
+    assert accepted_offers == ["fog1", "fog2"]
+    # without any offer left, the task goes to the cloud or to the task queue
+    accepted_offers, task = place_with_offers(topology, [10.0], refused=[0])
+    assert accepted_offers == ["fog0"]
+    assert task.assigned_node is None
+    assert len(topology.task_queue) == 1
+
+
+def test_retry_of_a_moved_task_reuses_its_target_zones(isolated):
+    topology = make_topology()
+    DistanceCache.cache.invalidate()
+    user = Node("veh0", Layer.Users, x=10, y=10)
+    task = Task(power_needed=1, name="task0", size=2, deadline=Clock.time + 100, creator=user,
+                creation_time=Clock.time)
+    topology.task_queue.push(task, Clock.time, topology.zones[:1])
+    calls = []
+    moved_zones = topology.zones[1:2]
+
+    def get_target_zones(exec_time_estimate, user_node, zone_broadcast):
+        calls.append(user_node)
+        return moved_zones
+
+    topology.get_target_zones = get_target_zones
+    placed = []
+    topology.place_task = lambda user_node, placed_task, target_zones: placed.append((placed_task, target_zones))
+    topology.process_task_queue()
+    assert calls == [user]
+    assert placed == [(task, moved_zones)]